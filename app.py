@@ -1,39 +1,152 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import date
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import text
 
-from dotenv import load_dotenv
-
-from models import *
+from settings import Settings, load_env
 
-load_dotenv()
+# .env vor dem Import der Module laden, die ihre Konfiguration beim Import lesen
+load_env()
 
+from auth import create_access_token, decode_token, hashing_pool
+from capacity import limits_cache
+from database import SessionLocal, async_engine, engine
+from migrations import migrate
+from pricing import price_table
 from routes import *
-app = FastAPI()
-
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-@app.get("/")
-async def base_path():
+from routes.websocket import broadcaster, event_bus
+from slot_index import slot_index
+
+logger = logging.getLogger(__name__)
+
+def create_app(settings: Settings | None = None) -> FastAPI:
     """
-    Root endpoint to verify that the API is running.
+    Builds the application. Nothing touches the database at import; migrations and
+    warm-up run in the lifespan (see Settings).
+
+    Args:
+        settings (Settings, optional): Defaults to Settings.from_env().
 
     Returns:
-        dict: A success message.
+        FastAPI: The configured application.
     """
-    return {"success": True}
-
-app.include_router(websocket_router)
-app.include_router(user_router)
-app.include_router(order_router)
-app.include_router(products_router)
-app.include_router(config_router)
-app.include_router(slot_router)
-app.include_router(table_router)
-app.include_router(table_reservation_router)
+    settings = settings or Settings.from_env()
+    app = FastAPI(lifespan=_lifespan)
+    app.state.settings = settings
+
+    # CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(settings.cors_origins),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.get("/")
+    async def base_path():
+        """
+        Root endpoint to verify that the API is running.
+
+        Returns:
+            dict: A success message.
+        """
+        return {"success": True}
+
+    @app.get("/health")
+    async def health():
+        """
+        Reports the runtime metrics of this worker: WebSocket fan-out (events,
+        encoding time, bytes sent), event bus (sent, failed, dropped events) and
+        password hashing pool (jobs, queue and run times).
+
+        Returns:
+            dict: The metrics per component.
+        """
+        return {
+            "success": True,
+            "websocket": broadcaster.stats(),
+            "event_bus": event_bus.stats(),
+            "hashing": hashing_pool.stats(),
+        }
+
+    app.include_router(websocket_router)
+    app.include_router(user_router)
+    app.include_router(order_router)
+    app.include_router(products_router)
+    app.include_router(config_router)
+    app.include_router(slot_router)
+    app.include_router(table_router)
+    app.include_router(table_reservation_router)
+    app.include_router(capacity_router)
+    return app
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    settings: Settings = app.state.settings
+    timings: dict[str, float] = {}
+    app.state.startup_timings = timings
+
+    async def step(name: str, fn, *args, required: bool = False):
+        started = time.perf_counter()
+        try:
+            await fn(*args)
+        except Exception:
+            if required:
+                raise
+            # Aufwärmen ist optional; der erste Request macht es dann selbst
+            logger.warning("Startup step %s failed", name, exc_info=True)
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    if settings.auto_migrate:
+        await step("migrate", run_in_threadpool, migrate, engine, required=True)
+    if settings.warm_up:
+        await step("pool", _warm_pool, settings.pool_warm_connections)
+        await step("caches", run_in_threadpool, _warm_caches)
+        await step("hashing", run_in_threadpool, hashing_pool.warm_up)
+        await step("jwt", run_in_threadpool, _warm_jwt)
+    logger.info("Startup: %s", ", ".join(f"{name} {ms} ms" for name, ms in timings.items()) or "nothing to do")
+
+    yield
+
+    await broadcaster.drain(settings.ws_drain_seconds)
+    await event_bus.stop()
+    hashing_pool.shutdown()
+
+async def _warm_pool(connections: int):
+    """Opens ``connections`` connections per engine, so the pools start filled."""
+    def warm_sync():
+        opened = [engine.connect() for _ in range(connections)]
+        try:
+            for conn in opened:
+                conn.execute(text("SELECT 1"))
+        finally:
+            for conn in opened:
+                conn.close()
+
+    async def warm_async():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await run_in_threadpool(warm_sync)
+    await asyncio.gather(*(warm_async() for _ in range(connections)))
+
+def _warm_caches():
+    db = SessionLocal()
+    try:
+        slot_index.get(db)
+        price_table.get(db)
+        limits_cache.get(db, date.today())
+    finally:
+        db.close()
+
+def _warm_jwt():
+    decode_token(create_access_token({"sub": "warm-up"}))
+
+app = create_app()
@@ -1,17 +1,54 @@
 from passlib.context import CryptContext
+from passlib.hash import argon2
 import jwt
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import UTC, datetime, timedelta
-from dotenv import load_dotenv
+import asyncio
+import logging
+import multiprocessing
 import os
+import sys
+import threading
+import time
+import uuid
+
+from settings import load_env
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
-load_dotenv()
+load_env()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Argon2-Kosten (Defaults wie passlib); mit `python auth.py calibrate <ms>` bestimmen
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", argon2.default_rounds))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", argon2.memory_cost))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", argon2.parallelism))
+
+# Pool für Hashing/Verifikation: "process" (Fallback auf Threads) oder "thread"
+HASH_POOL_MODE = os.getenv("HASH_POOL_MODE", "process")
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", min(4, os.cpu_count() or 1)))
+# Maximale Anzahl gleichzeitig angenommener Hash-Aufträge (Rest wartet)
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", 32))
+
+# Cache der Auth-Kontexte für get_current_user
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 1024))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 60))
+# Opt-in: Benutzerdaten beim Login in den Token schreiben (kein Lookup pro Request)
+AUTH_EMBED_CLAIMS = os.getenv("AUTH_EMBED_CLAIMS") == "1"
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -19,19 +56,219 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def _timed_verify_and_update(plain_password, hashed_password):
+    started = time.time()
+    verified, new_hash = pwd_context.verify_and_update(plain_password, hashed_password)
+    return started, verified, new_hash
+
+def _timed_hash(password):
+    return time.time(), pwd_context.hash(password)
+
+class HashingPool:
+    """
+    Runs argon2 hashing and verification off the event loop in a bounded executor.
+
+    Uses a process pool so hashing does not compete with request handling for the GIL,
+    and falls back to a thread pool where processes are unavailable. At most
+    ``max_pending`` jobs are accepted at once; further callers wait. Queue time
+    (from the call until a worker starts) and run time are recorded in stats().
+    """
+
+    def __init__(self, mode: str = HASH_POOL_MODE, size: int = HASH_POOL_SIZE, max_pending: int = HASH_MAX_PENDING):
+        self.mode = mode
+        self.size = size
+        self.max_pending = max_pending
+        self._executor = None
+        self._semaphore = asyncio.Semaphore(max_pending)
+        self.jobs = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        verified, new_hash = await self._run(_timed_verify_and_update, plain_password, hashed_password)
+        return verified, new_hash
+
+    async def hash(self, password: str) -> str:
+        (hashed,) = await self._run(_timed_hash, password)
+        return hashed
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "jobs": self.jobs,
+            "queue_ms_avg": round(self.queue_seconds_total / self.jobs * 1000, 3) if self.jobs else 0.0,
+            "queue_ms_max": round(self.queue_seconds_max * 1000, 3),
+            "run_ms_avg": round(self.run_seconds_total / self.jobs * 1000, 3) if self.jobs else 0.0,
+        }
+
+    def warm_up(self):
+        """Starts the workers and runs one hash, so the first login does not pay for it."""
+        self._get_executor().submit(_timed_hash, "warm-up").result()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        submitted = time.time()
+        async with self._semaphore:
+            try:
+                future = self._get_executor().submit(fn, *args)
+                started, *result = await asyncio.wrap_future(future)
+            except BrokenProcessPool:
+                logger.warning("Password hashing process pool broke, falling back to threads")
+                self._use_threads()
+                future = self._executor.submit(fn, *args)
+                started, *result = await asyncio.wrap_future(future)
+        finished = time.time()
+
+        queued = max(0.0, started - submitted)
+        self.jobs += 1
+        self.queue_seconds_total += queued
+        self.queue_seconds_max = max(self.queue_seconds_max, queued)
+        self.run_seconds_total += finished - started
+        return result
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.mode == "process":
+                try:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.size,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                except (OSError, NotImplementedError, ValueError):
+                    logger.warning("Password hashing process pool unavailable, falling back to threads")
+                    self._use_threads()
+            else:
+                self._use_threads()
+        return self._executor
+
+    def _use_threads(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self.mode = "thread"
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="password-hash")
+
+hashing_pool = HashingPool()
+
+async def verify_password_async(plain_password, hashed_password) -> tuple[bool, str | None]:
+    """
+    Verifies a password in the hashing pool.
+
+    Returns:
+        tuple[bool, str | None]: Whether the password matches, and a new hash if the
+        stored one was created with outdated argon2 parameters (to be saved by the caller).
+    """
+    return await hashing_pool.verify_and_update(plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    return await hashing_pool.hash(password)
+
+def calibrate_argon2(target_ms: float = 250, memory_cost: int = ARGON2_MEMORY_COST,
+                     parallelism: int = ARGON2_PARALLELISM, max_time_cost: int = 32) -> dict:
+    """
+    Finds the smallest argon2 time cost whose hash takes at least ``target_ms`` on this machine.
+
+    Returns:
+        dict: The ARGON2_* settings and the measured duration.
+    """
+    for time_cost in range(1, max_time_cost + 1):
+        hasher = argon2.using(rounds=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+        started = time.perf_counter()
+        hasher.hash("calibration")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= target_ms:
+            break
+    return {
+        "ARGON2_TIME_COST": time_cost,
+        "ARGON2_MEMORY_COST": memory_cost,
+        "ARGON2_PARALLELISM": parallelism,
+        "measured_ms": round(elapsed_ms, 1),
+    }
+
+class AuthCache:
+    """
+    LRU cache of authenticated users, keyed by token id.
+
+    Entries expire after ``ttl`` seconds or with the token, whichever comes first,
+    and the least recently used entry is evicted beyond ``maxsize``. Call
+    invalidate_user() whenever a user is changed.
+    """
+
+    def __init__(self, maxsize: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, _, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, key: str, username: str, user, token_exp: float | None = None):
+        now = time.monotonic()
+        expires_at = now + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, now + token_exp - time.time())
+        with self._lock:
+            self._entries[key] = (expires_at, username, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, username: str):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] == username]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+auth_cache = AuthCache()
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(UTC) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
+def decode_token(token: str):
+    """
+    Returns the verified claims of a token, or None if it is invalid, expired or has no subject.
+    """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        return username
     except jwt.PyJWTError:
-        return None
\ No newline at end of file
+        return None
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+def token_cache_key(payload: dict) -> str:
+    return payload.get("jti") or f"{payload['sub']}:{payload.get('exp')}"
+
+def verify_token(token: str):
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    return payload["sub"]
+
+if __name__ == "__main__":
+    # python auth.py calibrate 250  ->  Werte für die .env
+    if len(sys.argv) >= 2 and sys.argv[1] == "calibrate":
+        target = float(sys.argv[2]) if len(sys.argv) > 2 else 250
+        for key, value in calibrate_argon2(target).items():
+            print(f"{key}={value}")
@@ -0,0 +1,53 @@
+"""
+Benchmark for the seating optimizer.
+
+Builds a fully booked evening (a few hundred reservations on ~100 tables) and
+times optimize_seating() on it.
+
+    python benchmarks/bench_seating.py [reservations] [tables]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seating import SeatingReservation, SeatingTable, is_feasible, optimize_seating, wasted_seats
+
+def build_evening(reservation_count: int, table_count: int, seed: int = 42):
+    rng = random.Random(seed)
+    tables = [SeatingTable(i, rng.choice([2, 2, 4, 4, 4, 6, 8])) for i in range(table_count)]
+
+    # Abend von 17 bis 23 Uhr in Viertelstunden (Slot 68 bis 92)
+    reservations = []
+    for i in range(reservation_count):
+        first = rng.randrange(68, 88)
+        length = rng.choice([6, 8, 8, 10, 12])
+        seats = rng.choice([1, 2, 2, 2, 3, 4, 4, 5, 6])
+        mask = ((1 << min(length, 92 - first)) - 1) << first
+        reservations.append(SeatingReservation(i, seats, mask))
+    return tables, reservations
+
+def run(reservation_count: int = 300, table_count: int = 100, repeat: int = 5):
+    tables, reservations = build_evening(reservation_count, table_count)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = optimize_seating(tables, reservations)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    seated = [r for r in reservations if result.assignment[r.id] is not None]
+    assert is_feasible(tables, seated, result.assignment)
+
+    print(f"reservations:   {reservation_count}")
+    print(f"tables:         {table_count}")
+    print(f"placed:         {result.placed}")
+    print(f"wasted seats:   {wasted_seats(tables, seated, result.assignment)}")
+    print(f"search steps:   {result.steps} (complete: {result.complete})")
+    print(f"time ms:        median {statistics.median(timings):.1f}, max {max(timings):.1f}")
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
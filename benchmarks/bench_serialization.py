@@ -0,0 +1,87 @@
+"""
+Benchmark for the serialization of list endpoints.
+
+Fills an in-memory database with orders and compares the CPU time per request of
+the old GET /orders path (ORM objects, ``__dict__``, jsonable_encoder, json.dumps)
+with typed ORM validation (pydantic dump_json) and the Core row fast path
+(serialization.json_rows).
+
+    python benchmarks/bench_serialization.py [orders] [repeat]
+"""
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models import Base, OrderChickenDB, OrderResponse
+from serialization import json_rows
+
+def build_orders(engine, count: int):
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        start = datetime(2025, 10, 10, 11, 0)
+        db.add_all(
+            OrderChickenDB(
+                firstname="Max", lastname=f"Muster{i}", mail=f"m{i}@example.org", phonenumber="0123456",
+                date=start + timedelta(minutes=15 * (i % 40)), chicken=i % 4, nuggets=i % 3, fries=i % 5,
+                miscellaneous="", status="CREATED", price=12.5
+            )
+            for i in range(count)
+        )
+        db.commit()
+    return Session
+
+def orm_dict_path(db) -> bytes:
+    orders = db.query(OrderChickenDB).all()
+    content = jsonable_encoder([
+        {k: v for k, v in order.__dict__.items() if k != "_sa_instance_state"}
+        for order in orders
+    ])
+    return json.dumps(content).encode("utf-8")
+
+ADAPTER = TypeAdapter(list[OrderResponse])
+
+def typed_orm_path(db) -> bytes:
+    return ADAPTER.dump_json(db.query(OrderChickenDB).all())
+
+def core_rows_path(db) -> bytes:
+    return json_rows(db.execute(select(*OrderChickenDB.__table__.c))).body
+
+def measure(Session, fn, repeat: int) -> tuple[list[float], int]:
+    timings = []
+    with Session() as db:
+        fn(db)  # Aufwärmen (Statement-Cache, Imports)
+    for _ in range(repeat):
+        with Session() as db:
+            started = time.process_time()
+            body = fn(db)
+            timings.append((time.process_time() - started) * 1000)
+    return timings, len(body)
+
+def run(count: int = 5000, repeat: int = 10):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    Session = build_orders(engine, count)
+
+    print(f"orders: {count}, repeat: {repeat}")
+    for name, fn in (
+        ("ORM __dict__ + jsonable_encoder", orm_dict_path),
+        ("ORM + pydantic dump_json", typed_orm_path),
+        ("Core rows + orjson", core_rows_path),
+    ):
+        timings, size = measure(Session, fn, repeat)
+        print(f"{name:34} cpu ms median {statistics.median(timings):8.1f}, max {max(timings):8.1f}, {size} bytes")
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,88 @@
+import abc
+import os
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import CacheVersionDB
+
+# Wie oft (Sekunden) ein Worker die Version seiner Caches in der DB prüft
+CACHE_VERSION_CHECK_SECONDS = float(os.getenv("CACHE_VERSION_CHECK_SECONDS", 1))
+
+def read_version(db, name: str) -> int:
+    version = db.execute(select(CacheVersionDB.version).where(CacheVersionDB.name == name)).scalar()
+    return version or 0
+
+def bump_version(db, name: str) -> int:
+    """
+    Increments the version of a cache in the caller's transaction, so that every
+    worker reloads it once the transaction is committed.
+
+    Returns:
+        int: The new version.
+    """
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(CacheVersionDB).values(name=name, version=1)
+    return db.execute(statement.on_conflict_do_update(
+        index_elements=[CacheVersionDB.name],
+        set_={"version": CacheVersionDB.version + 1}
+    ).returning(CacheVersionDB.version)).scalar_one()
+
+class VersionedCache(abc.ABC):
+    """
+    Process-local cache of a rarely changing table, shared between workers through
+    a version number in the cache_version table.
+
+    Writers call bump_version() in their transaction and invalidate() after the
+    commit. Other workers notice the new version within ``check_seconds`` and reload.
+    Subclasses implement load(db); the loaded value is swapped in as a whole, so
+    readers never see a half-built cache.
+    """
+
+    name: str
+
+    def __init__(self, check_seconds: float = CACHE_VERSION_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self._value = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db):
+        value = self._value
+        now = time.monotonic()
+        if value is not None and now - self._checked_at < self.check_seconds:
+            return value
+
+        version = read_version(db, self.name)
+        if value is not None and version == self._version:
+            self._checked_at = now
+            return value
+
+        with self._lock:
+            if self._value is not None and self._version == version:
+                return self._value
+            value = self.load(db)
+            self._value, self._version, self._checked_at = value, version, now
+        return value
+
+    async def get_async(self, db):
+        """
+        get() for an AsyncSession. Between version checks the cached value is
+        returned without touching the session at all.
+        """
+        value = self._value
+        if value is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return value
+        return await db.run_sync(self.get)
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+            self._version = None
+
+    @abc.abstractmethod
+    def load(self, db):
+        """Reads the whole cached value from the database."""
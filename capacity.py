@@ -0,0 +1,303 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from typing import Callable, NamedTuple
+
+from sqlalchemy import func, or_, select
+
+from cache_version import CACHE_VERSION_CHECK_SECONDS, read_version
+from database import time_bucket
+from models import CapacityProfileDB, ConfigChickenDB, OrderChickenDB, SlotDB
+from slot_index import slot_index
+
+# Sicherheitsnetz für Bestellungen anderer Worker, die den Cache nicht invalidieren können
+CAPACITY_CACHE_TTL = float(os.getenv("CAPACITY_CACHE_TTL", 30))
+
+# Raster für Bestellzeiten und Mengenlimits; bei Änderung die Tabelle slot_capacity leeren
+BUCKET_MINUTES = int(os.getenv("SLOT_BUCKET_MINUTES", 15))
+if BUCKET_MINUTES <= 0 or (24 * 60) % BUCKET_MINUTES:
+    raise ValueError("SLOT_BUCKET_MINUTES must divide a day (e.g. 5, 10, 15, 20, 30, 60)")
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+
+def bucket_index(dt: datetime) -> int:
+    """Index of the bucket of ``dt`` within its day."""
+    return (dt.hour * 60 + dt.minute) // BUCKET_MINUTES
+
+def bucket_start(dt: datetime) -> datetime:
+    minutes = bucket_index(dt) * BUCKET_MINUTES
+    return dt.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+
+def is_bucket_start(dt: datetime) -> bool:
+    return (dt.hour * 60 + dt.minute) % BUCKET_MINUTES == 0
+
+def compile_day_limits(db, day: date) -> list[tuple[int, int, int]] | None:
+    """
+    Compiles the quantity limits of every bucket of a day from the global config and
+    the capacity profiles that apply on that day, so admission is a list lookup.
+
+    Profiles are applied from least to most specific (general, then date, then slot),
+    each overriding only the limits it sets.
+
+    Returns:
+        list[tuple[int, int, int]] | None: (chicken, nuggets, fries) per bucket index,
+        or None if no config exists.
+    """
+    config = db.query(ConfigChickenDB).first()
+    if not config:
+        return None
+    limits = [(config.chicken or 0, config.nuggets or 0, config.fries or 0)] * BUCKETS_PER_DAY
+
+    day_start = datetime.combine(day, datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+    rows = db.query(CapacityProfileDB, SlotDB.range_start, SlotDB.range_end).outerjoin(
+        SlotDB, SlotDB.id == CapacityProfileDB.slot_id
+    ).filter(
+        or_(CapacityProfileDB.date.is_(None), CapacityProfileDB.date == day),
+        or_(
+            CapacityProfileDB.slot_id.is_(None),
+            (SlotDB.range_start < day_end) & (SlotDB.range_end >= day_start)
+        )
+    ).all()
+    rows.sort(key=lambda row: (row[0].slot_id is not None, row[0].date is not None, row[0].id))
+
+    for profile, range_start, range_end in rows:
+        if profile.slot_id is not None and range_start is None:
+            continue
+        first, last = 0, BUCKETS_PER_DAY
+        if profile.time_start is not None:
+            first = max(first, -(-(profile.time_start.hour * 60 + profile.time_start.minute) // BUCKET_MINUTES))
+        if profile.time_end is not None:
+            last = min(last, -(-(profile.time_end.hour * 60 + profile.time_end.minute) // BUCKET_MINUTES))
+        if range_start is not None:
+            if range_start >= day_start:
+                first = max(first, -(-(range_start.hour * 60 + range_start.minute) // BUCKET_MINUTES))
+            if range_end < day_end:
+                last = min(last, bucket_index(range_end) + 1)
+
+        override = (profile.chicken, profile.nuggets, profile.fries)
+        for index in range(first, last):
+            limits[index] = tuple(
+                current if value is None else value
+                for current, value in zip(limits[index], override)
+            )
+    return limits
+
+class DayCapacity(NamedTuple):
+    day: date
+    # Mengenlimits (chicken, nuggets, fries) je Zeitraster-Index des Tages
+    limits: list[tuple[int, int, int]]
+    # Startzeiten aller Zeitraster innerhalb der Slots, aufsteigend
+    buckets: list[datetime]
+    # Restmengen (chicken, nuggets, fries) je Zeitraster, gleiche Reihenfolge wie buckets
+    remaining: list[tuple[int, int, int]]
+
+    def suggest(self, at: datetime, chicken: int, nuggets: int, fries: int, limit: int) -> list[datetime]:
+        """
+        Finds the buckets closest to ``at`` (before or after, excluding ``at``
+        itself) that can still take the given quantities.
+
+        Returns:
+            list[datetime]: Up to ``limit`` buckets, nearest first.
+        """
+        wanted = (chicken, nuggets, fries)
+
+        def fits(index):
+            return all(amount <= left for amount, left in zip(wanted, self.remaining[index]) if amount > 0)
+
+        result = []
+        after = bisect_left(self.buckets, at)
+        before = after - 1
+        if after < len(self.buckets) and self.buckets[after] == at:
+            after += 1
+        while len(result) < limit and (before >= 0 or after < len(self.buckets)):
+            if after >= len(self.buckets) or (before >= 0 and at - self.buckets[before] <= self.buckets[after] - at):
+                index, before = before, before - 1
+            else:
+                index, after = after, after + 1
+            if fits(index):
+                result.append(self.buckets[index])
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "date": self.day,
+            "bucket_minutes": BUCKET_MINUTES,
+            "slots": [
+                {
+                    "time": bucket,
+                    "chicken": left[0],
+                    "nuggets": left[1],
+                    "fries": left[2],
+                    "limits": dict(zip(("chicken", "nuggets", "fries"), self.limits[bucket_index(bucket)]))
+                }
+                for bucket, left in zip(self.buckets, self.remaining)
+            ]
+        }
+
+def build_day_capacity(db, day: date) -> DayCapacity | None:
+    """
+    Computes the remaining quantities of every bucket of a day that lies inside an
+    open slot, from one grouped query over the day's orders and the compiled limits.
+
+    Returns:
+        DayCapacity | None: The snapshot, or None if no config exists.
+    """
+    limits = limits_cache.get(db, day)
+    if limits is None:
+        return None
+
+    day_start = datetime.combine(day, datetime.min.time())
+    day_end = day_start + timedelta(days=1)
+    step = timedelta(minutes=BUCKET_MINUTES)
+
+    buckets = set()
+    for slot in slot_index.overlapping(db, day_start, day_end):
+        range_start, range_end = slot.range_start, slot.range_end
+        # Erster voller Rasterpunkt im Slot (Bestellungen müssen auf einem liegen)
+        start = max(range_start, day_start)
+        bucket = bucket_start(start)
+        if bucket < start:
+            bucket += step
+        while bucket <= range_end and bucket < day_end:
+            buckets.add(bucket)
+            bucket += step
+
+    bucket_column = time_bucket(OrderChickenDB.date, BUCKET_MINUTES).label("bucket")
+    used = {}
+    rows = db.execute(
+        select(
+            bucket_column,
+            func.coalesce(func.sum(OrderChickenDB.chicken), 0),
+            func.coalesce(func.sum(OrderChickenDB.nuggets), 0),
+            func.coalesce(func.sum(OrderChickenDB.fries), 0),
+        )
+        .where(OrderChickenDB.date >= day_start, OrderChickenDB.date < day_end)
+        .group_by(bucket_column)
+    )
+    for bucket, chicken, nuggets, fries in rows:
+        used[bucket] = (chicken, nuggets, fries)
+
+    ordered = sorted(buckets)
+    remaining = [
+        tuple(
+            max(limit - amount, 0)
+            for limit, amount in zip(limits[bucket_index(bucket)], used.get(bucket, (0, 0, 0)))
+        )
+        for bucket in ordered
+    ]
+    return DayCapacity(day, limits, ordered, remaining)
+
+class DayCache:
+    """
+    Per-day cache of values computed by ``build(db, day)``.
+
+    Writes invalidate the days they touch (or everything). Entries also expire after
+    ``ttl`` seconds, which bounds the staleness caused by writes in other workers.
+
+    With a ``name``, the cache also follows that version in the cache_version table
+    like a VersionedCache: writers call bump_version(db, name) in their transaction,
+    and every worker drops all days within ``check_seconds`` after the commit.
+    """
+
+    def __init__(self, build: Callable, ttl: float = CAPACITY_CACHE_TTL, name: str | None = None,
+                 check_seconds: float = CACHE_VERSION_CHECK_SECONDS):
+        self.build = build
+        self.ttl = ttl
+        self.name = name
+        self.check_seconds = check_seconds
+        self._days: dict[date, tuple[float, object]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self, db, day: date):
+        if self.name is not None:
+            self._check_version(db)
+        entry = self._days.get(day)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        generation = self._generation
+        value = self.build(db, day)
+        with self._lock:
+            if generation == self._generation:
+                self._days[day] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, *moments: datetime | date | None, version: int | None = None):
+        """
+        Drops the snapshots of the days of the given times, or all snapshots if none are given.
+
+        ``version`` is the version this worker's write bumped to; if the cache was
+        current before, it stays current and the other days are kept.
+        """
+        with self._lock:
+            self._generation += 1
+            if version is not None and self._version == version - 1:
+                self._version = version
+            if not moments:
+                self._days.clear()
+                return
+            for moment in moments:
+                if isinstance(moment, datetime):
+                    moment = moment.date()
+                if moment is not None:
+                    self._days.pop(moment, None)
+
+    def _check_version(self, db):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_seconds:
+            return
+        version = read_version(db, self.name)
+        with self._lock:
+            self._checked_at = now
+            if version != self._version:
+                # Ein anderer Worker hat Config, Profile oder Slots geändert
+                self._generation += 1
+                self._days.clear()
+                self._version = version
+
+# Kompilierte Limits je Tag (Profile/Config) und daraus abgeleitete Restmengen;
+# beide folgen der Version "limits", die Config-, Profil- und Slot-Änderungen erhöhen
+limits_cache = DayCache(compile_day_limits, name="limits")
+capacity_cache = DayCache(build_day_capacity, name=limits_cache.name)
+
+def limits_at(db, dt: datetime) -> tuple[int, int, int] | None:
+    """
+    Quantity limits of the bucket containing ``dt``, or None if no config exists.
+    """
+    limits = limits_cache.get(db, dt.date())
+    return None if limits is None else limits[bucket_index(dt)]
+
+def span_days(start: datetime, end: datetime) -> list[date]:
+    """All days touched by [start, end]."""
+    return [start.date() + timedelta(days=offset) for offset in range((end.date() - start.date()).days + 1)]
+
+def profile_days(db, profile) -> list[date] | None:
+    """
+    The days whose limits a capacity profile affects, or None if it applies to every day.
+    """
+    if profile.slot_id is not None:
+        slot = db.get(SlotDB, profile.slot_id)
+        if slot is None:
+            return []
+        days = span_days(slot.range_start, slot.range_end)
+        return [profile.date] if profile.date in days else ([] if profile.date else days)
+    if profile.date is not None:
+        return [profile.date]
+    return None
+
+def invalidate_limits(*moments: datetime | date | None, version: int | None = None):
+    """
+    Drops the compiled limits (and capacity snapshots) of the given days,
+    or of all days if none are given.
+
+    Only affects this worker; writers also call bump_version(db, limits_cache.name)
+    in their transaction and pass the new ``version``, so the other workers follow
+    while this one keeps the unaffected days.
+    """
+    limits_cache.invalidate(*moments, version=version)
+    capacity_cache.invalidate(*moments, version=version)
@@ -1,23 +1,55 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import DateTime, create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
 
-from models import Base
+from settings import load_env
+
+load_env()
 
 TESTING = os.getenv("TESTING") == "1"
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Benannte In-Memory-DB, damit sync und async Engine im Test dieselben Daten sehen
+TEST_DATABASE = "/file:svb_chicken_test?mode=memory&cache=shared&uri=true"
+
+def _async_database_url(url: str):
+    """
+    Maps the configured sync database URL to its async driver
+    (postgresql -> asyncpg, sqlite -> aiosqlite).
+    """
+    url = make_url(url)
+    if url.get_backend_name() == "postgresql":
+        query = dict(url.query)
+        # asyncpg kennt kein "sslmode", sondern "ssl"
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return url.set(drivername="postgresql+asyncpg", query=query)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    return url
+
 if TESTING:
     engine = create_engine(
-        "sqlite://",
+        "sqlite://" + TEST_DATABASE,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool
     )
+    async_engine = create_async_engine(
+        "sqlite+aiosqlite://" + TEST_DATABASE,
+        poolclass=StaticPool
+    )
 else:
     engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    async_engine = create_async_engine(_async_database_url(DATABASE_URL), pool_pre_ping=True)
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 def get_db():
     db = SessionLocal()
@@ -26,5 +58,43 @@ def get_db():
     finally:
         db.close()
 
-# Tabellen sicherstellen (im Test idempotent)
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+async def get_async_db():
+    """
+    Async counterpart of get_db for `async def` routes, so database round-trips
+    do not block the event loop.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+class time_bucket(FunctionElement):
+    """
+    SQL expression that truncates a timestamp column to the start of its bucket,
+    e.g. ``time_bucket(OrderChickenDB.date, 15)`` for the quarter-hour.
+
+    Compiled per dialect, so it can be used in GROUP BY on Postgres and SQLite.
+    """
+    type = DateTime()
+    name = "time_bucket"
+    inherit_cache = True
+    _traverse_internals = FunctionElement._traverse_internals + [
+        ("minutes", InternalTraversal.dp_plain_obj)
+    ]
+
+    def __init__(self, column, minutes: int = 15):
+        self.minutes = int(minutes)
+        super().__init__(column)
+
+@compiles(time_bucket, "postgresql")
+def _time_bucket_postgresql(element, compiler, **kw):
+    column = compiler.process(list(element.clauses)[0], **kw)
+    seconds = element.minutes * 60
+    return (
+        f"(to_timestamp(floor(extract(epoch from {column}) / {seconds}) * {seconds}) "
+        f"AT TIME ZONE 'UTC')"
+    )
+
+@compiles(time_bucket, "sqlite")
+def _time_bucket_sqlite(element, compiler, **kw):
+    column = compiler.process(list(element.clauses)[0], **kw)
+    seconds = element.minutes * 60
+    return f"datetime((CAST(strftime('%s', {column}) AS INTEGER) / {seconds}) * {seconds}, 'unixepoch')"
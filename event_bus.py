@@ -0,0 +1,527 @@
+import abc
+import asyncio
+import fcntl
+import logging
+import os
+import socket
+import uuid
+from collections import OrderedDict
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Backend: "memory" (ein Prozess), "postgres" (LISTEN/NOTIFY) oder "unix" (lokale Sockets)
+EVENT_BUS = os.getenv("EVENT_BUS", "memory")
+EVENT_BUS_CHANNEL = os.getenv("EVENT_BUS_CHANNEL", "order_events")
+EVENT_BUS_DIR = os.getenv("EVENT_BUS_DIR", "/tmp/svb-chicken-events")
+# LISTEN braucht eine direkte Verbindung; hinter PgBouncer (z. B. Neon "-pooler") hier die direkte URL setzen
+EVENT_BUS_DATABASE_URL = os.getenv("EVENT_BUS_DATABASE_URL")
+# Backoff für Reconnects der LISTEN-Verbindung
+EVENT_BUS_RECONNECT_MIN_SECONDS = float(os.getenv("EVENT_BUS_RECONNECT_MIN_SECONDS", "0.5"))
+EVENT_BUS_RECONNECT_MAX_SECONDS = float(os.getenv("EVENT_BUS_RECONNECT_MAX_SECONDS", "30"))
+
+# Maximale Anzahl Events, die auf den Hintergrund-Publisher warten dürfen
+EVENT_BUS_OUTBOX_SIZE = int(os.getenv("EVENT_BUS_OUTBOX_SIZE", "10000"))
+# Wie lange stop() auf noch nicht gesendete Events wartet
+EVENT_BUS_DRAIN_SECONDS = float(os.getenv("EVENT_BUS_DRAIN_SECONDS", "5"))
+
+# NOTIFY-Payloads sind in Postgres auf knapp 8000 Bytes begrenzt
+PG_NOTIFY_MAX_BYTES = 7999
+# Größere Datagramme lehnt der Kernel je nach Puffergröße mit EMSGSIZE ab
+UNIX_DGRAM_MAX_BYTES = 65000
+# Höchstzahl unvollständiger, gestückelter Events, die ein Empfänger vorhält
+EVENT_BUS_MAX_PARTIAL = 100
+
+class EventBus(abc.ABC):
+    """
+    Publish/subscribe channel between the API workers.
+
+    Every worker publishes its order events once, already encoded as bytes; the bus
+    hands each event to the `deliver` callback of every subscribed worker (including
+    the publisher), which then fans it out to its own WebSocket clients.
+
+    Each event is numbered once, on the publishing side, from a counter shared by
+    all workers of the bus (see _next_seq()), and the number travels with the event
+    as a ``<seq>:`` prefix. Every worker therefore sees the same ``seq`` for the same
+    event within the same ``stream``, so a client can resume on any worker.
+
+    Events larger than ``max_bytes`` of the backend are split into chunks
+    (``<seq>/<index>/<count>:`` prefix, cut on UTF-8 character boundaries) and
+    reassembled by every receiver before delivery; nothing is dropped for its size.
+
+    publish() only puts the event into an outbox; a background task sends it, so
+    requests never wait for the bus. Send failures are logged and counted (see
+    stats()) instead of being raised into the request that wrote the order.
+
+    On start, and whenever the bus may have lost events (e.g. after a reconnect),
+    it calls ``on_gap(stream, seq)`` with the current shared sequence number: events
+    up to ``seq`` may be missing, everything after it will be delivered.
+    """
+
+    # Backends, die über das Netz/den Kernel senden, nutzen den Hintergrund-Publisher
+    background = True
+    # Größte Nachricht, die das Backend am Stück übertragen kann (None = unbegrenzt)
+    max_bytes: int | None = None
+
+    def __init__(self, deliver: Callable[[bytes, int], None], outbox_size: int = EVENT_BUS_OUTBOX_SIZE,
+                 on_gap: Callable[[str, int], None] | None = None):
+        self.deliver = deliver
+        self.on_gap = on_gap
+        self.stream = uuid.uuid4().hex[:12]
+        self.started = False
+        self.outbox_size = outbox_size
+        self.published = 0
+        self.failed = 0
+        self.dropped = 0
+        self.chunked = 0
+        self._partial: OrderedDict[int, list[bytes | None]] = OrderedDict()
+        self._start_lock = asyncio.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._outbox: asyncio.Queue | None = None
+        self._publisher: asyncio.Task | None = None
+
+    async def start(self):
+        """Subscribes this worker to the bus. Safe to call repeatedly."""
+        if self.started:
+            return
+        async with self._start_lock:
+            if not self.started:
+                await self._start()
+                await self._report_gap()
+                if self.background:
+                    self._loop = asyncio.get_running_loop()
+                    self._outbox = asyncio.Queue(maxsize=self.outbox_size)
+                    self._publisher = asyncio.create_task(self._run_publisher())
+                self.started = True
+
+    async def publish(self, message: bytes):
+        """
+        Queues an event for all workers. Never raises; failures are logged and counted.
+        """
+        try:
+            await self.start()
+            if not self.background:
+                self._send_locally(message, await self._next_seq())
+                return
+        except Exception:
+            self.failed += 1
+            logger.exception("Event bus unavailable, event dropped")
+            return
+        if asyncio.get_running_loop() is self._loop:
+            self._submit(message)
+        else:
+            # Aufruf aus einem anderen Event Loop (z. B. Threadpool)
+            self._loop.call_soon_threadsafe(self._submit, message)
+
+    async def stop(self, timeout: float = EVENT_BUS_DRAIN_SECONDS):
+        """Sends the queued events (waiting up to ``timeout`` seconds) and unsubscribes."""
+        if not self.started:
+            return
+        self.started = False
+        if self._publisher is not None:
+            try:
+                await asyncio.wait_for(self._outbox.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Event bus stopped with %d unsent events", self._outbox.qsize())
+            self._publisher.cancel()
+            try:
+                await self._publisher
+            except asyncio.CancelledError:
+                pass
+            self._publisher = None
+        await self._stop()
+
+    def stats(self) -> dict:
+        """Returns the number of sent, failed and dropped events and the outbox size."""
+        return {
+            "backend": type(self).__name__,
+            "published": self.published,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "chunked": self.chunked,
+            "pending": self._outbox.qsize() if self._outbox is not None else 0,
+        }
+
+    def _submit(self, message: bytes):
+        try:
+            self._outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Event bus outbox is full (%d events), event dropped", self.outbox_size)
+
+    async def _run_publisher(self):
+        while True:
+            message = await self._outbox.get()
+            try:
+                await self._send(message)
+            except Exception:
+                self.failed += 1
+                logger.exception("Event bus publish failed, event not delivered")
+            finally:
+                self._outbox.task_done()
+
+    async def _send(self, message: bytes):
+        seq = await self._next_seq()
+        frame = b"%d:%s" % (seq, message)
+        if self.max_bytes is None or len(frame) <= self.max_bytes:
+            await self._publish(frame)
+        else:
+            await self._publish_many(_split_frames(seq, message, self.max_bytes))
+            self.chunked += 1
+        self.published += 1
+
+    def _send_locally(self, message: bytes, seq: int):
+        try:
+            self.deliver(message, seq)
+            self.published += 1
+        except Exception:
+            self.failed += 1
+            logger.exception("Event delivery failed")
+
+    def _receive(self, frame: bytes):
+        head, separator, message = frame.partition(b":")
+        if head.isdigit() and separator:
+            self.deliver(message, int(head))
+            return
+        parts = head.split(b"/")
+        if not separator or len(parts) != 3 or not all(part.isdigit() for part in parts):
+            logger.warning("Event bus received a frame without sequence number, ignored")
+            return
+
+        seq, index, count = (int(part) for part in parts)
+        chunks = self._partial.get(seq)
+        if chunks is None:
+            chunks = self._partial[seq] = [None] * count
+            if len(self._partial) > EVENT_BUS_MAX_PARTIAL:
+                lost, _ = self._partial.popitem(last=False)
+                logger.warning("Event seq=%d incomplete, chunks missing; dropped", lost)
+        if index < len(chunks):
+            chunks[index] = message
+        if all(chunk is not None for chunk in chunks):
+            del self._partial[seq]
+            self.deliver(b"".join(chunks), seq)
+
+    async def _report_gap(self):
+        if self.on_gap is not None:
+            # _current_seq() aktualisiert ggf. auch self.stream
+            seq = await self._current_seq()
+            self.on_gap(self.stream, seq)
+
+    async def _start(self):
+        pass
+
+    @abc.abstractmethod
+    async def _publish(self, frame: bytes):
+        """Sends one frame to every worker of the bus."""
+
+    async def _publish_many(self, frames: list[bytes]):
+        for frame in frames:
+            await self._publish(frame)
+
+    @abc.abstractmethod
+    async def _next_seq(self) -> int:
+        """Draws the next sequence number from the counter shared by all workers."""
+
+    @abc.abstractmethod
+    async def _current_seq(self) -> int:
+        """Returns the last sequence number drawn by any worker."""
+
+    async def _stop(self):
+        pass
+
+class InProcessEventBus(EventBus):
+    """
+    Delivers events only within the current process (single worker).
+
+    Delivery only enqueues for the local clients, so it happens inline
+    without the background publisher; the sequence is a plain counter.
+    """
+
+    background = False
+
+    def __init__(self, deliver: Callable[[bytes, int], None], **kwargs):
+        super().__init__(deliver, **kwargs)
+        self.seq = 0
+
+    async def _publish(self, frame: bytes):
+        # Nur der eigene Worker hört zu
+        self._receive(frame)
+
+    async def _next_seq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+    async def _current_seq(self) -> int:
+        return self.seq
+
+class PostgresEventBus(EventBus):
+    """
+    Distributes events through Postgres LISTEN/NOTIFY, across workers and hosts.
+
+    Uses one asyncpg connection for LISTEN and one for NOTIFY. Payloads larger than
+    the NOTIFY limit are sent as chunks in one transaction, so they are delivered
+    together or not at all. Sequence numbers come
+    from the Postgres sequence ``<channel>_seq``; the stream id contains its oid, so
+    a recreated sequence starts a new stream.
+
+    If the LISTEN connection drops, it is re-established with exponential backoff;
+    notifications sent in between are lost, so ``on_gap`` is called after every
+    reconnect. A failed NOTIFY connection is reopened on the next publish.
+
+    LISTEN only works on a direct connection. Behind a pooler in transaction mode
+    (PgBouncer, e.g. the Neon ``-pooler`` host) notifications are never received;
+    set EVENT_BUS_DATABASE_URL to the direct (non-pooled) URL in that case.
+    """
+
+    max_bytes = PG_NOTIFY_MAX_BYTES
+
+    def __init__(self, deliver: Callable[[bytes, int], None], dsn: str, channel: str = EVENT_BUS_CHANNEL, **kwargs):
+        super().__init__(deliver, **kwargs)
+        self.dsn = dsn
+        self.channel = channel
+        self.sequence = f"{channel}_seq"
+        self.reconnects = 0
+        self._listen_conn = None
+        self._notify_conn = None
+        self._notify_lock = asyncio.Lock()
+        self._reconnect_task: asyncio.Task | None = None
+        if dsn and "-pooler" in dsn:
+            logger.warning("Event bus uses a pooled connection; LISTEN needs a direct URL (EVENT_BUS_DATABASE_URL)")
+
+    async def _start(self):
+        await self._connect()
+
+    async def _connect(self):
+        import asyncpg
+
+        self._listen_conn = await asyncpg.connect(self.dsn)
+        self._listen_conn.add_termination_listener(self._on_terminated)
+        await self._listen_conn.add_listener(self.channel, self._on_notify)
+        try:
+            await self._listen_conn.execute(f'CREATE SEQUENCE IF NOT EXISTS "{self.sequence}"')
+        except asyncpg.UniqueViolationError:
+            # Gleichzeitig von einem anderen Worker angelegt
+            pass
+        oid = await self._listen_conn.fetchval("SELECT $1::regclass::oid", self.sequence)
+        self.stream = f"{self.channel}-{oid}"
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._receive(payload.encode("utf-8"))
+
+    def _on_terminated(self, connection):
+        if self.started and self._reconnect_task is None:
+            logger.warning("Event bus LISTEN connection lost, reconnecting")
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = EVENT_BUS_RECONNECT_MIN_SECONDS
+        try:
+            while self.started:
+                await self._close_listen_conn()
+                try:
+                    await self._connect()
+                except Exception:
+                    logger.warning("Event bus reconnect failed, retrying in %.1f s", delay, exc_info=True)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, EVENT_BUS_RECONNECT_MAX_SECONDS)
+                    continue
+                self.reconnects += 1
+                logger.info("Event bus reconnected")
+                # Was während der Unterbrechung gesendet wurde, ist verloren
+                await self._report_gap()
+                return
+        finally:
+            self._reconnect_task = None
+
+    async def _publish(self, frame: bytes):
+        async with self._notify_lock:
+            conn = await self._notify_connection()
+            await conn.execute("SELECT pg_notify($1, $2)", self.channel, frame.decode("utf-8"))
+
+    async def _publish_many(self, frames: list[bytes]):
+        async with self._notify_lock:
+            conn = await self._notify_connection()
+            # NOTIFY wird erst beim Commit zugestellt: alle Teile oder keiner
+            async with conn.transaction():
+                for frame in frames:
+                    await conn.execute("SELECT pg_notify($1, $2)", self.channel, frame.decode("utf-8"))
+
+    async def _next_seq(self) -> int:
+        async with self._notify_lock:
+            conn = await self._notify_connection()
+            return await conn.fetchval("SELECT nextval($1)", self.sequence)
+
+    async def _current_seq(self) -> int:
+        row = await self._listen_conn.fetchrow(f'SELECT last_value, is_called FROM "{self.sequence}"')
+        return row["last_value"] if row["is_called"] else 0
+
+    async def _notify_connection(self):
+        if self._notify_conn is None or self._notify_conn.is_closed():
+            import asyncpg
+
+            self._notify_conn = await asyncpg.connect(self.dsn)
+        return self._notify_conn
+
+    async def _close_listen_conn(self):
+        conn, self._listen_conn = self._listen_conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close()
+            except Exception:
+                conn.terminate()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "reconnects": self.reconnects}
+
+    async def _stop(self):
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        await self._close_listen_conn()
+        if self._notify_conn is not None:
+            await self._notify_conn.close()
+        self._notify_conn = None
+
+class UnixSocketEventBus(EventBus):
+    """
+    Distributes events between workers on the same host via Unix datagram sockets.
+
+    Every worker binds a socket in a shared directory; publishing sends the event to
+    every socket found there. Sockets of workers that are gone are removed. Needs no
+    external service, so it also serves as a multi-worker stand-in in tests.
+
+    A failing receiver (full buffer, message too large, ...) is logged and counted
+    in ``peer_errors``; the event is still sent to all other workers.
+
+    The shared sequence number and stream id live in the file ``stream.seq`` in the
+    same directory, incremented under an exclusive flock.
+    """
+
+    max_bytes = UNIX_DGRAM_MAX_BYTES
+
+    def __init__(self, deliver: Callable[[bytes, int], None], directory: str = EVENT_BUS_DIR, **kwargs):
+        super().__init__(deliver, **kwargs)
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        self.counter_path = os.path.join(directory, "stream.seq")
+        self.peer_errors = 0
+        self._transport = None
+        self._send_sock = None
+
+    async def _start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        bus = self
+
+        class _Receiver(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                bus._receive(data)
+
+        self._transport, _ = await loop.create_datagram_endpoint(
+            _Receiver, local_addr=self.path, family=socket.AF_UNIX
+        )
+        self._send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._send_sock.setblocking(False)
+
+    async def _publish(self, frame: bytes):
+        for name in os.listdir(self.directory):
+            if not name.endswith(".sock"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                self._send_sock.sendto(frame, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker existiert nicht mehr
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except OSError as e:
+                # z. B. ENOBUFS/EAGAIN (Empfänger voll) oder EMSGSIZE; die übrigen Worker bekommen das Event trotzdem
+                self.peer_errors += 1
+                logger.warning("Event bus receiver %s failed, event dropped for it: %s", name, e)
+
+    async def _next_seq(self) -> int:
+        return self._update_counter(1)
+
+    async def _current_seq(self) -> int:
+        return self._update_counter(0)
+
+    def _update_counter(self, increment: int) -> int:
+        fd = os.open(self.counter_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            content = os.read(fd, 64).split()
+            new = len(content) != 2 or not content[1].isdigit()
+            if new:
+                # Neue Zählerdatei: neuer Stream, Nummern beginnen wieder bei 0
+                stream, seq = uuid.uuid4().hex[:12], 0
+            else:
+                stream, seq = content[0].decode("ascii"), int(content[1])
+            if increment or new:
+                seq += increment
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, f"{stream} {seq}".encode("ascii"))
+            self.stream = stream
+            return seq
+        finally:
+            # Schließen gibt auch den flock frei
+            os.close(fd)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "peer_errors": self.peer_errors}
+
+    async def _stop(self):
+        if self._transport is not None:
+            self._transport.close()
+        if self._send_sock is not None:
+            self._send_sock.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+def _split_frames(seq: int, message: bytes, max_bytes: int) -> list[bytes]:
+    """
+    Splits an event into frames of at most ``max_bytes``, each prefixed with
+    ``<seq>/<index>/<count>:``. Cuts never fall inside a UTF-8 character, so every
+    frame stays valid text (NOTIFY payloads must be).
+    """
+    # Platz für den längsten möglichen Präfix lassen
+    room = max_bytes - len(b"%d/%d/%d:" % (seq, len(message), len(message)))
+    if room < 4:
+        raise ValueError(f"max_bytes {max_bytes} too small for event chunks")
+    parts = []
+    start = 0
+    while start < len(message):
+        end = min(start + room, len(message))
+        # Nicht innerhalb eines UTF-8-Zeichens schneiden (Folgebytes sind 0b10xxxxxx)
+        while end < len(message) and message[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(message[start:end])
+        start = end
+    return [b"%d/%d/%d:%s" % (seq, index, len(parts), part) for index, part in enumerate(parts)]
+
+def create_event_bus(deliver: Callable[[bytes, int], None], backend: str = EVENT_BUS,
+                     on_gap: Callable[[str, int], None] | None = None) -> EventBus:
+    """
+    Creates the event bus configured by EVENT_BUS.
+
+    Args:
+        deliver (Callable[[bytes, int], None]): Called with every event received from
+            the bus and its shared sequence number.
+        backend (str): "memory", "postgres" or "unix".
+        on_gap (Callable[[str, int], None] | None): Called with the stream id and the
+            current sequence number on start and when events may have been lost.
+
+    Returns:
+        EventBus: The (not yet started) event bus.
+    """
+    if backend == "memory":
+        return InProcessEventBus(deliver, on_gap=on_gap)
+    if backend == "postgres":
+        dsn = EVENT_BUS_DATABASE_URL or os.getenv("DATABASE_URL")
+        return PostgresEventBus(deliver, dsn, on_gap=on_gap)
+    if backend == "unix":
+        return UnixSocketEventBus(deliver, on_gap=on_gap)
+    raise ValueError(f"Unknown event bus backend: {backend}")
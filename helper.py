@@ -1,67 +1,364 @@
+import base64
+import os
+
 from models import *
 from fastapi import HTTPException
 from datetime import datetime, timedelta
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 
+from database import time_bucket
+from capacity import BUCKET_MINUTES, bucket_start, capacity_cache, is_bucket_start, limits_at
+from slot_index import slot_index
 
-def check_slot_limit(order: OrderChicken, db):
-    errors = []
-    print(order.date)
-    matching_slot = db.query(SlotDB).filter(
-        SlotDB.range_start <= order.date,
-        SlotDB.range_end >= order.date
-    ).first()
+# Anzahl alternativer Zeitfenster bei überschrittenen Mengen
+SLOT_SUGGESTIONS = int(os.getenv("SLOT_SUGGESTIONS", 3))
+
+
+def check_slot_limit(order: OrderChicken, db, reserve: bool = False):
+    """
+    Checks an order against the open slots (looked up in the slot index) and the
+    quantity limits of its bucket (quarter-hour by default, see SLOT_BUCKET_MINUTES).
+
+    The limits come from the compiled per-day limits (config and capacity profiles),
+    the used quantities from the capacity ledger (one row per bucket) instead of
+    summing up every order in the slot. With ``reserve=True`` the requested
+    quantities are booked on the ledger with a single conditional UPDATE that only
+    matches while the limits still hold, so concurrent requests cannot oversell a slot.
+    The reservation is part of the caller's transaction and is undone by its rollback.
+
+    Args:
+        order (OrderChicken): The order (or ORM order) to check.
+        db (Session): The database session of the current request.
+        reserve (bool): Book the quantities on the ledger if the order fits.
+
+    Raises:
+        HTTPException: 400 with all violated limits, 500 if no config exists. If a
+            quantity limit is exceeded, the detail also lists the nearest buckets
+            that could take the order ("suggestions").
+    """
+    errors = _slot_errors(db, order)
+
+    limits = limits_at(db, order.date)
+    if limits is None:
+        raise HTTPException(status_code=500, detail="Keine Mengen-Konfiguration gefunden")
+
+    bucket = bucket_start(order.date)
+    _ensure_capacity_row(db, bucket)
+
+    if reserve and not errors and _reserve_capacity(db, bucket, order, limits):
+        return
+
+    used = db.execute(
+        select(SlotCapacityDB.chicken, SlotCapacityDB.nuggets, SlotCapacityDB.fries)
+        .where(SlotCapacityDB.bucket == bucket)
+    ).one()
+    errors += _limit_errors(order, tuple(used), limits)
+
+    if errors:
+        detail = {"success": False, "errors": errors}
+        if any(error["code"] in LIMIT_CODES for error in errors):
+            detail["suggestions"] = suggest_slots(order, db)
+        raise HTTPException(status_code=400, detail=detail)
+
+    if reserve:
+        # Capacity was released between the conditional update and the read, try again.
+        check_slot_limit(order, db, reserve=True)
+
+async def check_slot_limit_async(order: OrderChicken, db, reserve: bool = False):
+    """
+    Async variant of check_slot_limit for an AsyncSession. The checks run on the
+    session's async connection, so they do not block the event loop.
+    """
+    await db.run_sync(lambda session: check_slot_limit(order, session, reserve=reserve))
+
+def check_batch_limits(orders: list[OrderChicken], db, atomic: bool = True) -> list[list[dict]]:
+    """
+    Checks a batch of orders against the slots and quantity limits and books the
+    admitted ones on the capacity ledger.
+
+    All affected ledger rows are seeded and read (locked on Postgres) with one query
+    each, then the orders are admitted in input order against the running totals, so
+    later orders see the quantities of earlier ones. Finally every touched bucket is
+    booked with one conditional UPDATE. With ``atomic=True`` nothing is booked as soon
+    as a single order fails.
+
+    Args:
+        orders (list[OrderChicken]): The orders to check.
+        db (Session): The database session of the current request.
+        atomic (bool): All-or-nothing instead of best-effort.
+
+    Returns:
+        list[list[dict]]: The errors of every order (empty if it was admitted).
+
+    Raises:
+        HTTPException: 500 if no config exists, 409 if the ledger changed concurrently.
+    """
+    errors = [_slot_errors(db, order) for order in orders]
+
+    limits = []
+    for order in orders:
+        order_limits = limits_at(db, order.date)
+        if order_limits is None:
+            raise HTTPException(status_code=500, detail="Keine Mengen-Konfiguration gefunden")
+        limits.append(order_limits)
+
+    buckets = [bucket_start(order.date) for order in orders]
+    if not buckets:
+        return errors
+    _ensure_capacity_rows(db, buckets)
+
+    rows = db.execute(
+        select(SlotCapacityDB.bucket, SlotCapacityDB.chicken, SlotCapacityDB.nuggets, SlotCapacityDB.fries)
+        .where(SlotCapacityDB.bucket.in_(set(buckets)))
+        .with_for_update()
+    )
+    used = {row.bucket: (row.chicken, row.nuggets, row.fries) for row in rows}
+
+    # Zu buchende Mengen je Zeitraster: (bucket, limits, chicken, nuggets, fries)
+    booked: dict[datetime, list] = {}
+    for index, order in enumerate(orders):
+        key = buckets[index].replace(tzinfo=None)
+        errors[index] += _limit_errors(order, used[key], limits[index])
+        if errors[index]:
+            continue
+        amounts = (order.chicken, order.nuggets, order.fries)
+        used[key] = tuple(a + b for a, b in zip(used[key], amounts))
+        entry = booked.setdefault(key, [buckets[index], limits[index], 0, 0, 0])
+        for offset, amount in enumerate(amounts, start=2):
+            entry[offset] += amount
+
+    if atomic and any(errors):
+        return errors
+
+    for bucket, bucket_limits, chicken, nuggets, fries in booked.values():
+        delta = OrderChicken.model_construct(chicken=chicken, nuggets=nuggets, fries=fries)
+        if not _reserve_capacity(db, bucket, delta, bucket_limits):
+            raise HTTPException(
+                status_code=409,
+                detail="Kapazität wurde gleichzeitig geändert, bitte erneut versuchen"
+            )
+    return errors
+
+async def check_batch_limits_async(orders: list[OrderChicken], db, atomic: bool = True) -> list[list[dict]]:
+    """
+    Async variant of check_batch_limits for an AsyncSession.
+    """
+    return await db.run_sync(lambda session: check_batch_limits(orders, session, atomic=atomic))
+
+def release_slot_capacity(db, date: datetime, chicken: int, nuggets: int, fries: int):
+    """
+    Gives the quantities of an order back to the capacity ledger of its bucket.
+
+    Must be called in the same transaction that deletes the order or moves it away
+    from its previous time/quantities.
 
+    Args:
+        db (Session): The database session of the current request.
+        date (datetime): The (previous) pickup time of the order.
+        chicken (int): The (previous) amount of chicken.
+        nuggets (int): The (previous) amount of nuggets.
+        fries (int): The (previous) amount of fries.
+    """
+    if date is None:
+        return
 
-    if not matching_slot:
+    bucket = bucket_start(date)
+    _ensure_capacity_row(db, bucket)
+    db.execute(
+        update(SlotCapacityDB)
+        .where(SlotCapacityDB.bucket == bucket)
+        .values(
+            chicken=SlotCapacityDB.chicken - (chicken or 0),
+            nuggets=SlotCapacityDB.nuggets - (nuggets or 0),
+            fries=SlotCapacityDB.fries - (fries or 0),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+async def release_slot_capacity_async(db, date: datetime, chicken: int, nuggets: int, fries: int):
+    """
+    Async variant of release_slot_capacity for an AsyncSession.
+    """
+    await db.run_sync(release_slot_capacity, date, chicken, nuggets, fries)
+
+def reservation_window(from_time: datetime | None, to_time: datetime | None) -> list:
+    """
+    Filter conditions for table reservations that overlap the window [from_time, to_time].
+    Either bound may be omitted.
+
+    Returns:
+        list: Conditions for a WHERE clause or a relationship loader.
+    """
+    conditions = []
+    if from_time is not None:
+        conditions.append(TableReservationDB.end >= from_time)
+    if to_time is not None:
+        conditions.append(TableReservationDB.start <= to_time)
+    return conditions
+
+LIMIT_CODES = (LimitCode.CHICKEN, LimitCode.NUGGETS, LimitCode.FRIES)
+
+def suggest_slots(order: OrderChicken, db, limit: int = SLOT_SUGGESTIONS) -> list[str]:
+    """
+    Returns the buckets nearest to the order's time, within the open slots of
+    that day, that can still take its quantities. Looked up in the cached capacity
+    snapshot of the day, not with a query per candidate.
+
+    Returns:
+        list[str]: ISO timestamps, nearest first.
+    """
+    snapshot = capacity_cache.get(db, order.date.date())
+    if snapshot is None:
+        return []
+    at = order.date.replace(tzinfo=None)
+    suggestions = snapshot.suggest(at, order.chicken, order.nuggets, order.fries, limit)
+    return [suggestion.isoformat() for suggestion in suggestions]
+
+def encode_cursor(date: datetime | None, id: int) -> str:
+    """
+    Opaque keyset cursor for the position after an order, see decode_cursor().
+    """
+    value = f"{date.isoformat() if date else ''}|{id}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime | None, int]:
+    """
+    Reads a cursor created by encode_cursor().
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed.
+    """
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date, id = value.split("|")
+        return (datetime.fromisoformat(date) if date else None), int(id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+
+def orm_to_dict(obj) -> dict:
+    """
+    Returns the column values of an ORM object as a plain dict, without the
+    SQLAlchemy instance state. Values are not JSON-encoded yet.
+    """
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
+def _slot_errors(db, order: OrderChicken) -> list[dict]:
+    errors = []
+    if not slot_index.find(db, order.date):
         errors.append({
             "code": LimitCode.SLOT,
             "detail": "Bestellzeit liegt außerhalb der verfügbaren Slots"
         })
 
-    if not _is_quarter_hour(order.date):
+    if not is_bucket_start(order.date):
         errors.append({
             "code": LimitCode.TIME,
-            "detail": "Uhrzeit muss auf eine Viertelstunde liegen (z. B. 12:15)"
+            "detail": (
+                "Uhrzeit muss auf eine Viertelstunde liegen (z. B. 12:15)" if BUCKET_MINUTES == 15
+                else f"Uhrzeit muss auf dem {BUCKET_MINUTES}-Minuten-Raster liegen"
+            )
         })
+    return errors
 
-    config = db.query(ConfigChickenDB).first()
-    if not config:
-        raise HTTPException(status_code=500, detail="Keine Mengen-Konfiguration gefunden")
+def _limit_errors(order: OrderChicken, used: tuple[int, int, int], limits: tuple[int, int, int]) -> list[dict]:
+    used_chicken, used_nuggets, used_fries = used
+    max_chicken, max_nuggets, max_fries = limits
+    errors = []
+
+    if order.chicken > 0 and used_chicken + order.chicken > max_chicken:
+        errors.append({
+            "code": LimitCode.CHICKEN,
+            "detail": "Maximale Hähnchenmenge für dieses Zeitfenster überschritten."
+        })
+
+    if order.nuggets > 0 and used_nuggets + order.nuggets > max_nuggets:
+        errors.append({
+            "code": LimitCode.NUGGETS,
+            "detail": "Maximale Nuggetsmenge für dieses Zeitfenster überschritten."
+        })
 
-    slot_start = order.date.replace(minute=(order.date.minute // 15) * 15, second=0, microsecond=0)
-    slot_end = slot_start + timedelta(minutes=15)
+    if order.fries > 0 and used_fries + order.fries > max_fries:
+        errors.append({
+            "code": LimitCode.FRIES,
+            "detail": "Maximale Pommesmenge für dieses Zeitfenster überschritten."
+        })
+    return errors
 
-    orders_in_slot = db.query(OrderChickenDB).filter(
-        OrderChickenDB.date >= slot_start,
-        OrderChickenDB.date < slot_end
-    ).all()   
-    
+def _reserve_capacity(db, bucket: datetime, order: OrderChicken, limits: tuple[int, int, int]) -> bool:
+    max_chicken, max_nuggets, max_fries = limits
+    conditions = [SlotCapacityDB.bucket == bucket]
     if order.chicken > 0:
-        used_chicken = sum(o.chicken for o in orders_in_slot)
-        if used_chicken + order.chicken > config.chicken:
-            errors.append({
-                "code": LimitCode.CHICKEN,
-                "detail": "Maximale Hähnchenmenge für dieses Zeitfenster überschritten."
-            })
-
+        conditions.append(SlotCapacityDB.chicken + order.chicken <= max_chicken)
     if order.nuggets > 0:
-        used_nuggets = sum(o.nuggets for o in orders_in_slot)
-        if used_nuggets + order.nuggets > config.nuggets:
-            errors.append({
-                "code": LimitCode.NUGGETS,
-                "detail": "Maximale Nuggetsmenge für dieses Zeitfenster überschritten."
-            })
-
+        conditions.append(SlotCapacityDB.nuggets + order.nuggets <= max_nuggets)
     if order.fries > 0:
-        used_fries = sum(o.fries for o in orders_in_slot)
-        if used_fries + order.fries > config.fries:
-            errors.append({
-                "code": LimitCode.FRIES,
-                "detail": "Maximale Pommesmenge für dieses Zeitfenster überschritten."
-            })
+        conditions.append(SlotCapacityDB.fries + order.fries <= max_fries)
 
-    if errors:
-        raise HTTPException(status_code=400, detail={"success": False, "errors": errors})
+    result = db.execute(
+        update(SlotCapacityDB)
+        .where(*conditions)
+        .values(
+            chicken=SlotCapacityDB.chicken + order.chicken,
+            nuggets=SlotCapacityDB.nuggets + order.nuggets,
+            fries=SlotCapacityDB.fries + order.fries,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def _ensure_capacity_row(db, bucket: datetime):
+    """
+    Creates the ledger row of a bucket on first use, seeded with the sums of the
+    orders that already exist in it. Concurrent creators are resolved by the primary key.
+    """
+    _ensure_capacity_rows(db, [bucket])
+
+def _ensure_capacity_rows(db, buckets):
+    """
+    Batch version of _ensure_capacity_row: seeds all missing ledger rows from one
+    grouped query over the orders and inserts them with one statement.
+    """
+    buckets = set(buckets)
+    existing = set(db.execute(
+        select(SlotCapacityDB.bucket).where(SlotCapacityDB.bucket.in_(buckets))
+    ).scalars())
+    missing = buckets - existing
+    if not missing:
+        return
+
+    step = timedelta(minutes=BUCKET_MINUTES)
+    bucket_column = time_bucket(OrderChickenDB.date, BUCKET_MINUTES).label("bucket")
+    totals = {
+        row.bucket: row
+        for row in db.execute(
+            select(
+                bucket_column,
+                func.coalesce(func.sum(OrderChickenDB.chicken), 0).label("chicken"),
+                func.coalesce(func.sum(OrderChickenDB.nuggets), 0).label("nuggets"),
+                func.coalesce(func.sum(OrderChickenDB.fries), 0).label("fries"),
+            )
+            .where(or_(*[
+                and_(OrderChickenDB.date >= bucket, OrderChickenDB.date < bucket + step)
+                for bucket in missing
+            ]))
+            .group_by(bucket_column)
+        )
+    }
+
+    rows = []
+    for bucket in sorted(missing):
+        row = totals.get(bucket.replace(tzinfo=None))
+        rows.append({
+            "bucket": bucket,
+            "chicken": row.chicken if row else 0,
+            "nuggets": row.nuggets if row else 0,
+            "fries": row.fries if row else 0,
+        })
 
-def _is_quarter_hour(dt: datetime) -> bool:
-    return dt.minute in [0, 15, 30, 45]
\ No newline at end of file
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    db.execute(
+        dialect.insert(SlotCapacityDB)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=[SlotCapacityDB.bucket])
+    )
@@ -0,0 +1,131 @@
+import logging
+import sys
+from datetime import UTC, datetime
+from typing import Callable, NamedTuple
+
+from sqlalchemy import inspect, select, text
+
+from models import Base, OrderChickenDB, SchemaVersionDB, SlotDB, TableReservationDB
+
+logger = logging.getLogger(__name__)
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    # Wird mit der Connection der laufenden Transaktion aufgerufen
+    apply: Callable
+
+def _initial_schema(conn):
+    # Legt nur fehlende Tabellen an; bestehende Installationen bleiben unverändert
+    Base.metadata.create_all(bind=conn)
+
+def _hot_path_indexes(conn):
+    for index in (
+        *OrderChickenDB.__table__.indexes,
+        *TableReservationDB.__table__.indexes,
+        *SlotDB.__table__.indexes,
+    ):
+        if index.name in HOT_PATH_INDEXES:
+            index.create(bind=conn, checkfirst=True)
+
+# Indizes für die Abfragen von Bestellungen, Reservierungen und Slots
+HOT_PATH_INDEXES = (
+    "ix_orders_date_id",
+    "ix_orders_status_date",
+    "ix_table_reservation_table_id_start",
+    "ix_slots_range",
+)
+
+# Nur anhängen, nie umnummerieren. Migrationen müssen auf einem frischen Schema
+# (nach _initial_schema) ebenso laufen wie auf einem alten, also idempotent sein.
+MIGRATIONS = [
+    Migration(1, "initial schema", _initial_schema),
+    Migration(2, "hot path indexes", _hot_path_indexes),
+]
+
+def current_version(engine) -> int:
+    if not inspect(engine).has_table(SchemaVersionDB.__tablename__):
+        return 0
+    with engine.connect() as conn:
+        versions = conn.execute(select(SchemaVersionDB.version)).scalars().all()
+    return max(versions, default=0)
+
+def pending_migrations(engine) -> list[Migration]:
+    version = current_version(engine)
+    return [migration for migration in MIGRATIONS if migration.version > version]
+
+def migrate(engine) -> list[int]:
+    """
+    Applies all pending migrations, each in its own transaction together with its
+    schema_version row.
+
+    On Postgres the creation of the schema_version table and the migrations are
+    serialized with an advisory lock, so several workers may call this at startup. Indexes are created with a plain CREATE INDEX,
+    which blocks writes on the table while it is built; run large migrations
+    explicitly (``python migrations.py``) before deploying.
+
+    Returns:
+        list[int]: The versions that were applied.
+    """
+    with engine.begin() as conn:
+        # Unter der Sperre, sonst scheitern gleichzeitig startende Worker an CREATE TABLE
+        _lock(conn)
+        SchemaVersionDB.__table__.create(bind=conn, checkfirst=True)
+
+    applied = []
+    for migration in MIGRATIONS:
+        with engine.begin() as conn:
+            _lock(conn)
+            done = conn.execute(
+                select(SchemaVersionDB.version).where(SchemaVersionDB.version == migration.version)
+            ).first()
+            if done:
+                continue
+            logger.info("Applying migration %d: %s", migration.version, migration.name)
+            migration.apply(conn)
+            conn.execute(SchemaVersionDB.__table__.insert().values(
+                version=migration.version,
+                name=migration.name,
+                applied_at=datetime.now(UTC).replace(tzinfo=None),
+            ))
+            applied.append(migration.version)
+    return applied
+
+def _lock(conn):
+    # Bis zum Ende der Transaktion; andere Worker warten hier
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('schema_version'))"))
+
+def missing_indexes(engine) -> list[str]:
+    """
+    Compares the indexes declared on the models with the database.
+
+    Returns:
+        list[str]: "table.index" for every declared index that does not exist,
+        including indexes of missing tables.
+    """
+    inspector = inspect(engine)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        existing = set()
+        if inspector.has_table(table.name):
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing += [f"{table.name}.{index.name}" for index in table.indexes if index.name not in existing]
+    return sorted(missing)
+
+if __name__ == "__main__":
+    # python migrations.py        ->  ausstehende Migrationen anwenden
+    # python migrations.py check  ->  ausstehende Migrationen und fehlende Indizes melden
+    from database import engine
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "check":
+        pending = pending_migrations(engine)
+        missing = missing_indexes(engine)
+        for migration in pending:
+            print(f"pending migration {migration.version}: {migration.name}")
+        for index in missing:
+            print(f"missing index {index}")
+        sys.exit(1 if pending or missing else 0)
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"applied: {migrate(engine) or 'nothing'}")
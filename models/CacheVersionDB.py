@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String
+
+from models.Base import Base
+
+class CacheVersionDB(Base):
+    __tablename__ = "cache_version"
+
+    # Name des Caches, z. B. "slots"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,30 @@
+import datetime
+from pydantic import BaseModel, ConfigDict, model_validator
+from typing import Optional
+
+class CapacityProfile(BaseModel):
+    """
+    Overrides the global quantity limits for part of the day.
+
+    A profile applies to a slot (``slot_id``), to a time-of-day range
+    (``time_start``/``time_end``, end exclusive), optionally only on one ``date``,
+    or to a combination of these. Limits left empty keep the underlying value.
+    More specific profiles win: slot before date before general.
+    """
+    id: Optional[int] = None
+    name: Optional[str] = None
+    slot_id: Optional[int] = None
+    date: Optional[datetime.date] = None
+    time_start: Optional[datetime.time] = None
+    time_end: Optional[datetime.time] = None
+    chicken: Optional[int] = None
+    nuggets: Optional[int] = None
+    fries: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @model_validator(mode="after")
+    def check_time_range(self):
+        if self.time_start and self.time_end and self.time_end <= self.time_start:
+            raise ValueError("time_end must be after time_start")
+        return self
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, String, Time
+from models.Base import Base
+
+class CapacityProfileDB(Base):
+    __tablename__ = "capacity_profile"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    name = Column(String)
+    slot_id = Column(Integer, ForeignKey("slots.id", ondelete="CASCADE"), nullable=True, index=True)
+    date = Column(Date, nullable=True, index=True)
+    time_start = Column(Time, nullable=True)
+    time_end = Column(Time, nullable=True)
+    chicken = Column(Integer, nullable=True)
+    nuggets = Column(Integer, nullable=True)
+    fries = Column(Integer, nullable=True)
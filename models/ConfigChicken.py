@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 
@@ -9,3 +9,10 @@ class ConfigChicken(BaseModel):
     nuggets: int
     fries: int
 
+class ConfigChickenResponse(BaseModel):
+    id: int
+    chicken: Optional[int] = None
+    nuggets: Optional[int] = None
+    fries: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
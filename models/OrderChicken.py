@@ -1,8 +1,10 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 from enum import Enum
 
+from models.UtcDatetime import UtcDatetime
+
 class OrderStatus(str, Enum):
     CREATED = "CREATED"
     CHECKED_IN = "CHECKED_IN"
@@ -19,11 +21,31 @@ class OrderChicken(BaseModel):
     lastname: str
     mail: str
     phonenumber: str
-    date: datetime  
+    date: UtcDatetime
     chicken: int
     nuggets: int
     fries: int
     miscellaneous: str
     status: OrderStatus = OrderStatus.CREATED
     price: float
+    checked_in_at: Optional[UtcDatetime] = None
+
+class OrderResponse(BaseModel):
+    """
+    An order as stored. GET /orders may return only some of these fields (see ``fields``).
+    """
+    id: int
+    firstname: Optional[str] = None
+    lastname: Optional[str] = None
+    mail: Optional[str] = None
+    phonenumber: Optional[str] = None
+    date: Optional[datetime] = None
+    chicken: Optional[int] = None
+    nuggets: Optional[int] = None
+    fries: Optional[int] = None
+    miscellaneous: Optional[str] = None
+    status: Optional[str] = None
+    price: Optional[float] = None
     checked_in_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,8 +1,14 @@
 from models.Base import Base
-from sqlalchemy import Column, String, Integer, DateTime, Numeric
+from sqlalchemy import Column, Index, String, Integer, DateTime, Numeric
 
 class OrderChickenDB(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Keyset-Paginierung von GET /orders
+        Index("ix_orders_date_id", "date", "id"),
+        # Statusfilter (Küche, Check-in), innerhalb des Status nach Zeit
+        Index("ix_orders_status_date", "status", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     firstname = Column(String)
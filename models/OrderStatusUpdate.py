@@ -0,0 +1,21 @@
+from pydantic import BaseModel, model_validator
+from typing import Optional
+
+from models.OrderChicken import OrderStatus
+from models.UtcDatetime import UtcDatetime
+
+class OrderStatusUpdate(BaseModel):
+    """
+    Moves several orders to a new status at once. The orders are selected either
+    by ``ids``, by the bucket starting at ``time`` or by the slot ``slot_id``.
+    """
+    status: OrderStatus
+    ids: Optional[list[int]] = None
+    time: Optional[UtcDatetime] = None
+    slot_id: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if sum(value is not None for value in (self.ids, self.time, self.slot_id)) != 1:
+            raise ValueError("exactly one of ids, time or slot_id is required")
+        return self
@@ -0,0 +1,17 @@
+import datetime
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional
+
+from models.OrderChicken import OrderStatus
+
+class OrderSubscription(BaseModel):
+    """
+    Filter a /ws/orders client sends to receive only matching order events.
+    Fields left empty match every event.
+    """
+    statuses: Optional[list[OrderStatus]] = None
+    date: Optional[datetime.date] = None
+    from_time: Optional[datetime.time] = Field(default=None, alias="from")
+    to_time: Optional[datetime.time] = Field(default=None, alias="to")
+
+    model_config = ConfigDict(populate_by_name=True)
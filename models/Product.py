@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 class Product(BaseModel):
@@ -6,3 +6,11 @@ class Product(BaseModel):
     product: str
     price: float
     name: str
+
+class ProductResponse(BaseModel):
+    id: int
+    product: Optional[str] = None
+    price: Optional[float] = None
+    name: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
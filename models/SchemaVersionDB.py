@@ -0,0 +1,11 @@
+from sqlalchemy import Column, DateTime, Integer, String
+
+from models.Base import Base
+
+class SchemaVersionDB(Base):
+    __tablename__ = "schema_version"
+
+    # Nummer der angewendeten Migration (siehe migrations.py)
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime, nullable=False)
@@ -1,7 +1,15 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import date, datetime
 
 class Slot(BaseModel):
     date: date
     range_start: datetime
     range_end: datetime
+
+class SlotResponse(BaseModel):
+    id: int
+    date: date
+    range_start: datetime
+    range_end: datetime
+
+    model_config = ConfigDict(from_attributes=True)
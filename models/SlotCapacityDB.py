@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, DateTime
+
+from models.Base import Base
+
+class SlotCapacityDB(Base):
+    __tablename__ = "slot_capacity"
+
+    bucket = Column(DateTime, primary_key=True)
+    chicken = Column(Integer, nullable=False, default=0)
+    nuggets = Column(Integer, nullable=False, default=0)
+    fries = Column(Integer, nullable=False, default=0)
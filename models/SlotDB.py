@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, Text, Date, DateTime
+from sqlalchemy import Column, Index, Integer, Text, Date, DateTime
 from models.Base import Base
 
 class SlotDB(Base):
     __tablename__ = "slots"
+    __table_args__ = (
+        # Slot-Suche nach Zeitpunkt/Zeitraum
+        Index("ix_slots_range", "range_start", "range_end"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date)
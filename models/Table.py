@@ -1,6 +1,14 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
 
 class Table(BaseModel):
     id: int
     name: str
     seats: int
+
+class TableResponse(BaseModel):
+    id: int
+    name: Optional[str] = None
+    seats: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
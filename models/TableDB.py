@@ -9,4 +9,8 @@ class TableDB(Base):
     name = Column(String)
     seats = Column(Integer)
 
-    reservations = relationship("TableReservationDB", back_populates="table")
\ No newline at end of file
+    reservations = relationship(
+        "TableReservationDB",
+        back_populates="table",
+        order_by="TableReservationDB.start"
+    )
\ No newline at end of file
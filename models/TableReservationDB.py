@@ -1,9 +1,13 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, DateTime
 from sqlalchemy.orm import relationship
 from models.Base import Base
 
 class TableReservationDB(Base):
     __tablename__ = "table_reservation"
+    __table_args__ = (
+        # Reservierungen eines Tisches in einem Zeitfenster
+        Index("ix_table_reservation_table_id_start", "table_id", "start"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     table_id = Column(Integer, ForeignKey("table.id"))
@@ -0,0 +1,18 @@
+from datetime import UTC, datetime
+from typing import Annotated
+
+from pydantic import AfterValidator
+
+def naive_utc(dt: datetime | None) -> datetime | None:
+    """
+    Converts a datetime to naive UTC, as stored in the ``TIMESTAMP WITHOUT TIME ZONE``
+    columns. asyncpg rejects timezone-aware values for these columns, so every value
+    must pass through here before it is bound (e.g. ``...Z`` from JS ``toISOString()``).
+    Naive values are taken as UTC already and returned unchanged.
+    """
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(UTC).replace(tzinfo=None)
+
+# datetime aus dem Request, beim Validieren nach naivem UTC umgerechnet
+UtcDatetime = Annotated[datetime, AfterValidator(naive_utc)]
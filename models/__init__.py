@@ -1,16 +1,24 @@
 from .Base import Base
-from .ConfigChicken import ConfigChicken
+from .CacheVersionDB import CacheVersionDB
+from .CapacityProfile import CapacityProfile
+from .CapacityProfileDB import CapacityProfileDB
+from .ConfigChicken import ConfigChicken, ConfigChickenResponse
 from .ConfigChickenDB import ConfigChickenDB
 from .LimitCode import LimitCode
-from .OrderChicken import OrderChicken
+from .OrderChicken import OrderChicken, OrderResponse
 from .OrderChickenDB import OrderChickenDB
-from .Product import Product
+from .OrderStatusUpdate import OrderStatusUpdate
+from .OrderSubscription import OrderSubscription
+from .Product import Product, ProductResponse
 from .ProductDB import ProductDB
-from .Slot import Slot
+from .Slot import Slot, SlotResponse
 from .SlotDB import SlotDB
+from .SlotCapacityDB import SlotCapacityDB
+from .SchemaVersionDB import SchemaVersionDB
 from .User import User, UserCreate, Token
 from .UserDB import UserDB
-from .Table import Table
+from .UtcDatetime import UtcDatetime, naive_utc
+from .Table import Table, TableResponse
 from .TableDB import TableDB
 from .TableReservation import TableReservation
 from .TableReservationDB import TableReservationDB
@@ -0,0 +1,196 @@
+import threading
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import select
+
+from cache_version import CACHE_VERSION_CHECK_SECONDS, read_version
+from models import TableDB, TableReservationDB
+
+# Auflösung der Belegung: 96 Viertelstunden pro Tag
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+def _slot(dt: datetime) -> int:
+    """Absolute slot number of the slot containing ``dt``."""
+    return dt.toordinal() * SLOTS_PER_DAY + (dt.hour * 60 + dt.minute) // SLOT_MINUTES
+
+def slot_range(start: datetime, end: datetime) -> tuple[int, int]:
+    """
+    Absolute slot numbers [first, last) covered by the interval [start, end).
+
+    Partially covered slots count as occupied; an empty interval (start == end)
+    occupies the slot containing ``start``.
+    """
+    first = _slot(start)
+    last = _slot(end)
+    if (end.minute % SLOT_MINUTES, end.second, end.microsecond) != (0, 0, 0):
+        last += 1
+    return first, max(last, first + 1)
+
+def day_masks(start: datetime, end: datetime) -> dict[date, int]:
+    """
+    Splits the interval [start, end) into one slot bitmask per day (see slot_range()).
+
+    Returns:
+        dict[date, int]: Bit i of a day's mask stands for the i-th quarter-hour of that day.
+    """
+    first, last = slot_range(start, end)
+
+    masks = {}
+    for day in range(first // SLOTS_PER_DAY, (last - 1) // SLOTS_PER_DAY + 1):
+        offset = day * SLOTS_PER_DAY
+        lo = max(first, offset) - offset
+        hi = min(last, offset + SLOTS_PER_DAY) - offset
+        masks[date.fromordinal(day)] = ((1 << (hi - lo)) - 1) << lo
+    return masks
+
+class OccupancyIndex:
+    """
+    In-memory occupancy of all tables as one 96-bit bitmap per table and day.
+
+    Days are loaded lazily with a single query and then kept up to date by the
+    reservation routes (add() after a create, invalidate() after an update or
+    delete). The table list is cached as well and dropped by the table routes.
+
+    Like a VersionedCache, the index is shared between workers through the
+    "reservations" version: writers call bump_version(db, occupancy.name) in their
+    transaction and pass the new version to add()/invalidate()/invalidate_tables(),
+    and every worker drops its bitmaps within ``check_seconds`` after another worker
+    changed reservations or tables.
+    """
+
+    name = "reservations"
+
+    def __init__(self, check_seconds: float = CACHE_VERSION_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self._days: dict[date, dict[int, int]] = {}
+        self._tables: list[tuple[int, str, int]] | None = None
+        self._lock = threading.Lock()
+        # Wird bei jeder Änderung erhöht; Ladevorgänge, die eine Änderung überlappen, werden nicht gecacht
+        self._generation = 0
+        self._version = None
+        self._checked_at = 0.0
+
+    def available_tables(self, db, seats: int, start: datetime, end: datetime) -> list[dict]:
+        """
+        Returns the tables with at least ``seats`` seats that are free during [start, end),
+        smallest tables first.
+        """
+        self._check_version(db)
+        masks = day_masks(start, end)
+        bitmaps = [(self._day(db, day), mask) for day, mask in masks.items()]
+        return [
+            {"id": table_id, "name": name, "seats": table_seats}
+            for table_id, name, table_seats in self._get_tables(db)
+            if table_seats >= seats
+            and not any(day.get(table_id, 0) & mask for day, mask in bitmaps)
+        ]
+
+    def is_free(self, db, table_id: int, start: datetime, end: datetime, exclude_id: int | None = None) -> bool:
+        """
+        Checks a table for conflicting reservations before a write.
+
+        The affected days of the table are read fresh from the database (ignoring the
+        reservation ``exclude_id``, i.e. the one being updated), so the check holds
+        even if another worker changed them.
+        """
+        for day, mask in day_masks(start, end).items():
+            if self._load_day(db, day, table_id, exclude_id).get(table_id, 0) & mask:
+                return False
+        return True
+
+    def add(self, table_id: int, start: datetime, end: datetime, version: int | None = None):
+        """
+        Marks [start, end) as occupied on the cached days of the table.
+
+        ``version`` is the version this worker's write bumped to; if the index was
+        current before, it stays current and no other day is dropped.
+        """
+        with self._lock:
+            self._generation += 1
+            self._advance(version)
+            for day, mask in day_masks(start, end).items():
+                if day in self._days:
+                    self._days[day][table_id] = self._days[day].get(table_id, 0) | mask
+
+    def invalidate(self, start: datetime | None = None, end: datetime | None = None, version: int | None = None):
+        """
+        Drops the cached days of [start, end), or all days if no interval is given.
+        ``version`` as in add().
+        """
+        with self._lock:
+            self._generation += 1
+            self._advance(version)
+            if start is None:
+                self._days.clear()
+                return
+            for day in day_masks(start, end or start):
+                self._days.pop(day, None)
+
+    def invalidate_tables(self, version: int | None = None):
+        with self._lock:
+            self._generation += 1
+            self._advance(version)
+            self._tables = None
+
+    def _advance(self, version: int | None):
+        # Nur die eigene Änderung: Stand davor war aktuell, also bleibt der Cache gültig
+        if version is not None and self._version == version - 1:
+            self._version = version
+
+    def _check_version(self, db):
+        now = clock.monotonic()
+        if now - self._checked_at < self.check_seconds:
+            return
+        version = read_version(db, self.name)
+        with self._lock:
+            self._checked_at = now
+            if version != self._version:
+                # Reservierungen oder Tische wurden (ggf. von einem anderen Worker) geändert
+                self._generation += 1
+                self._days.clear()
+                self._tables = None
+                self._version = version
+
+    def _day(self, db, day: date) -> dict[int, int]:
+        bitmaps = self._days.get(day)
+        if bitmaps is None:
+            generation = self._generation
+            bitmaps = self._load_day(db, day)
+            with self._lock:
+                if generation == self._generation:
+                    bitmaps = self._days.setdefault(day, bitmaps)
+        return bitmaps
+
+    def _load_day(self, db, day: date, table_id: int | None = None, exclude_id: int | None = None) -> dict[int, int]:
+        day_start = datetime.combine(day, time())
+        query = select(TableReservationDB.table_id, TableReservationDB.start, TableReservationDB.end).where(
+            TableReservationDB.start < day_start + timedelta(days=1),
+            TableReservationDB.end >= day_start
+        )
+        if table_id is not None:
+            query = query.where(TableReservationDB.table_id == table_id)
+        if exclude_id is not None:
+            query = query.where(TableReservationDB.id != exclude_id)
+
+        bitmaps: dict[int, int] = {}
+        for row in db.execute(query):
+            mask = day_masks(row.start, row.end).get(day, 0)
+            bitmaps[row.table_id] = bitmaps.get(row.table_id, 0) | mask
+        return bitmaps
+
+    def _get_tables(self, db) -> list[tuple[int, str, int]]:
+        tables = self._tables
+        if tables is None:
+            generation = self._generation
+            rows = db.execute(
+                select(TableDB.id, TableDB.name, TableDB.seats).order_by(TableDB.seats.asc(), TableDB.id.asc())
+            )
+            tables = [(row.id, row.name, row.seats or 0) for row in rows]
+            with self._lock:
+                if generation == self._generation:
+                    self._tables = tables
+        return tables
+
+occupancy = OccupancyIndex()
@@ -0,0 +1,44 @@
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from cache_version import VersionedCache
+from models import ProductDB
+
+CENT = Decimal("0.01")
+
+class PriceTable(VersionedCache):
+    """
+    Unit prices by product name (lower case) as Decimal, shared by all pricing
+    paths. Reloaded when the product version changes (see VersionedCache).
+    """
+
+    name = "prices"
+
+    def load(self, db) -> dict[str, Decimal]:
+        rows = db.execute(select(ProductDB.product, ProductDB.price))
+        return {
+            row.product.lower(): Decimal(row.price or 0)
+            for row in rows
+            if row.product
+        }
+
+price_table = PriceTable()
+
+def price_order(prices: dict[str, Decimal], order) -> Decimal:
+    """
+    Calculates the total price of an order with exact decimal arithmetic.
+
+    Args:
+        prices (dict[str, Decimal]): The unit prices from the price table.
+        order (OrderChicken): The order (or ORM order) to price.
+
+    Returns:
+        Decimal: The total, rounded to cents.
+    """
+    total = (
+        (order.chicken or 0) * prices.get("chicken", Decimal(0)) +
+        (order.nuggets or 0) * prices.get("nuggets", Decimal(0)) +
+        (order.fries or 0) * prices.get("fries", Decimal(0))
+    )
+    return total.quantize(CENT)
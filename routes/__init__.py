@@ -5,4 +5,5 @@ from .products_route import products_router
 from .config_route import config_router
 from .slot_route import slot_router
 from .table_route import table_router
-from .table_reservation_route import table_reservation_router
\ No newline at end of file
+from .table_reservation_route import table_reservation_router
+from .capacity_route import capacity_router
\ No newline at end of file
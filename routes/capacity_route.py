@@ -0,0 +1,131 @@
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from cache_version import bump_version
+from capacity import capacity_cache, invalidate_limits, limits_cache, profile_days
+from database import get_db
+from models import *
+
+capacity_router = APIRouter(
+    # prefix="/users",
+    tags=["Capacity"]
+)
+
+@capacity_router.get("/capacity", tags=["Capacity"])
+def get_capacity(day: date = Query(..., alias="date"), db: Session = Depends(get_db)):
+    """
+    Returns the remaining chicken, nuggets and fries for every quarter-hour of a day
+    that lies inside an open slot, so the order form can grey out full times
+    without validating every choice.
+
+    The snapshot is cached until the next order write on that day.
+
+    Args:
+        day (date): The day, e.g. "2025-10-11".
+
+    Returns:
+        dict: The configured limits and the remaining quantities per quarter-hour.
+    """
+    try:
+        snapshot = capacity_cache.get(db, day)
+        if snapshot is None:
+            raise HTTPException(status_code=500, detail="Keine Mengen-Konfiguration gefunden")
+        return snapshot.to_dict()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _invalidate_profile(db: Session, version: int, *profiles):
+    affected = []
+    for profile in profiles:
+        days = profile_days(db, profile)
+        if days is None:
+            invalidate_limits(version=version)
+            return
+        affected.extend(days)
+    if affected:
+        invalidate_limits(*affected, version=version)
+
+
+@capacity_router.get("/capacity-profiles", tags=["Capacity"])
+def get_capacity_profiles(db: Session = Depends(get_db)):
+    
+    try:
+        profiles = db.query(CapacityProfileDB).order_by(CapacityProfileDB.id.asc()).all()
+        return [CapacityProfile.model_validate(profile) for profile in profiles]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@capacity_router.post("/capacity-profiles", tags=["Capacity"])
+def create_capacity_profile(profile: CapacityProfile, db: Session = Depends(get_db)):
+    """
+    Creates a capacity profile. Only the compiled limits of the days it applies to are rebuilt.
+    """
+    try:
+        if profile.slot_id is not None and not db.get(SlotDB, profile.slot_id):
+            raise HTTPException(status_code=400, detail="Slot not found")
+
+        db_profile = CapacityProfileDB(**profile.model_dump(exclude={"id"}))
+        db.add(db_profile)
+        version = bump_version(db, limits_cache.name)
+        db.commit()
+        db.refresh(db_profile)
+        _invalidate_profile(db, version, db_profile)
+        return {"success": True, "profile": CapacityProfile.model_validate(db_profile)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@capacity_router.put("/capacity-profiles/{id}", tags=["Capacity"])
+def update_capacity_profile(id: int, profile: CapacityProfile, db: Session = Depends(get_db)):
+    
+    try:
+        db_profile = db.get(CapacityProfileDB, id)
+        if not db_profile:
+            raise HTTPException(status_code=404, detail="Capacity profile not found")
+        if profile.slot_id is not None and not db.get(SlotDB, profile.slot_id):
+            raise HTTPException(status_code=400, detail="Slot not found")
+
+        previous = CapacityProfile.model_validate(db_profile)
+        for field, value in profile.model_dump(exclude={"id"}).items():
+            setattr(db_profile, field, value)
+
+        version = bump_version(db, limits_cache.name)
+        db.commit()
+        db.refresh(db_profile)
+        _invalidate_profile(db, version, previous, db_profile)
+        return {"success": True, "profile": CapacityProfile.model_validate(db_profile)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@capacity_router.delete("/capacity-profiles/{id}", tags=["Capacity"])
+def delete_capacity_profile(id: int, db: Session = Depends(get_db)):
+    
+    try:
+        db_profile = db.get(CapacityProfileDB, id)
+        if not db_profile:
+            raise HTTPException(status_code=404, detail="Capacity profile not found")
+
+        previous = CapacityProfile.model_validate(db_profile)
+        db.delete(db_profile)
+        version = bump_version(db, limits_cache.name)
+        db.commit()
+        _invalidate_profile(db, version, previous)
+        return {"success": True}
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
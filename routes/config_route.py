@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
+from cache_version import bump_version
+from capacity import invalidate_limits, limits_cache
 from database import get_db
 from models import *
 
@@ -10,14 +12,14 @@ config_router = APIRouter(
     tags=["Config"]
 )
 
-@config_router.get("/config/{id}", tags=["Config"])
+@config_router.get("/config/{id}", tags=["Config"], response_model=ConfigChickenResponse)
 def get_config(id: int, db: Session = Depends(get_db)):
     
     try:
         product = db.query(ConfigChickenDB).filter(ConfigChickenDB.id == id).first()
         if not product:
             raise HTTPException(status_code=404, detail="Config not found")
-        return product.__dict__
+        return product
     except Exception:
         raise
     except Exception as e:
@@ -34,8 +36,10 @@ def update_config(id: int, config: ConfigChicken = None, db: Session = Depends(g
         for field, value in config.model_dump(exclude_unset=True).items():
             setattr(db_config, field, value)
 
+        version = bump_version(db, limits_cache.name)
         db.commit()
         db.refresh(db_config)
+        invalidate_limits(version=version)
         return {"success": True, "updated_config": db_config.__dict__}
     except Exception:
         raise
@@ -52,7 +56,9 @@ def delete_config(id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Config not found")
 
         db.delete(db_config)
+        version = bump_version(db, limits_cache.name)
         db.commit()
+        invalidate_limits(version=version)
         return {"success": True, "message": f"Config with ID {id} deleted"}
     except Exception:
         raise
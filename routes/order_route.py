@@ -1,16 +1,29 @@
-
-from datetime import UTC, datetime, timedelta
-
-from fastapi import APIRouter, Depends, HTTPException,Query
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import DateTime, cast
+import csv
+import io
+import os
+from collections import defaultdict
+from datetime import UTC, date as date_type, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, insert, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from database import get_db
+from capacity import BUCKET_MINUTES, bucket_start, capacity_cache
+from database import SessionLocal, get_async_db, get_db, time_bucket
 from models import *
 
-from helper import check_slot_limit
+from helper import check_batch_limits_async, check_slot_limit, check_slot_limit_async, decode_cursor, encode_cursor, orm_to_dict, release_slot_capacity, release_slot_capacity_async
+from pricing import price_order, price_table
 from routes.websocket import broadcast_order_event
+from serialization import encode_json, json_response
+
+# Größte Seite für GET /orders?limit=
+ORDERS_PAGE_MAX = int(os.getenv("ORDERS_PAGE_MAX", 1000))
+# Zeilen pro Datenbank-Batch beim Export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
 
 order_router = APIRouter(
     # prefix="/users",
@@ -18,7 +31,7 @@ order_router = APIRouter(
 )
 
 @order_router.post("/order", tags=["Order"])
-async def create_order(order: OrderChicken, db: Session = Depends(get_db)):
+async def create_order(order: OrderChicken, db: AsyncSession = Depends(get_async_db)):
     """
     Creates a new order and calculates its total price.
 
@@ -29,25 +42,19 @@ async def create_order(order: OrderChicken, db: Session = Depends(get_db)):
         dict: A success flag and the created order with calculated price.
     """
     try:
-        check_slot_limit(order, db)
-
-        products = db.query(ProductDB).all()
-        price_map = {p.product.lower(): float(p.price) for p in products}
+        await check_slot_limit_async(order, db, reserve=True)
 
-        total_price = (
-            order.chicken * price_map.get("chicken", 0) +
-            order.nuggets * price_map.get("nuggets", 0) +
-            order.fries * price_map.get("fries", 0)
-        )
+        total_price = price_order(await price_table.get_async(db), order)
 
         db_order = OrderChickenDB(**{k: v for k, v in order.model_dump().items() if k != "id"})
         db_order.price = total_price
 
         db.add(db_order)
-        db.commit()
-        db.refresh(db_order)
+        await db.commit()
+        await db.refresh(db_order)
+        capacity_cache.invalidate(db_order.date)
 
-        clean_order = jsonable_encoder(db_order)
+        clean_order = orm_to_dict(db_order)
         await broadcast_order_event(f"ORDER_{order.status}", clean_order)
 
         return {
@@ -56,39 +63,311 @@ async def create_order(order: OrderChicken, db: Session = Depends(get_db)):
         }
 
     except HTTPException as http_exc:
-        db.rollback()
+        await db.rollback()
         raise http_exc
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        db.close()
+        await db.close()
+
+@order_router.post("/orders/batch", tags=["Order"])
+async def create_orders_batch(
+    orders: list[OrderChicken],
+    mode: str = Query("atomic", pattern="^(atomic|best_effort)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Creates several orders at once.
+
+    The capacity of all affected buckets is checked and booked together and the orders
+    are inserted with one statement. One ORDER_BATCH_CREATED event is sent per status
+    and pickup time, carrying ``status`` and ``date`` so subscriptions can filter it.
+
+    Args:
+        orders (list[OrderChicken]): The orders, validated in one pass.
+        mode (str): "atomic" creates all orders or none, "best_effort" creates every
+            order that fits and reports the others.
 
-@order_router.get("/orders", tags=["Order"])
-def get_orders(status: str = Query(None), db: Session = Depends(get_db)):
+    Returns:
+        dict: A success flag, the number of created orders and one result per order
+        (in input order) with either the created order or its errors.
+
+    Raises:
+        HTTPException: 400 with the per-order results if an atomic batch fails.
     """
-    Retrieves all orders, optionally filtered by status.
+    try:
+        errors = await check_batch_limits_async(orders, db, atomic=mode == "atomic")
+        results = [
+            {"index": index, "success": False, "errors": order_errors}
+            for index, order_errors in enumerate(errors)
+        ]
+
+        if mode == "atomic" and any(errors):
+            await db.rollback()
+            raise HTTPException(status_code=400, detail={"success": False, "results": results})
+
+        admitted = [index for index, order_errors in enumerate(errors) if not order_errors]
+        created = []
+        if admitted:
+            prices = await price_table.get_async(db)
+            rows = [
+                {
+                    **{k: v for k, v in orders[index].model_dump().items() if k != "id"},
+                    "price": price_order(prices, orders[index])
+                }
+                for index in admitted
+            ]
+            created = (await db.scalars(
+                insert(OrderChickenDB).returning(OrderChickenDB, sort_by_parameter_order=True),
+                rows
+            )).all()
+        await db.commit()
+
+        clean_orders = [orm_to_dict(order) for order in created]
+        for index, clean_order in zip(admitted, clean_orders):
+            results[index] = {"index": index, "success": True, "order": clean_order}
+
+        if clean_orders:
+            capacity_cache.invalidate(*{order["date"] for order in clean_orders})
+            groups = defaultdict(list)
+            for clean_order in clean_orders:
+                groups[(clean_order["status"], clean_order["date"])].append(clean_order)
+            for (order_status, order_date), group in groups.items():
+                await broadcast_order_event("ORDER_BATCH_CREATED", {
+                    "status": order_status,
+                    "date": order_date,
+                    "count": len(group),
+                    "orders": group
+                })
+
+        return {
+            "success": len(clean_orders) == len(orders),
+            "created": len(clean_orders),
+            "results": results
+        }
+
+    except HTTPException:
+        await db.rollback()
+        raise
+
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await db.close()
+
+@order_router.post("/orders/status", tags=["Order"])
+async def update_orders_status(change: OrderStatusUpdate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Moves several orders (e.g. a whole bucket) to a new status with one UPDATE.
+
+    Orders that already have the target status are left alone. Moving to CHECKED_IN
+    sets ``checked_in_at`` like PUT /order/{id}. One ORDER_STATUS_CHANGED event per
+    bucket lists the affected ids, with the bucket as ``date`` so date-subscribed
+    clients only get their day; prices and capacity are not touched.
+
+    Args:
+        change (OrderStatusUpdate): The target status and the selection (ids, time or slot).
+
+    Returns:
+        dict: A success flag, the new status and the ids of the updated orders.
+
+    Raises:
+        HTTPException: 404 if the slot does not exist.
+    """
+    try:
+        conditions = [OrderChickenDB.status != change.status.value]
+        if change.ids is not None:
+            conditions.append(OrderChickenDB.id.in_(change.ids))
+        elif change.time is not None:
+            bucket = bucket_start(change.time)
+            conditions += [
+                OrderChickenDB.date >= bucket,
+                OrderChickenDB.date < bucket + timedelta(minutes=BUCKET_MINUTES)
+            ]
+        else:
+            slot = await db.get(SlotDB, change.slot_id)
+            if not slot:
+                raise HTTPException(status_code=404, detail="Slot not found")
+            conditions.append(OrderChickenDB.date.between(slot.range_start, slot.range_end))
+
+        values = {"status": change.status.value}
+        if change.status.value == "CHECKED_IN":
+            values["checked_in_at"] = naive_utc(datetime.now(UTC))
+
+        rows = (await db.execute(
+            update(OrderChickenDB)
+            .where(*conditions)
+            .values(**values)
+            .returning(OrderChickenDB.id, OrderChickenDB.date)
+            .execution_options(synchronize_session=False)
+        )).all()
+        await db.commit()
+
+        # Ein Event je Zeitraster, damit Clients mit Datums-/Zeitfilter nur ihre Bestellungen sehen
+        groups = defaultdict(list)
+        for row in rows:
+            groups[bucket_start(row.date) if row.date else None].append(row.id)
+        for bucket, group in groups.items():
+            event = {"status": change.status.value, "ids": sorted(group)}
+            if bucket is not None:
+                event["date"] = bucket
+            await broadcast_order_event("ORDER_STATUS_CHANGED", event)
+
+        return {"success": True, "status": change.status.value, "ids": sorted(row.id for row in rows)}
+
+    except HTTPException:
+        await db.rollback()
+        raise
+
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await db.close()
+
+@order_router.get("/orders", tags=["Order"], response_model=list[OrderResponse])
+def get_orders(
+    status: str = Query(None),
+    from_time: Optional[datetime] = Query(None, alias="from"),
+    to_time: Optional[datetime] = Query(None, alias="to"),
+    fields: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=ORDERS_PAGE_MAX),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Retrieves orders sorted by date and id, optionally filtered and paginated.
+
+    Only the requested columns are selected (as plain rows, no ORM objects). With a
+    ``limit`` the result is one page; if more orders follow, the ``X-Next-Cursor``
+    response header holds the cursor for the next page (keyset on date and id).
 
     Args:
         status (str, optional): Filter orders by their status.
+        from (datetime, optional): Only orders picked up at or after this time.
+        to (datetime, optional): Only orders picked up at or before this time.
+        fields (str, optional): Comma-separated columns to return, e.g. "id,lastname,status".
+        limit (int, optional): Page size; all matching orders if omitted.
+        cursor (str, optional): The X-Next-Cursor of the previous page.
 
     Returns:
         list: A list of order dictionaries.
     """
     try:
-        query = db.query(OrderChickenDB)
+        columns = OrderChickenDB.__table__.c
+        if fields:
+            names = [name.strip() for name in fields.split(",") if name.strip()]
+            unknown = [name for name in names if name not in columns]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unbekannte Felder: {', '.join(unknown)}")
+        else:
+            names = list(columns.keys())
+        # id und date werden immer gelesen, für den Cursor
+        selected = list(dict.fromkeys(["id", "date", *names]))
+
+        query = select(*(columns[name] for name in selected))
         if status:
-            query = query.filter(OrderChickenDB.status == status)
-        orders = query.all()
-        return [order.__dict__ for order in orders]
+            query = query.where(OrderChickenDB.status == status)
+        if from_time is not None:
+            query = query.where(OrderChickenDB.date >= from_time)
+        if to_time is not None:
+            query = query.where(OrderChickenDB.date <= to_time)
+        if cursor:
+            after_date, after_id = decode_cursor(cursor)
+            if after_date is None:
+                # Bestellungen ohne Datum stehen vorne
+                query = query.where(or_(
+                    OrderChickenDB.date.is_not(None),
+                    OrderChickenDB.id > after_id
+                ))
+            else:
+                query = query.where(tuple_(OrderChickenDB.date, OrderChickenDB.id) > (after_date, after_id))
+
+        query = query.order_by(OrderChickenDB.date.asc().nulls_first(), OrderChickenDB.id.asc())
+        if limit:
+            query = query.limit(limit + 1)
+        rows = db.execute(query).all()
+
+        headers = {}
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(rows[-1].date, rows[-1].id)
+
+        return json_response([{name: row._mapping[name] for name in names} for row in rows], headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         print("Error in /orders:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         db.close()
 
-@order_router.get("/order/{id}", tags=["Order"])
+@order_router.get("/orders/export", tags=["Order"])
+def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    date: Optional[date_type] = Query(None),
+    status: str = Query(None)
+):
+    """
+    Streams orders as NDJSON (one JSON object per line) or CSV, sorted by date and id.
+
+    Rows are read in batches of EXPORT_BATCH_SIZE through a server-side cursor and
+    written out batch by batch, so memory use does not grow with the number of orders.
+
+    Args:
+        format (str): "ndjson" or "csv".
+        date (date, optional): Only orders picked up on this day.
+        status (str, optional): Filter orders by their status.
+
+    Returns:
+        StreamingResponse: The orders with all OrderChickenDB columns.
+    """
+    columns = list(OrderChickenDB.__table__.c)
+    query = select(*columns).order_by(OrderChickenDB.date.asc().nulls_first(), OrderChickenDB.id.asc())
+    if date is not None:
+        day_start = datetime.combine(date, datetime.min.time())
+        query = query.where(OrderChickenDB.date >= day_start, OrderChickenDB.date < day_start + timedelta(days=1))
+    if status:
+        query = query.where(OrderChickenDB.status == status)
+
+    names = [column.key for column in columns]
+    encode = _ndjson_rows if format == "ndjson" else _csv_rows
+
+    def stream():
+        # Eigene Session: die Antwort wird erst nach dem Ende des Requests geschrieben
+        db = SessionLocal()
+        try:
+            if format == "csv":
+                yield _csv_rows(names, [names])
+            result = db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            for rows in result.partitions():
+                yield encode(names, rows)
+        finally:
+            db.close()
+
+    filename = f"orders-{date.isoformat() if date else 'all'}.{format}"
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson" if format == "ndjson" else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _ndjson_rows(names: list[str], rows) -> bytes:
+    return b"".join(encode_json(dict(zip(names, row))) + b"\n" for row in rows)
+
+def _csv_rows(names: list[str], rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        ["" if value is None else value.isoformat() if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode("utf-8")
+
+@order_router.get("/order/{id}", tags=["Order"], response_model=OrderResponse)
 def get_order(id: str, db: Session = Depends(get_db)):
     """
     Deletes an order by its ID.
@@ -145,31 +424,40 @@ def get_order_summary(date: str = Query(...), interval: str = Query(...), db: Se
             end_time = datetime.strptime(f"{date} {end_str}", "%Y-%m-%d %H:%M")
         except Exception as e:
             raise HTTPException(status_code=400, detail="Ungültiges Zeitfenster")
+        # Auf das Bestellraster abrunden, die Summen sind nach Rasterbeginn gruppiert
+        start_time = bucket_start(start_time)
 
-        # Intervall alle 15 Minuten
+        # Intervall im Bestellraster (Standard: 15 Minuten)
         time_slots = []
         current = start_time
         while current <= end_time:
             time_slots.append(current)
-            current += timedelta(minutes=15)
-
-        # Datenbankabfrage
-        orders = db.query(OrderChickenDB).filter(
-            cast(OrderChickenDB.date, DateTime) >= start_time,
-            cast(OrderChickenDB.date, DateTime) <= end_time
-        ).all()
-
-        # Aggregation
+            current += timedelta(minutes=BUCKET_MINUTES)
+
+        # Aggregation in der Datenbank, gruppiert nach Viertelstunde
+        bucket = time_bucket(OrderChickenDB.date, BUCKET_MINUTES).label("bucket")
+        rows = db.query(
+            bucket,
+            func.coalesce(func.sum(OrderChickenDB.chicken), 0).label("chicken"),
+            func.coalesce(func.sum(OrderChickenDB.nuggets), 0).label("nuggets"),
+            func.coalesce(func.sum(OrderChickenDB.fries), 0).label("fries"),
+        ).filter(
+            OrderChickenDB.date >= start_time,
+            OrderChickenDB.date <= end_time
+        ).group_by(bucket).all()
+        sums = {row.bucket: row for row in rows}
+
+        # Leere Viertelstunden mit 0 auffüllen
         result = []
         total_chicken = 0
         total_nuggets = 0
         total_fries = 0
 
         for slot in time_slots:
-            slot_end = slot + timedelta(minutes=15)
-            chicken_count = sum(order.chicken for order in orders if slot <= order.date < slot_end)
-            nuggets_count = sum(order.nuggets for order in orders if slot <= order.date < slot_end)
-            fries_count = sum(order.fries for order in orders if slot <= order.date < slot_end)
+            row = sums.get(slot)
+            chicken_count = int(row.chicken) if row else 0
+            nuggets_count = int(row.nuggets) if row else 0
+            fries_count = int(row.fries) if row else 0
 
             total_chicken += chicken_count
             total_nuggets += nuggets_count
@@ -199,7 +487,7 @@ def get_order_summary(date: str = Query(...), interval: str = Query(...), db: Se
         db.close()
 
 @order_router.put("/order/{id}", tags=["Order"])
-async def update_order(id: int, updated_order: OrderChicken, db: Session = Depends(get_db)):
+async def update_order(id: int, updated_order: OrderChicken, db: AsyncSession = Depends(get_async_db)):
     """
     Updates an existing order and recalculates its price.
 
@@ -211,7 +499,7 @@ async def update_order(id: int, updated_order: OrderChicken, db: Session = Depen
         dict: A success flag and the updated order.
     """
     try:
-        order = db.query(OrderChickenDB).filter(OrderChickenDB.id == id).first()
+        order = await db.get(OrderChickenDB, id)
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
         
@@ -219,40 +507,37 @@ async def update_order(id: int, updated_order: OrderChicken, db: Session = Depen
             order.checked_in_at = None
         
 
-        products = db.query(ProductDB).all()
-        price_map = {p.product.lower(): float(p.price) for p in products}
-
-        total_price = 0.0
-        total_price += updated_order.chicken * price_map.get("chicken", 0)
-        total_price += updated_order.nuggets * price_map.get("nuggets", 0)
-        total_price += updated_order.fries * price_map.get("fries", 0)
+        total_price = price_order(await price_table.get_async(db), updated_order)
 
         previous_status = order.status
+        previous_date = order.date
+        await release_slot_capacity_async(db, order.date, order.chicken, order.nuggets, order.fries)
 
         for key, value in updated_order.model_dump(exclude_unset=True).items():
             setattr(order, key, value)
 
-        check_slot_limit(order, db)
+        await check_slot_limit_async(order, db, reserve=True)
 
         order.price = total_price
 
         if updated_order.status == "CHECKED_IN" and previous_status != "CHECKED_IN":
-            order.checked_in_at = datetime.now(UTC)
+            order.checked_in_at = naive_utc(datetime.now(UTC))
 
-        db.commit()
-        db.refresh(order)
+        await db.commit()
+        await db.refresh(order)
+        capacity_cache.invalidate(previous_date, order.date)
 
-        clean_order = jsonable_encoder(order)
+        clean_order = orm_to_dict(order)
 
         await broadcast_order_event(f"ORDER_{updated_order.status}", clean_order)
 
         return {"success": True, "order": clean_order}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print("Update error:", str(e))
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        db.close()
+        await db.close()
 
 # Bestellung löschen
 @order_router.delete("/order/{id}", tags=["Order"])
@@ -271,8 +556,10 @@ def delete_order(id: str, db: Session = Depends(get_db)):
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
 
+        release_slot_capacity(db, order.date, order.chicken, order.nuggets, order.fries)
         db.delete(order)
         db.commit()
+        capacity_cache.invalidate(order.date)
         return {"success": True}
     except Exception as e:
         db.rollback()
@@ -292,18 +579,12 @@ def calculate_order_price(order: OrderChicken, db: Session = Depends(get_db)):
         dict: The calculated price.
     """
     try:
-        products = db.query(ProductDB).all()
         if order.checked_in_at == "":
             order.checked_in_at = None
 
-        price_map = {p.product.lower(): float(p.price) for p in products}
-
-        total_price = 0.0
-        total_price += order.chicken * price_map.get("chicken", 0)
-        total_price += order.nuggets * price_map.get("nuggets", 0)
-        total_price += order.fries * price_map.get("fries", 0)
+        total_price = price_order(price_table.get(db), order)
 
-        return {"price": round(total_price, 2)}
+        return {"price": float(total_price)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from cache_version import bump_version
 from database import get_db
 from models import *
+from pricing import price_table
+from serialization import json_rows
 
 
 products_router = APIRouter(
@@ -10,7 +14,7 @@ products_router = APIRouter(
     tags=["Products"]
 )
 
-@products_router.get("/products", tags=["Products"])
+@products_router.get("/products", tags=["Products"], response_model=list[ProductResponse])
 def get_products(db: Session = Depends(get_db)):
     """
     Retrieves all available products.
@@ -19,12 +23,14 @@ def get_products(db: Session = Depends(get_db)):
         list: A list of product dictionaries.
     """
     try:
-        products = db.query(ProductDB).order_by(ProductDB.id.asc()).all()
-        return [product.__dict__ for product in products]
+        products = db.execute(
+            select(ProductDB.id, ProductDB.product, ProductDB.price, ProductDB.name).order_by(ProductDB.id.asc())
+        )
+        return json_rows(products)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@products_router.get("/product/{id}", tags=["Products"])
+@products_router.get("/product/{id}", tags=["Products"], response_model=ProductResponse)
 def get_product(id: int, db: Session = Depends(get_db)):
     """
     Retrieves a single product by its ID.
@@ -39,7 +45,7 @@ def get_product(id: int, db: Session = Depends(get_db)):
         product = db.query(ProductDB).filter(ProductDB.id == id).first()
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
-        return product.__dict__
+        return product
     except HTTPException:
         raise
     except Exception as e:
@@ -59,8 +65,10 @@ def create_product(product: Product, db: Session = Depends(get_db)):
     db_product = ProductDB(**{k: v for k, v in product.model_dump().items() if k != "id"})
     try:
         db.add(db_product)
+        bump_version(db, price_table.name)
         db.commit()
         db.refresh(db_product)
+        price_table.invalidate()
         return db_product.__dict__
     except Exception as e:
         db.rollback()
@@ -86,8 +94,10 @@ def update_product(id: int, updated_product: Product, db: Session = Depends(get_
         product.product = updated_product.product
         product.price = updated_product.price
 
+        bump_version(db, price_table.name)
         db.commit()
         db.refresh(product)
+        price_table.invalidate()
 
         return {
             "success": True,
@@ -125,7 +135,9 @@ def delete_product(id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Product not found")
 
         db.delete(product)
+        bump_version(db, price_table.name)
         db.commit()
+        price_table.invalidate()
         return {"success": True}
     except HTTPException:
         raise
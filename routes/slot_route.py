@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import asc
 from sqlalchemy.orm import Session
 
+from cache_version import bump_version
+from capacity import invalidate_limits, limits_cache, span_days
 from database import get_db
+from slot_index import slot_index
 from models import *
+from serialization import json_response
 
 
 slot_router = APIRouter(
@@ -11,23 +14,24 @@ slot_router = APIRouter(
     tags=["Config"]
 )
 
-@slot_router.get("/slots", tags=["Slot"])
+@slot_router.get("/slots", tags=["Slot"], response_model=list[SlotResponse])
 def get_all_slots(db: Session = Depends(get_db)):
-    
+    """
+    Returns all slots ordered by start, served from the in-memory slot index.
+    """
     try:
-        slots = db.query(SlotDB).order_by(asc(SlotDB.range_start)).all()
-        return [slot.__dict__ for slot in slots]
+        return json_response([slot.to_dict() for slot in slot_index.all(db)])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@slot_router.get("/slots/{id}", tags=["Slot"])
+@slot_router.get("/slots/{id}", tags=["Slot"], response_model=SlotResponse)
 def get_slot(id: int, db: Session = Depends(get_db)):
     
     try:
         slot = db.query(SlotDB).filter(SlotDB.id == id).first()
         if not slot:
             raise HTTPException(status_code=404, detail="Slot not found")
-        return slot.__dict__
+        return slot
     except Exception:
         raise
     except Exception as e:
@@ -39,8 +43,12 @@ def create_slot(slot: Slot, db: Session = Depends(get_db)):
     try:
         new_slot = SlotDB(**slot.model_dump(exclude_unset=True))
         db.add(new_slot)
+        bump_version(db, slot_index.name)
+        version = bump_version(db, limits_cache.name)
         db.commit()
         db.refresh(new_slot)
+        slot_index.invalidate()
+        invalidate_limits(*span_days(new_slot.range_start, new_slot.range_end), version=version)
         return {"success": True, "created_slot": new_slot.__dict__}
     except Exception as e:
         db.rollback()
@@ -54,11 +62,16 @@ def update_slot(id: int, slot: Slot, db: Session = Depends(get_db)):
         if not db_slot:
             raise HTTPException(status_code=404, detail="Slot not found")
 
+        previous_days = span_days(db_slot.range_start, db_slot.range_end)
         for field, value in slot.model_dump(exclude_unset=True).items():
             setattr(db_slot, field, value)
 
+        bump_version(db, slot_index.name)
+        version = bump_version(db, limits_cache.name)
         db.commit()
         db.refresh(db_slot)
+        slot_index.invalidate()
+        invalidate_limits(*previous_days, *span_days(db_slot.range_start, db_slot.range_end), version=version)
         return {"success": True, "updated_slot": db_slot.__dict__}
     except Exception:
         raise
@@ -75,7 +88,11 @@ def delete_slot(id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Slot not found")
 
         db.delete(db_slot)
+        bump_version(db, slot_index.name)
+        version = bump_version(db, limits_cache.name)
         db.commit()
+        slot_index.invalidate()
+        invalidate_limits(*span_days(db_slot.range_start, db_slot.range_end), version=version)
         return {"success": True, "message": f"Slot with ID {id} deleted"}
     except Exception:
         raise
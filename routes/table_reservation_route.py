@@ -1,8 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
 
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+
+from cache_version import bump_version
 from database import get_db
+from helper import reservation_window
 from models import *
+from occupancy import SLOTS_PER_DAY, occupancy, slot_range
+from seating import SeatingReservation, SeatingTable, optimize_seating, wasted_seats
 
 table_reservation_router = APIRouter(
     # prefix="/users",
@@ -10,10 +19,27 @@ table_reservation_router = APIRouter(
 )
 
 @table_reservation_router.get("/table-reservations", tags=["TableReservation"])
-def get_table_reservations(db: Session = Depends(get_db)):
+def get_table_reservations(
+    from_time: Optional[datetime] = Query(None, alias="from"),
+    to_time: Optional[datetime] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
+    """
+    Retrieves all reservations with their table, in one query.
+
+    Args:
+        from_time (datetime, optional): Only reservations ending at or after this time.
+        to_time (datetime, optional): Only reservations starting at or before this time.
+    """
     
     try:
-        reservations = db.query(TableReservationDB).order_by(TableReservationDB.start.asc()).all()
+        reservations = (
+            db.query(TableReservationDB)
+            .options(joinedload(TableReservationDB.table))
+            .filter(*reservation_window(from_time, to_time))
+            .order_by(TableReservationDB.start.asc())
+            .all()
+        )
         result = []
         for r in reservations:
             result.append({
@@ -33,11 +59,119 @@ def get_table_reservations(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@table_reservation_router.post("/table-reservations/optimize", tags=["TableReservation"])
+def optimize_table_reservations(
+    day: date = Query(..., alias="date"),
+    apply: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Reassigns the reservations of a day to tables, seating everyone with as few
+    wasted seats as possible (see seating.optimize_seating).
+
+    Without ``apply`` only the proposed changes are returned (dry run). With
+    ``apply`` they are written in one transaction. Reservations that started on
+    the previous day, or start on the next day, stay where they are.
+
+    Args:
+        day (date): The day whose reservations are optimized.
+        apply (bool): Write the new assignment.
+
+    Returns:
+        dict: The proposed (or applied) table changes and the wasted seats before and after.
+    """
+    try:
+        started = time.perf_counter()
+        day_start = datetime.combine(day, datetime.min.time())
+        day_end = day_start + timedelta(days=1)
+        offset = day.toordinal() * SLOTS_PER_DAY
+
+        def mask(start, end):
+            first, last = slot_range(start, end)
+            lo, hi = max(first - offset, 0), last - offset
+            return ((1 << (hi - lo)) - 1) << lo if hi > lo else 0
+
+        reservations = (
+            db.query(TableReservationDB)
+            .filter(TableReservationDB.start >= day_start, TableReservationDB.start < day_end)
+            .order_by(TableReservationDB.start.asc(), TableReservationDB.id.asc())
+            .all()
+        )
+        horizon = max([r.end for r in reservations if r.end] + [day_end])
+
+        # Reservierungen anderer Tage, die in den Zeitraum hineinragen, bleiben fest
+        fixed = {}
+        others = db.execute(
+            select(TableReservationDB.table_id, TableReservationDB.start, TableReservationDB.end).where(
+                TableReservationDB.start < horizon,
+                TableReservationDB.end >= day_start,
+                (TableReservationDB.start < day_start) | (TableReservationDB.start >= day_end)
+            )
+        )
+        for row in others:
+            fixed[row.table_id] = fixed.get(row.table_id, 0) | mask(row.start, row.end)
+
+        tables = [SeatingTable(t.id, t.seats or 0) for t in db.query(TableDB).all()]
+        parties = [SeatingReservation(r.id, r.seats or 0, mask(r.start, r.end)) for r in reservations]
+        current = {r.id: r.table_id for r in reservations}
+        result = optimize_seating(tables, parties, fixed=fixed, initial=current)
+
+        changes = [
+            {
+                "id": r.id,
+                "customer_name": r.customer_name,
+                "seats": r.seats,
+                "start": r.start,
+                "end": r.end,
+                "from_table_id": r.table_id,
+                "to_table_id": result.assignment[r.id]
+            }
+            for r in reservations
+            if result.assignment[r.id] is not None and result.assignment[r.id] != r.table_id
+        ]
+        unplaced = [r.id for r in reservations if result.assignment[r.id] is None]
+
+        if apply:
+            if unplaced:
+                raise HTTPException(status_code=409, detail={
+                    "detail": "Nicht alle Reservierungen lassen sich konfliktfrei platzieren",
+                    "unplaced": unplaced
+                })
+            for r in reservations:
+                r.table_id = result.assignment[r.id]
+            version = bump_version(db, occupancy.name)
+            db.commit()
+            occupancy.invalidate(day_start, horizon, version=version)
+
+        return {
+            "date": day,
+            "applied": apply,
+            "changes": changes,
+            "unplaced": unplaced,
+            "wasted_seats": {
+                "before": wasted_seats(tables, parties, current),
+                "after": result.wasted_seats
+            },
+            "optimal": result.complete,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @table_reservation_router.get("/table-reservations/{id}", tags=["TableReservation"])
 def get_table_reservation(id: int, db: Session = Depends(get_db)):
     
     try:
-        reservation = db.query(TableReservationDB).filter(TableReservationDB.id == id).first()
+        reservation = (
+            db.query(TableReservationDB)
+            .options(joinedload(TableReservationDB.table))
+            .filter(TableReservationDB.id == id)
+            .first()
+        )
         if not reservation:
             raise HTTPException(status_code=404, detail="Reservation not found")
         return {
@@ -62,14 +196,20 @@ def get_table_reservation(id: int, db: Session = Depends(get_db)):
 def create_table_reservation(reservation: TableReservation, db: Session = Depends(get_db)):
     
     try:
-        table = db.query(TableDB).filter(TableDB.id == reservation.table_id).first()
+        # Tischzeile sperren, damit Prüfung und Insert für diesen Tisch nicht parallel laufen
+        table = db.query(TableDB).filter(TableDB.id == reservation.table_id).with_for_update().first()
         if not table:
             raise HTTPException(status_code=400, detail="Table not found")
 
+        if not occupancy.is_free(db, reservation.table_id, reservation.start, reservation.end):
+            raise HTTPException(status_code=409, detail="Tisch ist in diesem Zeitraum bereits reserviert")
+
         db_res = TableReservationDB(**reservation.model_dump())
         db.add(db_res)
+        version = bump_version(db, occupancy.name)
         db.commit()
         db.refresh(db_res)
+        occupancy.add(db_res.table_id, db_res.start, db_res.end, version=version)
         return {
             "success": True,
             "reservation": {
@@ -101,15 +241,23 @@ def update_table_reservation(id: int, updated_reservation: TableReservation, db:
             raise HTTPException(status_code=404, detail="Reservation not found")
 
         if hasattr(updated_reservation, "table_id") and updated_reservation.table_id is not None:
-            table = db.query(TableDB).filter(TableDB.id == updated_reservation.table_id).first()
+            # Zieltisch sperren, damit Prüfung und Update für diesen Tisch nicht parallel laufen
+            table = db.query(TableDB).filter(TableDB.id == updated_reservation.table_id).with_for_update().first()
             if not table:
                 raise HTTPException(status_code=400, detail="Table not found")
 
+        if not occupancy.is_free(db, updated_reservation.table_id, updated_reservation.start, updated_reservation.end, exclude_id=id):
+            raise HTTPException(status_code=409, detail="Tisch ist in diesem Zeitraum bereits reserviert")
+
+        old_start, old_end = res.start, res.end
         for field, value in updated_reservation.model_dump(exclude_unset=True).items():
             setattr(res, field, value)
 
+        version = bump_version(db, occupancy.name)
         db.commit()
         db.refresh(res)
+        occupancy.invalidate(old_start, old_end, version=version)
+        occupancy.invalidate(res.start, res.end, version=version)
         return {
             "success": True,
             "reservation": {
@@ -141,7 +289,9 @@ def delete_table_reservation(id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Reservation not found")
 
         db.delete(res)
+        version = bump_version(db, occupancy.name)
         db.commit()
+        occupancy.invalidate(res.start, res.end, version=version)
         return {"success": True}
     except Exception:
         raise
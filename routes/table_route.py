@@ -9,11 +9,19 @@
 # from models import *
 # from routes.websocket import broadcast_order_event
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
 
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from cache_version import bump_version
 from database import get_db
+from helper import reservation_window
 from models import *
+from occupancy import occupancy
+from serialization import json_rows
 
 table_router = APIRouter(
     # prefix="/users",
@@ -21,19 +29,34 @@ table_router = APIRouter(
 )
 
 @table_router.get("/tables-with-reservations", tags=["Table"])
-def get_tables_with_reservations(db: Session = Depends(get_db)):
+def get_tables_with_reservations(
+    from_time: Optional[datetime] = Query(None, alias="from"),
+    to_time: Optional[datetime] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
     """
     Retrieves all tables with their reservations.
 
+    Tables and reservations are loaded with two queries, regardless of the number of tables.
+
+    Args:
+        from_time (datetime, optional): Only reservations ending at or after this time.
+        to_time (datetime, optional): Only reservations starting at or before this time.
+
     Returns:
         list: A list of tables, each containing an array of reservations.
     """
     
     try:
-        tables = db.query(TableDB).order_by(TableDB.id.asc()).all()
+        window = reservation_window(from_time, to_time)
+        tables = (
+            db.query(TableDB)
+            .options(selectinload(TableDB.reservations.and_(*window)))
+            .order_by(TableDB.id.asc())
+            .all()
+        )
         result = []
         for table in tables:
-            reservations = db.query(TableReservationDB).filter(TableReservationDB.table_id == table.id).order_by(TableReservationDB.start.asc()).all()
             table_data = {
                 "id": table.id,
                 "name": table.name,
@@ -46,7 +69,7 @@ def get_tables_with_reservations(db: Session = Depends(get_db)):
                         "start": r.start,
                         "end": r.end
                     }
-                    for r in reservations
+                    for r in table.reservations
                 ]
             }
             result.append(table_data)
@@ -55,24 +78,53 @@ def get_tables_with_reservations(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@table_router.get("/tables", tags=["Table"])
+@table_router.get("/tables", tags=["Table"], response_model=list[TableResponse])
 def get_tables(db: Session = Depends(get_db)):
     
     try:
-        tables = db.query(TableDB).order_by(TableDB.id.asc()).all()
-        return [table.__dict__ for table in tables]
+        tables = db.execute(select(TableDB.id, TableDB.name, TableDB.seats).order_by(TableDB.id.asc()))
+        return json_rows(tables)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@table_router.get("/tables/availability", tags=["Table"])
+def get_table_availability(
+    start: datetime,
+    end: datetime,
+    seats: int = Query(1, ge=1),
+    db: Session = Depends(get_db)
+):
+    """
+    Finds the tables that are free for a reservation.
+
+    Answered from the in-memory occupancy bitmaps (15-minute resolution); a day is
+    only read from the database the first time it is asked for.
+
+    Args:
+        start (datetime): Start of the requested interval.
+        end (datetime): End of the requested interval.
+        seats (int): Minimum number of seats.
+
+    Returns:
+        list: The free tables with enough seats, smallest first.
+    """
+    if end < start:
+        raise HTTPException(status_code=400, detail="Ende muss nach dem Beginn liegen")
+    try:
+        return occupancy.available_tables(db, seats, start, end)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@table_router.get("/tables/{id}", tags=["Table"])
+@table_router.get("/tables/{id}", tags=["Table"], response_model=TableResponse)
 def get_table(id: int, db: Session = Depends(get_db)):
     
     try:
         table = db.query(TableDB).filter(TableDB.id == id).first()
         if not table:
             raise HTTPException(status_code=404, detail="Table not found")
-        return table.__dict__
+        return table
     except Exception:
         raise
     except Exception as e:
@@ -85,8 +137,10 @@ def create_table(table: Table, db: Session = Depends(get_db)):
     try:
         db_table = TableDB(**{k: v for k, v in table.model_dump().items() if k != "id"})
         db.add(db_table)
+        version = bump_version(db, occupancy.name)
         db.commit()
         db.refresh(db_table)
+        occupancy.invalidate_tables(version=version)
         return db_table.__dict__
     except Exception as e:
         db.rollback()
@@ -104,8 +158,10 @@ def update_table(id: int, updated_table: Table, db: Session = Depends(get_db)):
         for field, value in updated_table.model_dump(exclude_unset=True).items():
             setattr(db_table, field, value)
 
+        version = bump_version(db, occupancy.name)
         db.commit()
         db.refresh(db_table)
+        occupancy.invalidate_tables(version=version)
         return {"success": True, "table": db_table.__dict__}
     except Exception:
         raise
@@ -123,7 +179,9 @@ def delete_table(id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Table not found")
 
         db.delete(db_table)
+        version = bump_version(db, occupancy.name)
         db.commit()
+        occupancy.invalidate_tables(version=version)
         return {"success": True}
     except Exception:
         raise
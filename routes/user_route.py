@@ -1,9 +1,19 @@
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth import create_access_token, get_password_hash, verify_password, verify_token
-from database import get_db
+from auth import (
+    AUTH_EMBED_CLAIMS,
+    auth_cache,
+    create_access_token,
+    decode_token,
+    get_password_hash_async,
+    token_cache_key,
+    verify_password_async,
+    verify_token,
+)
+from database import get_async_db
 from models import *
 
 user_router = APIRouter(
@@ -13,23 +23,30 @@ user_router = APIRouter(
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="user/token")
 
+async def _get_user_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(UserDB).where(UserDB.username == username))
+    return result.scalars().first()
+
 @user_router.post("/user/register", response_model=User, tags=["User"])
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(UserDB).filter(UserDB.username == user.username).first()
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await _get_user_by_username(db, user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     new_user = UserDB(username=user.username, email=user.email, hashed_password=hashed_password, verifyed=False)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @user_router.post("/user/token", response_model=Token, tags=["User"])
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(UserDB).filter(UserDB.username == form_data.username).first()
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await _get_user_by_username(db, form_data.username)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await verify_password_async(form_data.password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -42,47 +59,73 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
             detail="Account not verified",
         )
 
-    access_token = create_access_token(data={"sub": user.username})
+    # Hash mit veralteten Argon2-Parametern transparent erneuern
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+
+    token_data = {"sub": user.username}
+    if AUTH_EMBED_CLAIMS:
+        token_data["usr"] = {"id": user.id, "email": user.email, "verifyed": user.verifyed}
+    access_token = create_access_token(data=token_data)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @user_router.post("/user/change-password", tags=["User"])
-def change_password(username: str, old_password: str, new_password: str, db: Session = Depends(get_db)):
-    user = db.query(UserDB).filter(UserDB.username == username).first()
-    if not user or not verify_password(old_password, user.hashed_password):
+async def change_password(username: str, old_password: str, new_password: str, db: AsyncSession = Depends(get_async_db)):
+    user = await _get_user_by_username(db, username)
+    if not user or not (await verify_password_async(old_password, user.hashed_password))[0]:
         raise HTTPException(status_code=400, detail="Invalid credentials")
     if len(new_password.encode('utf-8')) > 72:
         raise HTTPException(status_code=400, detail="Password must not exceed 72 bytes.")
-    user.hashed_password = get_password_hash(new_password[:72])
-    db.commit()
+    user.hashed_password = await get_password_hash_async(new_password[:72])
+    await db.commit()
+    auth_cache.invalidate_user(username)
     return {"msg": "Password updated successfully"}
 
 @user_router.post("/user/reset-password", tags=["User"])
-def reset_password(token: str, new_password: str, db: Session = Depends(get_db)):
+async def reset_password(token: str, new_password: str, db: AsyncSession = Depends(get_async_db)):
     username = verify_token(token)
     if not username:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
-    user = db.query(UserDB).filter(UserDB.username == username).first()
+    user = await _get_user_by_username(db, username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if len(new_password.encode('utf-8')) > 72:
         raise HTTPException(status_code=400, detail="Password must not exceed 72 bytes.")
-    user.hashed_password = get_password_hash(new_password[:72])
-    db.commit()
+    user.hashed_password = await get_password_hash_async(new_password[:72])
+    await db.commit()
+    auth_cache.invalidate_user(username)
     return {"msg": "Password reset successfully"}
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    username = verify_token(token)
-    if username is None:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """
+    Resolves the authenticated user of a request.
+
+    Tokens with embedded claims (AUTH_EMBED_CLAIMS) need no lookup at all; otherwise
+    the user is served from the auth cache and only loaded from the database on a miss.
+    """
+    payload = decode_token(token)
+    if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(UserDB).filter(UserDB.username == username).first()
+    username = payload["sub"]
+    # Eingebettete Claims nur, wenn sie auch ausgestellt werden; sonst gilt die Datenbank
+    if AUTH_EMBED_CLAIMS and isinstance(payload.get("usr"), dict):
+        return User(username=username, **payload["usr"])
+
+    key = token_cache_key(payload)
+    user = auth_cache.get(key)
     if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
+        db_user = await _get_user_by_username(db, username)
+        if db_user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        user = User.model_validate(db_user)
+        auth_cache.put(key, username, user, payload.get("exp"))
     return user
 
 @user_router.get("/user/me", response_model=User, tags=["User"])
-async def read_users_me(current_user: UserDB = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
\ No newline at end of file
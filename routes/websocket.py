@@ -1,45 +1,565 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-import json
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import NamedTuple
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+
+import orjson
+
+from event_bus import create_event_bus
+from models import OrderSubscription
+from serialization import encode_json
+
+logger = logging.getLogger(__name__)
 
 websocket_router = APIRouter(
     # prefix="/chat",
     tags=["websocket"])
 
-# WebSocket-Verbindungen
-active_connections: list[WebSocket] = []
+# Maximale Anzahl ausstehender Nachrichten pro Client
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "100"))
+# Verhalten bei vollen Queues: "drop_oldest" oder "disconnect"
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+# Anzahl der letzten Events, die für Reconnects vorgehalten werden
+WS_REPLAY_BUFFER_SIZE = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "1000"))
+
+# Frame-Formate, die ein Client per ?encoding= wählen kann
+WS_ENCODINGS = ("json", "binary", "zlib")
+
+class EncodedEvent:
+    """
+    A message encoded once and shared by all recipients.
+
+    The JSON bytes are the single serialized form; the text frame and the
+    zlib-compressed binary frame are derived from them on first use and cached,
+    so each format is produced at most once per event, not once per client.
+    """
+    __slots__ = ("payload", "encode_seconds", "bytes_sent", "_text", "_zlib")
+
+    def __init__(self, payload: bytes, encode_seconds: float = 0.0):
+        self.payload = payload
+        self.encode_seconds = encode_seconds
+        self.bytes_sent = 0
+        self._text = None
+        self._zlib = None
+
+    def frame(self, encoding: str) -> str | bytes:
+        if encoding == "binary":
+            return self.payload
+        if encoding == "zlib":
+            if self._zlib is None:
+                self._zlib = zlib.compress(self.payload)
+            return self._zlib
+        if self._text is None:
+            self._text = self.payload.decode("utf-8")
+        return self._text
+
+class ClientConnection:
+    """
+    A connected WebSocket client with its own bounded outgoing queue.
+
+    Messages are written by a dedicated writer task, so a slow client only
+    fills its own queue and never blocks the publisher or other clients.
+    """
+
+    def __init__(self, websocket: WebSocket, queue_size: int, encoding: str = "json"):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.loop = asyncio.get_running_loop()
+        self.writer: asyncio.Task | None = None
+        self.subscription: OrderSubscription | None = None
+        self.encoding = encoding
+        self.dropped = 0
+        # Anzahl gepufferter Events beim Verbinden; spätere wurden bereits live eingereiht
+        self.buffered_at_connect = 0
+
+class ReplayEntry(NamedTuple):
+    # Laufende Nummer in Eingangsreihenfolge (seq kann über Worker hinweg vertauscht ankommen)
+    position: int
+    seq: int
+    event: EncodedEvent
+    status: str | None
+    date: datetime | None
+
+class Broadcaster:
+    """
+    Fans out messages to all connected WebSocket clients.
+
+    publish() only enqueues the message for every client and returns immediately;
+    the per-client writer tasks send concurrently. Clients whose queue is full are
+    handled according to the slow consumer policy:
+
+    - "drop_oldest": the oldest pending message is discarded.
+    - "disconnect": the client is closed with 1013 (try again later).
+
+    Clients whose socket fails while sending are removed automatically.
+
+    Events are routed through an index from subscribed status/date to clients,
+    so each event is only enqueued for the clients whose subscription matches.
+    Clients without a subscription receive every event.
+
+    Every event carries the ``seq`` the event bus assigned to it on the publishing
+    side and the bus's ``stream`` id; both are the same on every worker. Events are
+    kept in a bounded replay buffer, so a client reconnecting to any worker can
+    fetch exactly the events it missed (see resume()).
+
+    Events arrive as a one-line routing header (status and date, see encode_event())
+    followed by the encoded event, so routing never parses the event itself.
+    Each event is encoded once and the same buffer is shared by all recipients.
+    Encoding time and bytes sent are tracked per event and in total (see stats()).
+    """
+
+    def __init__(self, queue_size: int = WS_QUEUE_SIZE, policy: str = WS_SLOW_CONSUMER_POLICY,
+                 replay_size: int = WS_REPLAY_BUFFER_SIZE):
+        if policy not in ("drop_oldest", "disconnect"):
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.queue_size = queue_size
+        self.policy = policy
+        self.clients: set[ClientConnection] = set()
+        # Subscription-Index; Clients ohne Filter stehen in den "any"-Mengen
+        self.by_status: dict[str, set[ClientConnection]] = defaultdict(set)
+        self.any_status: set[ClientConnection] = set()
+        self.by_date: dict[str, set[ClientConnection]] = defaultdict(set)
+        self.any_date: set[ClientConnection] = set()
+        # Sequenznummern vergibt der Event-Bus; sie gelten innerhalb eines Streams
+        self.stream = uuid.uuid4().hex[:12]
+        self.seq = 0
+        # Kleinstes last_seq, ab dem der Puffer lückenlos ist (steigt beim Verdrängen und nach Lücken)
+        self.floor = 0
+        self.replay_buffer: deque[ReplayEntry] = deque(maxlen=replay_size)
+        self.buffered = 0
+        self._seq_lock = threading.Lock()
+        self._stream_json = encode_json(self.stream)
+        self.events_encoded = 0
+        self.encode_seconds = 0.0
+        self.events_published = 0
+        self.prepare_seconds = 0.0
+        self.bytes_sent = 0
+        # Laufende Hintergrund-Tasks (z. B. Trennen langsamer Clients), damit sie nicht eingesammelt werden
+        self._tasks: set[asyncio.Task] = set()
+
+    async def connect(self, websocket: WebSocket, encoding: str = "json") -> ClientConnection:
+        await websocket.accept()
+        client = ClientConnection(websocket, self.queue_size, encoding)
+        client.writer = asyncio.create_task(self._write(client))
+        with self._seq_lock:
+            client.buffered_at_connect = self.buffered
+            self.clients.add(client)
+        self._index(client)
+        return client
+
+    def subscribe(self, client: ClientConnection, subscription: OrderSubscription):
+        self._unindex(client)
+        client.subscription = subscription
+        self._index(client)
+
+    def send(self, client: ClientConnection, message: dict):
+        """Encodes and enqueues a message for a single client."""
+        self._enqueue(client, EncodedEvent(encode_json(message)))
+
+    def resume(self, client: ClientConnection, last_seq: int, stream: str | None) -> bool:
+        """
+        Enqueues the buffered events after ``last_seq`` that match the client's subscription.
+
+        Events that arrived after the client connected were already enqueued live and
+        are skipped. The replayed events are put in front of the live events the
+        client has not been sent yet, so it receives them in order.
+
+        Args:
+            client (ClientConnection): The reconnected client.
+            last_seq (int): The last sequence number the client has seen.
+            stream (str | None): The stream id the sequence number belongs to.
+
+        Returns:
+            bool: False if the gap cannot be closed from the buffer (other stream,
+            events already evicted), i.e. the client needs a full resync.
+        """
+        with self._seq_lock:
+            entries = list(self.replay_buffer)
+            current_seq = self.seq
+            floor = self.floor
+        if stream != self.stream or not floor <= last_seq <= current_seq:
+            return False
+
+        replay = [
+            entry.event for entry in entries
+            if entry.position < client.buffered_at_connect and entry.seq > last_seq
+            and _matches(client.subscription, entry.status, entry.date)
+        ]
+        if replay:
+            live = []
+            while not client.queue.empty():
+                live.append(client.queue.get_nowait())
+                client.queue.task_done()
+            for event in replay + live:
+                self._enqueue(client, event)
+        return True
+
+    def mark_discontinuous(self, stream: str | None = None, seq: int | None = None):
+        """
+        Marks a gap in the event stream, e.g. when the event bus (re)connected.
+
+        Events up to ``seq`` may have been lost, so the replay buffer cannot close
+        older gaps any more: it is cleared, earlier ``last_seq`` values need a full
+        resync, and all connected clients are sent RESYNC_REQUIRED.
+
+        Args:
+            stream (str | None): The stream id of the event bus, if it changed.
+            seq (int | None): The current sequence number of the event bus.
+        """
+        with self._seq_lock:
+            self.replay_buffer.clear()
+            if stream is not None and stream != self.stream:
+                self.stream = stream
+                self._stream_json = encode_json(stream)
+                self.seq = 0
+            if seq is not None:
+                self.seq = max(self.seq, seq)
+            self.floor = self.seq
+            message = EncodedEvent(encode_json({"event": "RESYNC_REQUIRED", "seq": self.seq, "stream": self.stream}))
+        self._dispatch(self.clients, message)
+
+    async def disconnect(self, client: ClientConnection, code: int | None = None):
+        self.clients.discard(client)
+        self._unindex(client)
+        if client.writer and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+        if code is not None:
+            try:
+                await client.websocket.close(code=code)
+            except Exception:
+                pass
+
+    async def drain(self, timeout: float):
+        """
+        Waits up to ``timeout`` seconds until the queued events are sent, then closes
+        all clients with 1001 (going away), so they reconnect to another worker.
+        """
+        pending = [client.queue.join() for client in self.clients]
+        if pending:
+            try:
+                await asyncio.wait_for(asyncio.gather(*pending), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("WebSocket drain timed out after %.1f s", timeout)
+        for client in list(self.clients):
+            await self.disconnect(client, status.WS_1001_GOING_AWAY)
+
+    def publish(self, message: bytes | str, seq: int | None = None):
+        """
+        Delivers an encoded event (as received from the event bus) to the matching clients.
+
+        Only the routing header is read; ``seq`` and ``stream`` are spliced into the
+        encoded event instead of parsing and serializing it again. Messages without
+        routing header or ``seq`` are sent as they are and not buffered for resume.
+
+        Args:
+            message (bytes | str): The event as built by encode_event().
+            seq (int | None): The sequence number assigned by the event bus.
+        """
+        started = time.perf_counter()
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        header, separator, body = message.partition(b"\n")
+        order_status, order_date = None, None
+        if separator:
+            status_field, _, date_field = header.partition(b"\t")
+            order_status = status_field.decode("utf-8") or None
+            order_date = _parse_datetime(date_field.decode("utf-8"))
+        else:
+            body = message
+
+        if separator and seq is not None and body.startswith(b"{"):
+            with self._seq_lock:
+                self.seq = max(self.seq, seq)
+                encoded = EncodedEvent(b'{"seq":%d,"stream":%s,%s' % (seq, self._stream_json, body[1:]))
+                encoded.encode_seconds = time.perf_counter() - started
+                if len(self.replay_buffer) == self.replay_buffer.maxlen:
+                    # Verdrängte Events lassen sich nicht mehr nachliefern
+                    self.floor = max(self.floor, self.replay_buffer[0].seq)
+                self.replay_buffer.append(ReplayEntry(self.buffered, seq, encoded, order_status, order_date))
+                self.buffered += 1
+        else:
+            encoded = EncodedEvent(body, time.perf_counter() - started)
+        self.events_published += 1
+        self.prepare_seconds += encoded.encode_seconds
+
+        recipients = self._recipients(order_status, order_date)
+        self._dispatch(recipients, encoded)
+
+    def stats(self, recent: int = 10) -> dict:
+        """
+        Returns the totals of encoded and published events, encoding time and bytes
+        sent, plus size, preparation time and bytes sent of the ``recent`` last events.
+        """
+        with self._seq_lock:
+            entries = list(self.replay_buffer)[-recent:] if recent else []
+        return {
+            "clients": len(self.clients),
+            "stream": self.stream,
+            "seq": self.seq,
+            "events_encoded": self.events_encoded,
+            "encode_ms_total": round(self.encode_seconds * 1000, 3),
+            "events_published": self.events_published,
+            "prepare_ms_total": round(self.prepare_seconds * 1000, 3),
+            "bytes_sent": self.bytes_sent,
+            "recent_events": [
+                {
+                    "seq": entry.seq,
+                    "bytes": len(entry.event.payload),
+                    "prepare_ms": round(entry.event.encode_seconds * 1000, 3),
+                    "bytes_sent": entry.event.bytes_sent,
+                }
+                for entry in entries
+            ],
+        }
+
+    def _dispatch(self, clients, event: EncodedEvent):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        for client in list(clients):
+            if running_loop is client.loop:
+                self._enqueue(client, event)
+            else:
+                # Aufruf aus einem anderen Thread (z. B. sync Route im Threadpool)
+                client.loop.call_soon_threadsafe(self._enqueue, client, event)
+
+    def _enqueue(self, client: ClientConnection, event: EncodedEvent):
+        if client not in self.clients:
+            return
+        try:
+            client.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if self.policy == "disconnect":
+                self.clients.discard(client)
+                task = asyncio.create_task(self.disconnect(client, status.WS_1013_TRY_AGAIN_LATER))
+                self._tasks.add(task)
+                task.add_done_callback(self._task_done)
+                return
+            client.queue.get_nowait()
+            client.queue.task_done()
+            client.queue.put_nowait(event)
+            client.dropped += 1
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("WebSocket background task failed", exc_info=task.exception())
+
+    def _index(self, client: ClientConnection):
+        subscription = client.subscription
+        if subscription is None or not subscription.statuses:
+            self.any_status.add(client)
+        else:
+            for order_status in subscription.statuses:
+                self.by_status[order_status.value].add(client)
+        if subscription is None or subscription.date is None:
+            self.any_date.add(client)
+        else:
+            self.by_date[subscription.date.isoformat()].add(client)
+
+    def _unindex(self, client: ClientConnection):
+        self.any_status.discard(client)
+        self.any_date.discard(client)
+        subscription = client.subscription
+        if subscription is None:
+            return
+        for order_status in subscription.statuses or []:
+            self._discard(self.by_status, order_status.value, client)
+        if subscription.date is not None:
+            self._discard(self.by_date, subscription.date.isoformat(), client)
+
+    @staticmethod
+    def _discard(index: dict, key: str, client: ClientConnection):
+        clients = index.get(key)
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                del index[key]
+
+    def _recipients(self, order_status: str | None, order_date: datetime | None) -> set[ClientConnection]:
+        # Events ohne Status/Datum können danach nicht gefiltert werden
+        if order_status is None:
+            recipients = set(self.clients)
+        else:
+            recipients = self.by_status.get(order_status, set()) | self.any_status
+
+        if order_date is None:
+            return recipients
+        recipients &= self.by_date.get(order_date.date().isoformat(), set()) | self.any_date
+        return {client for client in recipients if _in_time_range(client.subscription, order_date)}
+
+    async def _write(self, client: ClientConnection):
+        try:
+            while True:
+                event = await client.queue.get()
+                frame = event.frame(client.encoding)
+                if isinstance(frame, str):
+                    await client.websocket.send_text(frame)
+                else:
+                    await client.websocket.send_bytes(frame)
+                event.bytes_sent += len(frame)
+                self.bytes_sent += len(frame)
+                client.queue.task_done()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Verbindung ist ohne sauberes WebSocketDisconnect abgebrochen
+            await self.disconnect(client)
+
+def _parse_datetime(value) -> datetime | None:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+def _matches(subscription: OrderSubscription | None, order_status: str | None, order_date: datetime | None) -> bool:
+    if subscription is None:
+        return True
+    if order_status is not None and subscription.statuses:
+        if order_status not in {s.value for s in subscription.statuses}:
+            return False
+    if order_date is not None:
+        if subscription.date is not None and order_date.date() != subscription.date:
+            return False
+        return _in_time_range(subscription, order_date)
+    return True
+
+def _in_time_range(subscription: OrderSubscription | None, order_date: datetime) -> bool:
+    if subscription is None:
+        return True
+    order_time = order_date.time().replace(tzinfo=None)
+    if subscription.from_time is not None and order_time < subscription.from_time:
+        return False
+    if subscription.to_time is not None and order_time > subscription.to_time:
+        return False
+    return True
+
+broadcaster = Broadcaster()
+# Verteilt Events über alle Worker; jeder Worker stellt sie seinen eigenen Clients zu
+event_bus = create_event_bus(broadcaster.publish, on_gap=broadcaster.mark_discontinuous)
 
 @websocket_router.websocket("/ws/orders")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, encoding: str = "json"):
     """
     WebSocket endpoint for receiving order events.
 
     Accepts a WebSocket connection and keeps it open until the client disconnects.
-    Messages received from the client are ignored in this implementation.
+    Clients receive every order event unless they send a subscription, e.g.
+    ``{"action": "subscribe", "statuses": ["PREPARING"], "date": "2025-10-11",
+    "from": "17:00", "to": "18:00"}``. A new subscription replaces the previous one
+    and is acknowledged with a SUBSCRIBED event.
+
+    Every event carries ``seq`` and ``stream``. After a reconnect the client sends
+    ``{"action": "resume", "last_seq": 41, "stream": "..."}`` (after subscribing)
+    and receives the missed events followed by RESUMED, or RESYNC_REQUIRED if the
+    gap is no longer buffered and it has to reload GET /orders.
+    Other messages are ignored.
+
+    Events are sent as JSON text frames. Clients on slow links can connect with
+    ``?encoding=binary`` (JSON as binary frames) or ``?encoding=zlib``
+    (zlib-compressed JSON, compressed once per event for all clients).
+    permessage-deflate is negotiated by the server as usual.
 
     Args:
         websocket (WebSocket): The incoming WebSocket connection.
+        encoding (str): The frame format: "json", "binary" or "zlib".
     """
-    await websocket.accept()
-    active_connections.append(websocket)
+    if encoding not in WS_ENCODINGS:
+        encoding = "json"
+    await event_bus.start()
+    client = await broadcaster.connect(websocket, encoding)
     try:
         while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        active_connections.remove(websocket)
+            _handle_client_message(client, await websocket.receive_text())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        await broadcaster.disconnect(client)
+
+def _handle_client_message(client: ClientConnection, text: str):
+    try:
+        payload = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return
+    if not isinstance(payload, dict):
+        return
+    if payload.get("action") == "resume":
+        _handle_resume(client, payload)
+        return
+    if payload.get("action") != "subscribe":
+        return
+
+    try:
+        subscription = OrderSubscription.model_validate(payload)
+    except ValueError as e:
+        broadcaster.send(client, {"event": "SUBSCRIPTION_ERROR", "detail": str(e)})
+        return
+
+    broadcaster.subscribe(client, subscription)
+    broadcaster.send(client, {
+        "event": "SUBSCRIBED",
+        "data": subscription.model_dump(mode="json", by_alias=True)
+    })
+
+def _handle_resume(client: ClientConnection, payload: dict):
+    last_seq = payload.get("last_seq")
+    if not isinstance(last_seq, int) or isinstance(last_seq, bool):
+        broadcaster.send(client, {"event": "RESUME_ERROR", "detail": "last_seq must be an integer"})
+        return
+
+    resumed = broadcaster.resume(client, last_seq, payload.get("stream"))
+    broadcaster.send(client, {
+        "event": "RESUMED" if resumed else "RESYNC_REQUIRED",
+        "seq": broadcaster.seq,
+        "stream": broadcaster.stream
+    })
+
+def encode_event(event_type: str, data: dict) -> bytes:
+    """
+    Encodes an event for the event bus: a routing header with the order's status
+    and date (tab-separated, empty if missing) on the first line, then the JSON event.
+
+    Args:
+        event_type (str): The type of event (e.g., "ORDER_CREATED").
+        data (dict): The event data; ``status`` and ``date`` are used for routing.
+
+    Returns:
+        bytes: The encoded event.
+    """
+    order_status = data.get("status") or ""
+    order_date = data.get("date") or ""
+    if not isinstance(order_date, str):
+        order_date = order_date.isoformat()
+    header = f"{order_status}\t{order_date}\n".encode("utf-8")
+    return header + encode_json({"event": event_type, "data": data})
 
 async def broadcast_order_event(event_type: str, order_data: dict):
     """
     Broadcasts an order event to all active WebSocket connections.
 
     Sends a JSON-formatted message containing the event type and order data.
+    The message is encoded once (orjson; datetimes and Decimals are handled, so
+    ORM column values can be passed directly) and published on the event bus,
+    which delivers it to the clients of every worker. Sending happens in the
+    background, so the calling request neither waits for the bus nor for slow
+    clients, and a bus failure is logged and counted instead of failing the request.
 
     Args:
         event_type (str): The type of event (e.g., "created", "updated").
         order_data (dict): The order data to be sent to clients.
     """
-    message = json.dumps({
-        "event": event_type,
-        "data": order_data
-    })
-    for connection in active_connections:
-        await connection.send_text(message)
\ No newline at end of file
+    started = time.perf_counter()
+    message = encode_event(event_type, order_data)
+    broadcaster.events_encoded += 1
+    broadcaster.encode_seconds += time.perf_counter() - started
+    await event_bus.publish(message)
@@ -0,0 +1,154 @@
+from typing import NamedTuple
+
+# Obergrenze für die Suche; danach wird die beste bisher gefundene Zuordnung genommen
+MAX_SEARCH_STEPS = 20000
+
+class SeatingTable(NamedTuple):
+    id: int
+    seats: int
+
+class SeatingReservation(NamedTuple):
+    id: int
+    seats: int
+    # Belegte Slots als Bitmaske (siehe occupancy.slot_range)
+    mask: int
+
+class SeatingResult(NamedTuple):
+    # Reservierung -> Tisch (None: nicht platzierbar)
+    assignment: dict[int, int | None]
+    placed: int
+    wasted_seats: int
+    steps: int
+    complete: bool
+
+def wasted_seats(tables: list[SeatingTable], reservations: list[SeatingReservation],
+                 assignment: dict[int, int | None]) -> int:
+    seats = {table.id: table.seats for table in tables}
+    return sum(
+        seats[assignment[r.id]] - r.seats
+        for r in reservations
+        if assignment.get(r.id) in seats
+    )
+
+def is_feasible(tables: list[SeatingTable], reservations: list[SeatingReservation],
+                assignment: dict[int, int | None], fixed: dict[int, int] | None = None) -> bool:
+    """
+    Checks that an assignment seats every reservation at a large enough table
+    without overlapping reservations (or the ``fixed`` occupancy) on the same table.
+    """
+    seats = {table.id: table.seats for table in tables}
+    occupied = dict(fixed or {})
+    for r in reservations:
+        table_id = assignment.get(r.id)
+        if table_id not in seats or seats[table_id] < r.seats:
+            return False
+        if occupied.get(table_id, 0) & r.mask:
+            return False
+        occupied[table_id] = occupied.get(table_id, 0) | r.mask
+    return True
+
+def optimize_seating(tables: list[SeatingTable], reservations: list[SeatingReservation],
+                     fixed: dict[int, int] | None = None, initial: dict[int, int | None] | None = None,
+                     max_steps: int = MAX_SEARCH_STEPS) -> SeatingResult:
+    """
+    Assigns reservations to tables so that as many as possible are seated without
+    overlaps, and as few seats as possible are wasted.
+
+    Depth-first search over the reservations, largest parties and longest stays
+    first, trying the best-fitting free table first (the first descent is the
+    classic best-fit heuristic). Later branches only continue while they can still
+    beat the best assignment found so far, and the search stops after
+    ``max_steps`` steps, so the runtime is bounded regardless of the input.
+
+    Args:
+        tables (list[SeatingTable]): The available tables.
+        reservations (list[SeatingReservation]): The reservations to assign.
+        fixed (dict[int, int], optional): Occupancy per table that must not be touched,
+            e.g. reservations of the previous day reaching into this one.
+        initial (dict[int, int | None], optional): A known assignment (usually the current
+            one); it is used as the starting point if it is feasible, so the result is
+            never worse.
+        max_steps (int): Search budget.
+
+    Returns:
+        SeatingResult: The best assignment found.
+    """
+    fixed = fixed or {}
+    order = sorted(reservations, key=lambda r: (-r.seats, -r.mask.bit_count(), r.id))
+    by_fit = sorted(tables, key=lambda t: (t.seats, t.id))
+    # Passende Tische je Reservierung, kleinster zuerst; None = nicht platzieren
+    candidates = [[t for t in by_fit if t.seats >= r.seats] + [None] for r in order]
+    n = len(order)
+    # Untere Schranke für die Verschwendung, wenn alle platziert werden
+    min_waste = sum(c[0].seats - r.seats for r, c in zip(order, candidates) if c[0] is not None)
+
+    best_assignment = {r.id: None for r in order}
+    best_placed, best_waste = 0, 0
+    if initial is not None and is_feasible(tables, reservations, initial, fixed):
+        best_assignment = {r.id: initial[r.id] for r in order}
+        best_placed, best_waste = n, wasted_seats(tables, reservations, initial)
+
+    occupied = {t.id: fixed.get(t.id, 0) for t in tables}
+    chosen: list[SeatingTable | None] = [None] * n
+    position = [0] * n
+    placed = waste = steps = 0
+    level = 0
+
+    def undo(level: int):
+        nonlocal placed, waste
+        table = chosen[level]
+        if table is not None:
+            occupied[table.id] ^= order[level].mask
+            placed -= 1
+            waste -= table.seats - order[level].seats
+            chosen[level] = None
+
+    while level >= 0 and steps < max_steps:
+        if best_placed == n and best_waste == min_waste:
+            break
+        if level == n:
+            if placed > best_placed or (placed == best_placed and waste < best_waste):
+                best_assignment = {r.id: (t.id if t else None) for r, t in zip(order, chosen)}
+                best_placed, best_waste = placed, waste
+            level -= 1
+            undo(level)
+            continue
+
+        steps += 1
+        reachable = placed + n - level
+        if reachable < best_placed or (reachable == best_placed and waste >= best_waste):
+            # Dieser Zweig kann das bisher beste Ergebnis nicht mehr schlagen
+            position[level] = 0
+            level -= 1
+            if level >= 0:
+                undo(level)
+            continue
+
+        reservation = order[level]
+        options = candidates[level]
+        while position[level] < len(options):
+            table = options[position[level]]
+            position[level] += 1
+            if table is None:
+                level += 1
+                break
+            if not occupied[table.id] & reservation.mask:
+                occupied[table.id] |= reservation.mask
+                chosen[level] = table
+                placed += 1
+                waste += table.seats - reservation.seats
+                level += 1
+                break
+        else:
+            position[level] = 0
+            level -= 1
+            if level >= 0:
+                undo(level)
+
+    return SeatingResult(
+        assignment=best_assignment,
+        placed=best_placed,
+        wasted_seats=best_waste,
+        steps=steps,
+        complete=level < 0 or (best_placed == n and best_waste == min_waste),
+    )
@@ -0,0 +1,28 @@
+from decimal import Decimal
+
+import orjson
+from fastapi import Response
+
+def encode_json(value) -> bytes:
+    """
+    Encodes a value to JSON bytes with orjson (datetimes as ISO 8601, Decimal as number).
+    """
+    return orjson.dumps(value, default=_encode_default)
+
+def _encode_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+def json_response(content, **kwargs) -> Response:
+    """
+    Returns already plain content (dicts of column values, e.g. from Core rows) as a
+    JSON response encoded directly with orjson, without FastAPI's jsonable_encoder
+    pass. The route's response_model then only documents the shape.
+    """
+    return Response(encode_json(content), media_type="application/json", **kwargs)
+
+def json_rows(result) -> Response:
+    """List endpoint fast path: a Core result's rows straight to JSON bytes."""
+    keys = list(result.keys())
+    return json_response([dict(zip(keys, row)) for row in result])
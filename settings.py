@@ -0,0 +1,45 @@
+import os
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+
+_env_loaded = False
+
+def load_env():
+    """
+    Loads the .env file into the environment, once per process. Modules that read
+    their configuration from the environment at import call this first.
+    """
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default) == "1"
+
+class Settings(NamedTuple):
+    """
+    Settings of the application built by create_app(). Module-level tuning values
+    (pool sizes, cache TTLs, ...) stay with their modules.
+    """
+    # Ausstehende Migrationen beim Start anwenden (sonst: python migrations.py)
+    auto_migrate: bool = True
+    # Verbindungen, Caches und Hashing vor dem ersten Request aufwärmen
+    warm_up: bool = True
+    # Anzahl Verbindungen, die je Engine beim Start geöffnet werden
+    pool_warm_connections: int = 2
+    cors_origins: tuple[str, ...] = ("*",)
+    # Wartezeit beim Herunterfahren, bis WebSocket-Clients ihre Events erhalten haben
+    ws_drain_seconds: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        load_env()
+        return cls(
+            auto_migrate=_flag("AUTO_MIGRATE", "1"),
+            warm_up=_flag("WARM_UP", "1"),
+            pool_warm_connections=int(os.getenv("POOL_WARM_CONNECTIONS", 2)),
+            cors_origins=tuple(origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",")),
+            ws_drain_seconds=float(os.getenv("WS_DRAIN_SECONDS", 5)),
+        )
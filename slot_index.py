@@ -0,0 +1,73 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+from cache_version import VersionedCache
+from models import SlotDB
+
+class SlotEntry(NamedTuple):
+    id: int
+    date: date
+    range_start: datetime
+    range_end: datetime
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+class SlotIntervals(NamedTuple):
+    # Slots aufsteigend nach range_start
+    slots: list[SlotEntry]
+    starts: list[datetime]
+    # Größtes range_end unter slots[0..i], zum Abbruch der Rückwärtssuche
+    max_ends: list[datetime]
+
+def _naive(dt: datetime) -> datetime:
+    # Zeiten werden wie in der DB ohne Zeitzone verglichen
+    return dt.replace(tzinfo=None) if dt.tzinfo else dt
+
+class SlotIndex(VersionedCache):
+    """
+    All slots as sorted interval arrays, searched with bisect instead of a range
+    query per admission check. Rebuilt after slot writes (see VersionedCache).
+    """
+
+    name = "slots"
+
+    def load(self, db) -> SlotIntervals:
+        rows = db.execute(
+            select(SlotDB.id, SlotDB.date, SlotDB.range_start, SlotDB.range_end)
+            .where(SlotDB.range_start.is_not(None), SlotDB.range_end.is_not(None))
+            .order_by(SlotDB.range_start.asc(), SlotDB.id.asc())
+        )
+        slots = [SlotEntry(row.id, row.date, _naive(row.range_start), _naive(row.range_end)) for row in rows]
+        max_ends = []
+        for slot in slots:
+            max_ends.append(max(max_ends[-1], slot.range_end) if max_ends else slot.range_end)
+        return SlotIntervals(slots, [slot.range_start for slot in slots], max_ends)
+
+    def all(self, db) -> list[SlotEntry]:
+        return self.get(db).slots
+
+    def find(self, db, dt: datetime) -> SlotEntry | None:
+        """Returns the slot containing ``dt`` (range_start <= dt <= range_end), if any."""
+        index = self.get(db)
+        dt = _naive(dt)
+        i = bisect_right(index.starts, dt) - 1
+        while i >= 0 and index.max_ends[i] >= dt:
+            if index.slots[i].range_end >= dt:
+                return index.slots[i]
+            i -= 1
+        return None
+
+    def overlapping(self, db, start: datetime, end: datetime) -> list[SlotEntry]:
+        """Returns the slots that overlap [start, end), ordered by range_start."""
+        index = self.get(db)
+        start, end = _naive(start), _naive(end)
+        last = bisect_left(index.starts, end)
+        # Erster Slot, dessen Präfix-Maximum von range_end start erreicht
+        first = bisect_left(index.max_ends, start, hi=last)
+        return [slot for slot in index.slots[first:last] if slot.range_end >= start]
+
+slot_index = SlotIndex()
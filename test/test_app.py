@@ -1,5 +1,7 @@
+import asyncio
 import os
 import pytest
+from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
 
 # --- 1. ENV setzen ---
@@ -8,11 +10,14 @@ os.environ["DATABASE_URL"] = "sqlite://"
 
 # --- 2. App importieren ---
 from app import app
-from database import SessionLocal, get_db
+from capacity import invalidate_limits
+from database import SessionLocal, engine, get_db
 from models import *
+from pricing import price_table
+from slot_index import slot_index
 
 # --- 3. Tabellen erstellen ---
-# Base.metadata.create_all(bind=engine)
+Base.metadata.create_all(bind=engine)
 
 client = TestClient(app)
 
@@ -26,6 +31,13 @@ def mock_check_slot_limit(monkeypatch):
         lambda *args, **kwargs: True
     )
 
+    async def _check_async(*args, **kwargs):
+        return True
+    monkeypatch.setattr(
+        "routes.order_route.check_slot_limit_async",
+        _check_async
+    )
+
 # ------------------------------------
 # Helper: Testproduktdaten
 # ------------------------------------
@@ -38,6 +50,7 @@ def setup_products():
         db.add(ProductDB(product="nuggets", price=3.0))
         db.add(ProductDB(product="fries", price=2.0))
         db.commit()
+        price_table.invalidate()
         yield
     finally:
         db.close()
@@ -81,6 +94,31 @@ def test_create_order():
     assert data["order"]["price"] == 2 * 5 + 1 * 3 + 3 * 2  # 10 + 3 + 6 = 19
 
 
+def test_create_order_with_utc_offset():
+    # Zeiten mit Zeitzone (z. B. aus JS toISOString()) werden als naives UTC gespeichert
+    payload = {
+        "firstname": "John",
+        "lastname": "Doe",
+        "mail": "j@d.com",
+        "phonenumber": "123",
+        "date": "2025-10-10T17:00:00Z",
+        "chicken": 1,
+        "nuggets": 0,
+        "fries": 0,
+        "miscellaneous": "",
+        "status": "CREATED",
+        "price": 0,
+        "checked_in_at": "2025-10-10T18:30:00+02:00"
+    }
+
+    response = client.post("/order", json=payload)
+    assert response.status_code == 200
+
+    order = response.json()["order"]
+    assert order["date"] == "2025-10-10T17:00:00"
+    assert order["checked_in_at"] == "2025-10-10T16:30:00"
+
+
 # ======================================================
 # GET /orders – Liste abrufen
 # ======================================================
@@ -90,7 +128,77 @@ def test_get_orders():
     data = response.json()
     assert isinstance(data, list)
     assert len(data) >= 1
+    assert "_sa_instance_state" not in data[0]
 
+def test_get_orders_pages_and_fields():
+    db = SessionLocal()
+    try:
+        orders = [
+            OrderChickenDB(date=datetime(2032, 5, 1, 17, minute), lastname=f"L{minute}", chicken=1, nuggets=0, fries=0, status="CREATED")
+            for minute in (30, 0, 15, 15, 45)
+        ]
+        db.add_all(orders)
+        db.commit()
+        expected = [o.id for o in sorted(orders, key=lambda o: (o.date, o.id))]
+    finally:
+        db.close()
+
+    params = {"from": "2032-05-01T00:00:00", "to": "2032-05-01T23:59:00", "fields": "id,lastname", "limit": 2}
+    seen = []
+    pages = 0
+    while True:
+        response = client.get("/orders", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert all(set(order) == {"id", "lastname"} for order in page)
+        seen += [order["id"] for order in page]
+        pages += 1
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert seen == expected
+    assert pages == 3
+
+def test_get_orders_invalid_field_and_cursor():
+    assert client.get("/orders", params={"fields": "id,_sa_instance_state"}).status_code == 400
+    assert client.get("/orders", params={"cursor": "kaputt"}).status_code == 400
+
+
+# ======================================================
+# GET /orders/export – Streaming-Export
+# ======================================================
+def test_export_orders():
+    import csv
+    import io
+    import orjson
+
+    db = SessionLocal()
+    try:
+        db.add_all([
+            OrderChickenDB(date=datetime(2033, 6, 1, 17, 15), lastname="B", chicken=2, nuggets=0, fries=1, status="PAID", price=12.5),
+            OrderChickenDB(date=datetime(2033, 6, 1, 17, 0), lastname="A", chicken=1, nuggets=0, fries=0, status="CREATED", price=5),
+            OrderChickenDB(date=datetime(2033, 6, 2, 17, 0), lastname="C", chicken=1, nuggets=0, fries=0, status="PAID", price=5),
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get("/orders/export", params={"date": "2033-06-01"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [row["lastname"] for row in rows] == ["A", "B"]
+    assert rows[1]["price"] == 12.5
+    assert "_sa_instance_state" not in rows[0]
+
+    response = client.get("/orders/export", params={"date": "2033-06-01", "status": "PAID", "format": "csv"})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["lastname"] for row in rows] == ["B"]
+    assert rows[0]["date"] == "2033-06-01T17:15:00"
+
+    assert client.get("/orders/export", params={"format": "xml"}).status_code == 422
 
 # ======================================================
 # GET /order/{id}
@@ -225,4 +333,286 @@ def test_delete_order():
 
     # sicherstellen, dass gelöscht wurde
     response = client.get(f"/order/{oid}")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+# ======================================================
+# GET /orders/summary
+# ======================================================
+def test_order_summary():
+    db = SessionLocal()
+    try:
+        db.add(OrderChickenDB(date=datetime(2030, 1, 5, 17, 0), chicken=2, nuggets=1, fries=0))
+        db.add(OrderChickenDB(date=datetime(2030, 1, 5, 17, 10), chicken=1, nuggets=0, fries=2))
+        db.add(OrderChickenDB(date=datetime(2030, 1, 5, 17, 30), chicken=4, nuggets=0, fries=1))
+        db.add(OrderChickenDB(date=datetime(2030, 1, 5, 18, 0), chicken=9, nuggets=9, fries=9))
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get("/orders/summary", params={"date": "2030-01-05", "interval": "17:00-17:45"})
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["slots"] == [
+        {"time": "17:00", "chicken": 3, "nuggets": 1, "fries": 2},
+        {"time": "17:15", "chicken": 0, "nuggets": 0, "fries": 0},
+        {"time": "17:30", "chicken": 4, "nuggets": 0, "fries": 1},
+        {"time": "17:45", "chicken": 0, "nuggets": 0, "fries": 0},
+    ]
+    assert data["total"] == {"chicken": 7, "nuggets": 1, "fries": 3}
+
+    # Nicht ausgerichteter Beginn wird auf die Viertelstunde abgerundet
+    response = client.get("/orders/summary", params={"date": "2030-01-05", "interval": "17:05-17:40"})
+    assert response.status_code == 200
+
+    data = response.json()
+    assert [slot["time"] for slot in data["slots"]] == ["17:00", "17:15", "17:30"]
+    assert data["total"] == {"chicken": 7, "nuggets": 1, "fries": 3}
+
+# ======================================================
+# POST /orders/status – Status mehrerer Bestellungen
+# ======================================================
+def test_update_orders_status_by_time():
+    db = SessionLocal()
+    try:
+        orders = [
+            OrderChickenDB(date=datetime(2031, 3, 1, 17, 15), chicken=1, nuggets=0, fries=0, status="CREATED"),
+            OrderChickenDB(date=datetime(2031, 3, 1, 17, 15), chicken=1, nuggets=0, fries=0, status="PAID"),
+            OrderChickenDB(date=datetime(2031, 3, 1, 17, 30), chicken=1, nuggets=0, fries=0, status="CREATED"),
+        ]
+        db.add_all(orders)
+        db.commit()
+        ids = [order.id for order in orders]
+    finally:
+        db.close()
+
+    response = client.post("/orders/status", json={"status": "PREPARING", "time": "2031-03-01T17:15:00"})
+    assert response.status_code == 200
+    assert response.json()["ids"] == ids[:2]
+
+    db = SessionLocal()
+    try:
+        statuses = [db.get(OrderChickenDB, id).status for id in ids]
+    finally:
+        db.close()
+    assert statuses == ["PREPARING", "PREPARING", "CREATED"]
+
+def test_update_orders_status_time_with_utc_offset():
+    db = SessionLocal()
+    try:
+        order = OrderChickenDB(date=datetime(2031, 3, 4, 16, 15), chicken=1, nuggets=0, fries=0, status="CREATED")
+        db.add(order)
+        db.commit()
+        id = order.id
+    finally:
+        db.close()
+
+    response = client.post("/orders/status", json={"status": "CHECKED_IN", "time": "2031-03-04T17:15:00+01:00"})
+    assert response.status_code == 200
+    assert response.json()["ids"] == [id]
+
+def test_update_orders_status_check_in_by_ids():
+    db = SessionLocal()
+    try:
+        checked_in = datetime(2031, 3, 2, 16, 0)
+        orders = [
+            OrderChickenDB(date=datetime(2031, 3, 2, 17, 0), chicken=1, nuggets=0, fries=0, status="CREATED"),
+            OrderChickenDB(date=datetime(2031, 3, 2, 17, 0), chicken=1, nuggets=0, fries=0, status="CHECKED_IN", checked_in_at=checked_in),
+        ]
+        db.add_all(orders)
+        db.commit()
+        ids = [order.id for order in orders]
+    finally:
+        db.close()
+
+    response = client.post("/orders/status", json={"status": "CHECKED_IN", "ids": ids})
+    assert response.status_code == 200
+    assert response.json()["ids"] == ids[:1]
+
+    db = SessionLocal()
+    try:
+        assert db.get(OrderChickenDB, ids[0]).checked_in_at is not None
+        assert db.get(OrderChickenDB, ids[1]).checked_in_at == checked_in
+    finally:
+        db.close()
+
+def test_update_orders_status_by_slot():
+    db = SessionLocal()
+    try:
+        slot = SlotDB(date=datetime(2031, 3, 3).date(), range_start=datetime(2031, 3, 3, 17, 0), range_end=datetime(2031, 3, 3, 18, 0))
+        inside = OrderChickenDB(date=datetime(2031, 3, 3, 17, 45), chicken=1, nuggets=0, fries=0, status="CREATED")
+        outside = OrderChickenDB(date=datetime(2031, 3, 3, 18, 15), chicken=1, nuggets=0, fries=0, status="CREATED")
+        db.add_all([slot, inside, outside])
+        db.commit()
+        slot_id, inside_id = slot.id, inside.id
+    finally:
+        db.close()
+
+    response = client.post("/orders/status", json={"status": "READY_FOR_PICKUP", "slot_id": slot_id})
+    assert response.status_code == 200
+    assert response.json()["ids"] == [inside_id]
+
+def test_update_orders_status_unknown_slot():
+    response = client.post("/orders/status", json={"status": "READY_FOR_PICKUP", "slot_id": 999999})
+    assert response.status_code == 404
+
+def test_update_orders_status_events_carry_bucket(monkeypatch):
+    events = []
+
+    async def _record(event_type, data):
+        events.append((event_type, data))
+    monkeypatch.setattr("routes.order_route.broadcast_order_event", _record)
+
+    db = SessionLocal()
+    try:
+        orders = [
+            OrderChickenDB(date=datetime(2031, 3, 5, 17, 0), chicken=1, nuggets=0, fries=0, status="CREATED"),
+            OrderChickenDB(date=datetime(2031, 3, 6, 18, 30), chicken=1, nuggets=0, fries=0, status="CREATED"),
+        ]
+        db.add_all(orders)
+        db.commit()
+        ids = [order.id for order in orders]
+    finally:
+        db.close()
+
+    response = client.post("/orders/status", json={"status": "PAID", "ids": ids})
+    assert response.status_code == 200
+    assert sorted((data["date"], data["ids"]) for _, data in events) == [
+        (datetime(2031, 3, 5, 17, 0), ids[:1]),
+        (datetime(2031, 3, 6, 18, 30), ids[1:]),
+    ]
+    assert {event_type for event_type, _ in events} == {"ORDER_STATUS_CHANGED"}
+
+def test_update_orders_status_requires_one_selection():
+    assert client.post("/orders/status", json={"status": "PAID"}).status_code == 422
+    assert client.post("/orders/status", json={"status": "PAID", "ids": [1], "time": "2031-03-01T17:15:00"}).status_code == 422
+
+# ======================================================
+# POST /orders/batch – mehrere Bestellungen
+# ======================================================
+# Eigener Tag mit Slot 17:00-19:00 und max. 5 Hähnchen; die Batch-Prüfung ist nicht gemockt
+BATCH_DAY = datetime(2033, 6, 10)
+
+@pytest.fixture
+def batch_day():
+    db = SessionLocal()
+    try:
+        day_end = BATCH_DAY + timedelta(days=1)
+        db.query(OrderChickenDB).filter(OrderChickenDB.date >= BATCH_DAY, OrderChickenDB.date < day_end).delete()
+        db.query(SlotCapacityDB).filter(SlotCapacityDB.bucket >= BATCH_DAY, SlotCapacityDB.bucket < day_end).delete()
+        db.query(SlotDB).filter(SlotDB.date == BATCH_DAY.date()).delete()
+        db.query(ConfigChickenDB).delete()
+        db.add(ConfigChickenDB(chicken=5, nuggets=10, fries=10))
+        db.add(SlotDB(date=BATCH_DAY.date(), range_start=BATCH_DAY.replace(hour=17), range_end=BATCH_DAY.replace(hour=19)))
+        db.commit()
+        invalidate_limits()
+        slot_index.invalidate()
+        yield
+    finally:
+        db.close()
+
+def batch_order(chicken=1, time="17:00"):
+    return {
+        "firstname": "John",
+        "lastname": "Doe",
+        "mail": "j@d.com",
+        "phonenumber": "123",
+        "date": f"{BATCH_DAY.date()}T{time}:00",
+        "chicken": chicken,
+        "nuggets": 0,
+        "fries": 0,
+        "miscellaneous": "",
+        "status": "CREATED",
+        "price": 0,
+        "checked_in_at": None
+    }
+
+def batch_capacity(time="17:00"):
+    db = SessionLocal()
+    try:
+        return db.get(SlotCapacityDB, datetime.fromisoformat(f"{BATCH_DAY.date()}T{time}:00"))
+    finally:
+        db.close()
+
+def test_batch_atomic_creates_all_orders(batch_day):
+    batch = [batch_order(chicken=2), batch_order(chicken=3), batch_order(chicken=1, time="17:15")]
+    response = client.post("/orders/batch", json=batch)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] is True
+    assert data["created"] == 3
+    assert [r["index"] for r in data["results"]] == [0, 1, 2]
+    assert data["results"][1]["order"]["price"] == 15.0
+    assert batch_capacity("17:00").chicken == 5
+    assert batch_capacity("17:15").chicken == 1
+
+def test_batch_events_follow_subscriptions(batch_day):
+    # broadcast_order_event ist hier gemockt, die Markierung geht direkt auf den Bus
+    from routes.websocket import encode_event, event_bus
+
+    with client.websocket_connect("/ws/orders") as fryer, client.websocket_connect("/ws/orders") as other_day:
+        fryer.send_json({"action": "subscribe", "date": str(BATCH_DAY.date()), "from": "17:00", "to": "17:00"})
+        other_day.send_json({"action": "subscribe", "date": "2033-06-11"})
+        assert fryer.receive_json()["event"] == "SUBSCRIBED"
+        assert other_day.receive_json()["event"] == "SUBSCRIBED"
+
+        batch = [batch_order(chicken=1), batch_order(chicken=1, time="17:15"), batch_order(chicken=2)]
+        assert client.post("/orders/batch", json=batch).status_code == 200
+        # Ungefiltertes Event als Markierung: davor darf other_day nichts bekommen haben
+        asyncio.run(event_bus.publish(encode_event("MARKER", {})))
+
+        event = fryer.receive_json()
+        assert event["event"] == "ORDER_BATCH_CREATED"
+        assert event["data"]["date"] == f"{BATCH_DAY.date()}T17:00:00"
+        assert event["data"]["count"] == 2
+        assert fryer.receive_json()["event"] == "MARKER"
+        assert other_day.receive_json()["event"] == "MARKER"
+
+def test_batch_atomic_rejects_whole_batch(batch_day):
+    # Die dritte Bestellung passt nur einzeln, nicht nach den ersten beiden
+    batch = [batch_order(chicken=2), batch_order(chicken=2), batch_order(chicken=2)]
+    response = client.post("/orders/batch", json=batch)
+    assert response.status_code == 400
+    results = response.json()["detail"]["results"]
+    assert [r["errors"] for r in results[:2]] == [[], []]
+    assert [e["code"] for e in results[2]["errors"]] == ["LIMIT_CHICKEN_EXCEEDED"]
+    assert batch_capacity() is None
+
+    db = SessionLocal()
+    assert db.query(OrderChickenDB).filter(OrderChickenDB.date >= BATCH_DAY, OrderChickenDB.date < BATCH_DAY + timedelta(days=1)).count() == 0
+    db.close()
+
+def test_batch_best_effort_creates_fitting_orders(batch_day):
+    batch = [batch_order(chicken=4), batch_order(chicken=2), batch_order(chicken=1, time="20:00"), batch_order(chicken=1)]
+    response = client.post("/orders/batch", params={"mode": "best_effort"}, json=batch)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] is False
+    assert data["created"] == 2
+    assert [r["success"] for r in data["results"]] == [True, False, False, True]
+    assert [e["code"] for e in data["results"][2]["errors"]] == ["INVALID_TIME_SLOT"]
+    assert [e["code"] for e in data["results"][1]["errors"]] == ["LIMIT_CHICKEN_EXCEEDED"]
+    assert batch_capacity().chicken == 5
+
+def test_batch_statements_independent_of_size(batch_day):
+    from sqlalchemy import event
+    from database import async_engine
+
+    def count(batch):
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            assert client.post("/orders/batch", json=batch).status_code == 200
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        return len(statements)
+
+    # Gleich viele Zeitraster, dreimal so viele Bestellungen
+    small = count([batch_order(chicken=1, time=f"17:{m:02d}") for m in (0, 15, 30)])
+    large = count([batch_order(chicken=1, time=f"18:{m:02d}") for m in (0, 15, 30)] * 3)
+    assert large == small
+
+def test_batch_invalid_mode():
+    assert client.post("/orders/batch", params={"mode": "some"}, json=[batch_order()]).status_code == 422
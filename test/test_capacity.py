@@ -0,0 +1,279 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+from datetime import date, datetime
+
+# Test-Umgebung setzen
+os.environ["TESTING"] = "1"
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from app import app
+from capacity import invalidate_limits
+from pricing import price_table
+from slot_index import slot_index
+from database import SessionLocal, get_db
+from models import *
+
+client = TestClient(app)
+
+# ---------------------------------------------------------
+# DB Setup Fixture: Slot 17:00-19:00, max. 5 Hähnchen
+# ---------------------------------------------------------
+@pytest.fixture(autouse=True)
+def setup_db():
+    db = SessionLocal()
+    Base.metadata.drop_all(bind=db.bind)
+    Base.metadata.create_all(bind=db.bind)
+    db.add(ConfigChickenDB(chicken=5, nuggets=10, fries=10))
+    db.add(SlotDB(date=date(2025, 10, 10), range_start=datetime(2025, 10, 10, 17, 0), range_end=datetime(2025, 10, 10, 19, 0)))
+    db.add(ProductDB(product="chicken", price=5.0))
+    db.commit()
+    invalidate_limits()
+    slot_index.invalidate()
+    price_table.invalidate()
+    yield
+    db.close()
+
+def order_payload(chicken=1, time="17:00"):
+    return {
+        "firstname": "John",
+        "lastname": "Doe",
+        "mail": "j@d.com",
+        "phonenumber": "123",
+        "date": f"2025-10-10T{time}:00",
+        "chicken": chicken,
+        "nuggets": 0,
+        "fries": 0,
+        "miscellaneous": "",
+        "status": "CREATED",
+        "price": 0,
+        "checked_in_at": None
+    }
+
+def used_capacity(time="17:00"):
+    db = SessionLocal()
+    try:
+        bucket = datetime.fromisoformat(f"2025-10-10T{time}:00")
+        return db.get(SlotCapacityDB, bucket)
+    finally:
+        db.close()
+
+# =========================================================
+# TEST: Ledger wird bei POST /order gebucht
+# =========================================================
+def test_create_order_reserves_capacity():
+    assert client.post("/order", json=order_payload(chicken=3)).status_code == 200
+    assert client.post("/order", json=order_payload(chicken=2)).status_code == 200
+
+    assert used_capacity().chicken == 5
+
+    response = client.post("/order", json=order_payload(chicken=1))
+    assert response.status_code == 400
+    codes = [e["code"] for e in response.json()["detail"]["errors"]]
+    assert codes == ["LIMIT_CHICKEN_EXCEEDED"]
+    assert used_capacity().chicken == 5
+
+# =========================================================
+# TEST: Ledger wird aus bestehenden Bestellungen initialisiert
+# =========================================================
+def test_ledger_seeded_from_existing_orders():
+    db = SessionLocal()
+    db.add(OrderChickenDB(date=datetime(2025, 10, 10, 17, 15), chicken=4, nuggets=0, fries=0))
+    db.commit()
+    db.close()
+
+    response = client.post("/validate-order", json=order_payload(chicken=2, time="17:15"))
+    assert response.status_code == 400
+
+    response = client.post("/validate-order", json=order_payload(chicken=1, time="17:15"))
+    assert response.status_code == 200
+
+# =========================================================
+# TEST: Update und Delete geben Kapazität frei
+# =========================================================
+def test_update_and_delete_release_capacity():
+    order = client.post("/order", json=order_payload(chicken=4)).json()["order"]
+
+    response = client.put(f"/order/{order['id']}", json=order_payload(chicken=2, time="17:30"))
+    assert response.status_code == 200
+    assert used_capacity("17:00").chicken == 0
+    assert used_capacity("17:30").chicken == 2
+
+    assert client.delete(f"/order/{order['id']}").status_code == 200
+    assert used_capacity("17:30").chicken == 0
+
+# =========================================================
+# TEST: GET /capacity
+# =========================================================
+def test_get_capacity_for_day():
+    assert client.post("/order", json=order_payload(chicken=3, time="17:15")).status_code == 200
+
+    response = client.get("/capacity", params={"date": "2025-10-10"})
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["bucket_minutes"] == 15
+    slots = data["slots"]
+    # 17:00 bis 19:00 einschließlich
+    assert [s["time"][11:16] for s in slots][:3] == ["17:00", "17:15", "17:30"]
+    assert slots[-1]["time"][11:16] == "19:00"
+    assert len(slots) == 9
+    assert slots[0] == {
+        "time": "2025-10-10T17:00:00", "chicken": 5, "nuggets": 10, "fries": 10,
+        "limits": {"chicken": 5, "nuggets": 10, "fries": 10}
+    }
+    assert slots[1]["chicken"] == 2
+
+def test_get_capacity_day_without_slots():
+    response = client.get("/capacity", params={"date": "2025-10-11"})
+    assert response.status_code == 200
+    assert response.json()["slots"] == []
+
+def test_get_capacity_cached_until_order_write():
+    def chicken_at_1700():
+        return client.get("/capacity", params={"date": "2025-10-10"}).json()["slots"][0]["chicken"]
+
+    assert chicken_at_1700() == 5
+
+    # Direkter DB-Zugriff umgeht die Invalidierung -> Snapshot bleibt
+    db = SessionLocal()
+    db.add(OrderChickenDB(**{**order_payload(chicken=1), "date": datetime(2025, 10, 10, 17, 0)}))
+    db.commit()
+    db.close()
+    assert chicken_at_1700() == 5
+
+    # Eine Bestellung über die API invalidiert den Tag
+    created = client.post("/order", json=order_payload(chicken=2))
+    assert created.status_code == 200
+    assert chicken_at_1700() == 2
+
+    order_id = created.json()["order"]["id"]
+    assert client.delete(f"/order/{order_id}").status_code == 200
+    assert chicken_at_1700() == 4
+
+# =========================================================
+# TEST: Vorschläge bei überschrittenen Mengen
+# =========================================================
+def test_limit_error_suggests_nearest_slots():
+    assert client.post("/order", json=order_payload(chicken=5, time="17:30")).status_code == 200
+    assert client.post("/order", json=order_payload(chicken=4, time="17:45")).status_code == 200
+
+    response = client.post("/validate-order", json=order_payload(chicken=2, time="17:30"))
+    assert response.status_code == 400
+
+    detail = response.json()["detail"]
+    assert [e["code"] for e in detail["errors"]] == ["LIMIT_CHICKEN_EXCEEDED"]
+    # 17:45 ist zu voll, bei Gleichstand kommt die frühere Zeit zuerst
+    assert detail["suggestions"] == ["2025-10-10T17:15:00", "2025-10-10T17:00:00", "2025-10-10T18:00:00"]
+
+def test_slot_error_has_no_suggestions():
+    response = client.post("/validate-order", json=order_payload(chicken=1, time="20:00"))
+    assert response.status_code == 400
+    assert "suggestions" not in response.json()["detail"]
+
+def test_day_capacity_suggest():
+    from capacity import DayCapacity
+
+    buckets = [datetime(2025, 10, 10, 17, minute) for minute in (0, 15, 30, 45)]
+    snapshot = DayCapacity(date(2025, 10, 10), [(5, 5, 5)] * 96, buckets, [(5, 5, 5), (0, 5, 5), (5, 0, 5), (5, 5, 5)])
+
+    at = datetime(2025, 10, 10, 17, 15)
+    assert snapshot.suggest(at, 1, 0, 0, 5) == [buckets[0], buckets[2], buckets[3]]
+    assert snapshot.suggest(at, 1, 1, 0, 5) == [buckets[0], buckets[3]]
+    assert snapshot.suggest(at, 1, 1, 0, 1) == [buckets[0]]
+    # Zeitpunkt zwischen zwei Viertelstunden
+    assert snapshot.suggest(datetime(2025, 10, 10, 17, 40), 0, 0, 1, 2) == [buckets[3], buckets[2]]
+
+# =========================================================
+# TEST: Kapazitätsprofile
+# =========================================================
+def create_profile(**fields):
+    response = client.post("/capacity-profiles", json=fields)
+    assert response.status_code == 200
+    return response.json()["profile"]
+
+def test_profile_limits_time_range():
+    # Anlaufphase: bis 17:30 nur 2 Hähnchen
+    create_profile(name="Anlauf", time_start="17:00:00", time_end="17:30:00", chicken=2)
+
+    response = client.post("/validate-order", json=order_payload(chicken=3, time="17:15"))
+    assert response.status_code == 400
+    assert [e["code"] for e in response.json()["detail"]["errors"]] == ["LIMIT_CHICKEN_EXCEEDED"]
+    assert client.post("/validate-order", json=order_payload(chicken=3, time="17:30")).status_code == 200
+
+    slots = client.get("/capacity", params={"date": "2025-10-10"}).json()["slots"]
+    assert [s["chicken"] for s in slots[:3]] == [2, 2, 5]
+    assert slots[0]["limits"] == {"chicken": 2, "nuggets": 10, "fries": 10}
+
+def test_profile_precedence_and_updates():
+    db = SessionLocal()
+    slot_id = db.query(SlotDB).first().id
+    db.close()
+
+    general = create_profile(time_start="18:00:00", time_end="19:00:00", chicken=3)
+    dated = create_profile(date="2025-10-10", time_start="18:00:00", time_end="18:30:00", chicken=4)
+    create_profile(slot_id=slot_id, time_start="18:15:00", time_end="18:30:00", nuggets=1)
+
+    slots = {s["time"][11:16]: s["limits"] for s in client.get("/capacity", params={"date": "2025-10-10"}).json()["slots"]}
+    assert slots["17:45"] == {"chicken": 5, "nuggets": 10, "fries": 10}
+    assert slots["18:00"] == {"chicken": 4, "nuggets": 10, "fries": 10}
+    assert slots["18:15"] == {"chicken": 4, "nuggets": 1, "fries": 10}
+    assert slots["18:30"] == {"chicken": 3, "nuggets": 10, "fries": 10}
+
+    # Profil eines anderen Tages greift nicht
+    other = client.get("/capacity", params={"date": "2025-10-11"}).json()
+    assert other["slots"] == []
+
+    response = client.put(f"/capacity-profiles/{dated['id']}", json={**dated, "chicken": 1})
+    assert response.status_code == 200
+    assert client.post("/validate-order", json=order_payload(chicken=2, time="18:00")).status_code == 400
+
+    assert client.delete(f"/capacity-profiles/{dated['id']}").status_code == 200
+    assert client.delete(f"/capacity-profiles/{general['id']}").status_code == 200
+    assert client.post("/validate-order", json=order_payload(chicken=5, time="18:00")).status_code == 200
+
+    assert len(client.get("/capacity-profiles").json()) == 1
+
+def test_profile_invalid():
+    response = client.post("/capacity-profiles", json={"time_start": "18:00:00", "time_end": "17:00:00", "chicken": 1})
+    assert response.status_code == 422
+
+    response = client.post("/capacity-profiles", json={"slot_id": 999, "chicken": 1})
+    assert response.status_code == 400
+
+def test_compile_day_limits_only_rebuilds_affected_days():
+    from capacity import limits_cache
+
+    client.get("/capacity", params={"date": "2025-10-10"})
+    client.get("/capacity", params={"date": "2025-10-12"})
+    assert set(limits_cache._days) >= {date(2025, 10, 10), date(2025, 10, 12)}
+
+    create_profile(date="2025-10-12", chicken=1)
+    assert date(2025, 10, 12) not in limits_cache._days
+    assert date(2025, 10, 10) in limits_cache._days
+
+def test_limits_follow_writes_of_other_workers():
+    from cache_version import bump_version
+    from capacity import DayCache, compile_day_limits, limits_cache
+
+    worker = DayCache(compile_day_limits, name="limits", check_seconds=0)
+    db = SessionLocal()
+    assert worker.get(db, date(2025, 10, 10))[0] == (5, 10, 10)
+
+    # Ein anderer Worker ändert die Config; dieser Cache erfährt es nur über die Version
+    db.query(ConfigChickenDB).update({"chicken": 8})
+    bump_version(db, limits_cache.name)
+    db.commit()
+
+    assert worker.get(db, date(2025, 10, 10))[0] == (8, 10, 10)
+    db.close()
+
+def test_own_limit_writes_keep_unaffected_days(monkeypatch):
+    from capacity import limits_cache
+
+    monkeypatch.setattr(limits_cache, "check_seconds", 0)
+    client.get("/capacity", params={"date": "2025-10-10"})
+    client.get("/capacity", params={"date": "2025-10-12"})
+    create_profile(date="2025-10-12", chicken=1)
+    client.get("/capacity", params={"date": "2025-10-12"})
+    assert date(2025, 10, 10) in limits_cache._days
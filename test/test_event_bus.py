@@ -0,0 +1,194 @@
+import asyncio
+import errno
+import pytest
+
+import event_bus
+from event_bus import EventBus, PostgresEventBus, InProcessEventBus, UnixSocketEventBus, create_event_bus
+
+# =========================================================
+# TEST: In-Process-Bus stellt direkt zu
+# =========================================================
+def test_in_process_bus_delivers_locally():
+    received = []
+    bus = InProcessEventBus(lambda message, seq: received.append((seq, message)))
+
+    asyncio.run(bus.publish(b"hello"))
+    asyncio.run(bus.publish(b"world"))
+    assert received == [(1, b"hello"), (2, b"world")]
+
+# =========================================================
+# TEST: Unix-Socket-Bus verteilt an alle Worker
+# =========================================================
+def test_unix_socket_bus_delivers_to_all_workers(tmp_path):
+    async def scenario():
+        worker_a, worker_b = [], []
+        bus_a = UnixSocketEventBus(lambda message, seq: worker_a.append((seq, message)), directory=str(tmp_path))
+        bus_b = UnixSocketEventBus(lambda message, seq: worker_b.append((seq, message)), directory=str(tmp_path))
+        await bus_a.start()
+        await bus_b.start()
+
+        await bus_a.publish(b'{"event": "ORDER_CREATED"}')
+        await bus_b.publish(b'{"event": "ORDER_READY"}')
+        await asyncio.sleep(0.05)
+
+        await bus_a.stop()
+        await bus_b.stop()
+        return bus_a, bus_b, worker_a, worker_b
+
+    bus_a, bus_b, worker_a, worker_b = asyncio.run(scenario())
+    # Beide Worker sehen dieselben Sequenznummern aus dem gemeinsamen Zähler
+    assert sorted(seq for seq, _ in worker_a) == [1, 2]
+    assert sorted(worker_b) == sorted(worker_a)
+    assert bus_a.stream == bus_b.stream
+    assert [path.name for path in tmp_path.iterdir()] == ["stream.seq"]
+
+# =========================================================
+# TEST: Zu große Events werden gestückelt und vollständig zugestellt
+# =========================================================
+def test_unix_socket_bus_splits_large_events(tmp_path):
+    message = ('{"event": "ORDER_BATCH_CREATED", "items": "%s"}' % ("Hähnchen " * 20)).encode("utf-8")
+
+    async def scenario():
+        worker_a, worker_b = [], []
+        bus_a = UnixSocketEventBus(lambda message, seq: worker_a.append((seq, message)), directory=str(tmp_path))
+        bus_b = UnixSocketEventBus(lambda message, seq: worker_b.append((seq, message)), directory=str(tmp_path))
+        bus_a.max_bytes = bus_b.max_bytes = 50
+        await bus_a.start()
+        await bus_b.start()
+
+        await bus_a.publish(message)
+        await asyncio.sleep(0.05)
+
+        await bus_a.stop()
+        await bus_b.stop()
+        return bus_a, worker_a, worker_b
+
+    bus_a, worker_a, worker_b = asyncio.run(scenario())
+    assert worker_a == worker_b == [(1, message)]
+    assert bus_a.stats()["chunked"] == 1
+    assert bus_a.stats()["failed"] == 0
+
+def test_split_frames_keeps_utf8_characters_whole():
+    frames = event_bus._split_frames(7, "ääääääääää".encode("utf-8"), 15)
+    assert all(len(frame) <= 15 for frame in frames)
+    parts = [frame.partition(b":")[2] for frame in frames]
+    assert all(part.decode("utf-8") for part in parts)
+    assert b"".join(parts).decode("utf-8") == "ääääääääää"
+    assert frames[0].startswith(b"7/0/%d:" % len(frames))
+
+# =========================================================
+# TEST: Sockets beendeter Worker werden aufgeräumt
+# =========================================================
+def test_unix_socket_bus_removes_stale_sockets(tmp_path):
+    stale = tmp_path / "999-dead.sock"
+    stale.touch()
+
+    async def scenario():
+        received = []
+        bus = UnixSocketEventBus(lambda message, seq: received.append(message), directory=str(tmp_path))
+        await bus.publish(b"ping")
+        await asyncio.sleep(0.05)
+        await bus.stop()
+        return received
+
+    assert asyncio.run(scenario()) == [b"ping"]
+    assert not stale.exists()
+
+# =========================================================
+# TEST: Fehler beim Senden werden gezählt, nicht geworfen
+# =========================================================
+class FailingEventBus(EventBus):
+    async def _publish(self, message):
+        raise ConnectionError("bus down")
+
+    async def _next_seq(self):
+        return 1
+
+    async def _current_seq(self):
+        return 0
+
+def test_publish_failure_is_counted_not_raised():
+    async def scenario():
+        bus = FailingEventBus(print)
+        await bus.publish(b"lost")
+        await bus.stop()
+        return bus
+
+    bus = asyncio.run(scenario())
+    assert bus.stats() == {"backend": "FailingEventBus", "published": 0, "failed": 1, "dropped": 0, "chunked": 0, "pending": 0}
+
+def test_incomplete_backend_fails_at_construction():
+    class NoSequenceEventBus(EventBus):
+        async def _publish(self, message):
+            pass
+
+    with pytest.raises(TypeError):
+        NoSequenceEventBus(print)
+
+# =========================================================
+# TEST: Ein fehlerhafter Empfänger blockiert die anderen nicht
+# =========================================================
+class FullReceiverSocket:
+    """Wraps the send socket; the receiver "0-full.sock" always fails with ENOBUFS."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def sendto(self, message, path):
+        if path.endswith("0-full.sock"):
+            raise OSError(errno.ENOBUFS, "No buffer space available")
+        return self.sock.sendto(message, path)
+
+    def close(self):
+        self.sock.close()
+
+def test_unix_socket_bus_survives_failing_receiver(tmp_path):
+    async def scenario():
+        received = []
+        bus = UnixSocketEventBus(lambda message, seq: received.append(message), directory=str(tmp_path))
+        (tmp_path / "0-full.sock").touch()
+        await bus.start()
+        bus._send_sock = FullReceiverSocket(bus._send_sock)
+        await bus.publish(b"ping")
+        await asyncio.sleep(0.05)
+        await bus.stop()
+        return bus, received
+
+    bus, received = asyncio.run(scenario())
+    assert received == [b"ping"]
+    assert bus.stats()["peer_errors"] == 1
+    assert bus.stats()["published"] == 1
+
+# =========================================================
+# TEST: LISTEN-Verbindung wird mit Backoff neu aufgebaut
+# =========================================================
+def test_postgres_bus_reconnects_and_reports_gap(monkeypatch):
+    monkeypatch.setattr(event_bus, "EVENT_BUS_RECONNECT_MIN_SECONDS", 0.001)
+    gaps = []
+    bus = PostgresEventBus(print, "postgresql://localhost/test", on_gap=lambda stream, seq: gaps.append(seq))
+    attempts = []
+
+    async def connect():
+        attempts.append(True)
+        if len(attempts) < 3:
+            raise OSError("connection refused")
+
+    async def current_seq():
+        return 41
+
+    bus._connect = connect
+    bus._current_seq = current_seq
+    bus.started = True
+
+    async def scenario():
+        bus._on_terminated(None)
+        await bus._reconnect_task
+
+    asyncio.run(scenario())
+    assert len(attempts) == 3
+    assert gaps == [41]
+    assert bus.stats()["reconnects"] == 1
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_event_bus(print, backend="kafka")
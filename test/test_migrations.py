@@ -0,0 +1,54 @@
+from sqlalchemy import create_engine, inspect, text
+
+from migrations import MIGRATIONS, current_version, migrate, missing_indexes, pending_migrations
+from models import Base
+
+def make_engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+
+# =========================================================
+# TEST: Frische Datenbank wird vollständig angelegt
+# =========================================================
+def test_migrate_fresh_database(tmp_path):
+    engine = make_engine(tmp_path)
+    assert current_version(engine) == 0
+    assert "orders.ix_orders_status_date" in missing_indexes(engine)
+
+    assert migrate(engine) == [m.version for m in MIGRATIONS]
+    assert current_version(engine) == MIGRATIONS[-1].version
+    assert pending_migrations(engine) == []
+    assert missing_indexes(engine) == []
+
+    # Zweiter Lauf ist ein No-op
+    assert migrate(engine) == []
+
+# =========================================================
+# TEST: Bestehende Installation ohne Indizes wird nachgerüstet
+# =========================================================
+def test_migrate_adds_indexes_to_existing_schema(tmp_path):
+    engine = make_engine(tmp_path)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_orders_date_id"))
+        conn.execute(text("DROP INDEX ix_slots_range"))
+    assert missing_indexes(engine) == ["orders.ix_orders_date_id", "slots.ix_slots_range"]
+
+    migrate(engine)
+    assert missing_indexes(engine) == []
+    assert "ix_slots_range" in {index["name"] for index in inspect(engine).get_indexes("slots")}
+
+# =========================================================
+# TEST: schema_version wird erst unter der Sperre angelegt
+# =========================================================
+def test_schema_version_table_created_under_lock(tmp_path, monkeypatch):
+    import migrations
+    from sqlalchemy import event
+
+    engine = make_engine(tmp_path)
+    calls = []
+    monkeypatch.setattr(migrations, "_lock", lambda conn: calls.append("lock"))
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: calls.append(statement))
+
+    migrate(engine)
+    create = next(index for index, call in enumerate(calls) if "CREATE TABLE schema_version" in call)
+    assert calls[:create].count("lock") == 1
@@ -48,6 +48,13 @@ def test_get_products():
     assert len(data) == 2
     assert data[0]["product"] == "Chicken"
     assert data[1]["product"] == "Fries"
+    assert set(data[0]) == set(ProductResponse.model_fields)
+    assert data[0]["price"] == 5.0
+
+def test_read_endpoints_document_response_models():
+    schema = client.get("/openapi.json").json()
+    response = schema["paths"]["/products"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert response["items"]["$ref"].endswith("/ProductResponse")
 
 # =========================================================
 # TEST: GET /product/{id}
@@ -132,3 +139,57 @@ def test_delete_product():
 def test_delete_product_not_found():
     response = client.delete("/product/999")
     assert response.status_code == 404
+
+# =========================================================
+# TEST: Preistabelle
+# =========================================================
+def test_price_table_follows_product_writes():
+    from pricing import price_table
+
+    price_table.invalidate()
+    payload = {
+        "firstname": "John", "lastname": "Doe", "mail": "j@d.com", "phonenumber": "123",
+        "date": "2025-10-10T17:00:00", "chicken": 3, "nuggets": 0, "fries": 0,
+        "miscellaneous": "", "status": "CREATED", "price": 0, "checked_in_at": None
+    }
+    assert client.post("/order/price", json=payload).json()["price"] == 0
+
+    created = client.post("/product", json={"id": 0, "product": "chicken", "price": 0.1, "name": "Chicken"}).json()
+    # Dezimal statt Float: 3 * 0.1 ergibt genau 0.3
+    assert client.post("/order/price", json=payload).json()["price"] == 0.3
+
+    client.put(f"/product/{created['id']}", json={"id": created["id"], "product": "chicken", "price": 2.5, "name": "Chicken"})
+    assert client.post("/order/price", json=payload).json()["price"] == 7.5
+
+    client.delete(f"/product/{created['id']}")
+    assert client.post("/order/price", json=payload).json()["price"] == 0
+
+def test_order_price_needs_no_query():
+    from pricing import price_table
+    from test.test_tables import count_queries
+
+    db = SessionLocal()
+    create_test_product(db, name="chicken", price=5.0)
+    price_table.invalidate()
+    payload = {
+        "firstname": "John", "lastname": "Doe", "mail": "j@d.com", "phonenumber": "123",
+        "date": "2025-10-10T17:00:00", "chicken": 2, "nuggets": 0, "fries": 0,
+        "miscellaneous": "", "status": "CREATED", "price": 0, "checked_in_at": None
+    }
+
+    response, queries = count_queries(lambda: client.post("/order/price", json=payload))
+    assert response.json()["price"] == 10.0
+    assert queries > 0
+
+    response, queries = count_queries(lambda: client.post("/order/price", json=payload))
+    assert response.json()["price"] == 10.0
+    assert queries == 0
+
+def test_price_order_uses_decimal():
+    from decimal import Decimal
+    from types import SimpleNamespace
+    from pricing import price_order
+
+    prices = {"chicken": Decimal("0.10"), "nuggets": Decimal("0.20"), "fries": Decimal("1.15")}
+    order = SimpleNamespace(chicken=1, nuggets=1, fries=3)
+    assert price_order(prices, order) == Decimal("3.75")
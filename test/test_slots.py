@@ -11,6 +11,7 @@ os.environ["DATABASE_URL"] = "sqlite://"
 from app import app
 from database import SessionLocal, get_db
 from models import *
+from slot_index import slot_index
 
 client = TestClient(app)
 
@@ -22,6 +23,7 @@ def setup_db():
     db = SessionLocal()
     Base.metadata.drop_all(bind=db.bind)
     Base.metadata.create_all(bind=db.bind)
+    slot_index.invalidate()
     yield
     db.close()
 
@@ -124,4 +126,63 @@ def test_delete_slot():
 
 def test_delete_slot_not_found():
     response = client.delete("/slots/999")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+# =========================================================
+# TEST: Slot-Index
+# =========================================================
+def test_get_all_slots_sorted_from_index():
+    db = SessionLocal()
+    create_test_slot(db, date(2023, 1, 2), datetime(2023, 1, 2, 14, 0), datetime(2023, 1, 2, 16, 0))
+    create_test_slot(db, date(2023, 1, 1), datetime(2023, 1, 1, 10, 0), datetime(2023, 1, 1, 12, 0))
+
+    data = client.get("/slots").json()
+    assert [s["range_start"] for s in data] == ["2023-01-01T10:00:00", "2023-01-02T14:00:00"]
+    assert set(data[0]) == {"id", "date", "range_start", "range_end"}
+
+def test_slot_index_find():
+    db = SessionLocal()
+    create_test_slot(db, date(2023, 1, 1), datetime(2023, 1, 1, 10, 0), datetime(2023, 1, 1, 18, 0))
+    inner = create_test_slot(db, date(2023, 1, 1), datetime(2023, 1, 1, 11, 0), datetime(2023, 1, 1, 12, 0))
+    late = create_test_slot(db, date(2023, 1, 1), datetime(2023, 1, 1, 20, 0), datetime(2023, 1, 1, 22, 0))
+
+    assert slot_index.find(db, datetime(2023, 1, 1, 11, 30)).id == inner.id
+    # Langer Slot überdeckt das Ende des inneren
+    assert slot_index.find(db, datetime(2023, 1, 1, 17, 0)).range_end == datetime(2023, 1, 1, 18, 0)
+    assert slot_index.find(db, datetime(2023, 1, 1, 22, 0)).id == late.id
+    assert slot_index.find(db, datetime(2023, 1, 1, 19, 0)) is None
+    assert slot_index.find(db, datetime(2023, 1, 1, 9, 59)) is None
+
+    overlapping = slot_index.overlapping(db, datetime(2023, 1, 1, 17, 30), datetime(2023, 1, 1, 21, 0))
+    assert [s.range_start.hour for s in overlapping] == [10, 20]
+    db.close()
+
+def test_slot_writes_rebuild_index():
+    payload = {"date": "2023-01-01", "range_start": "2023-01-01T10:00:00", "range_end": "2023-01-01T12:00:00"}
+    assert client.get("/slots").json() == []
+
+    created = client.post("/slots", json=payload).json()["created_slot"]
+    assert len(client.get("/slots").json()) == 1
+
+    client.put(f"/slots/{created['id']}", json={**payload, "range_end": "2023-01-01T13:00:00"})
+    assert client.get("/slots").json()[0]["range_end"] == "2023-01-01T13:00:00"
+
+    client.delete(f"/slots/{created['id']}")
+    assert client.get("/slots").json() == []
+
+def test_slot_index_follows_version_of_other_workers():
+    from cache_version import bump_version, read_version
+    from slot_index import SlotIndex
+
+    # Zweiter Worker mit eigenem Index, prüft die Version bei jedem Zugriff
+    other_worker = SlotIndex(check_seconds=0)
+    db = SessionLocal()
+    assert other_worker.all(db) == []
+
+    create_test_slot(db, date(2023, 1, 1), datetime(2023, 1, 1, 10, 0), datetime(2023, 1, 1, 12, 0))
+    assert other_worker.all(db) == []
+
+    bump_version(db, "slots")
+    db.commit()
+    assert read_version(db, "slots") == 1
+    assert len(other_worker.all(db)) == 1
+    db.close()
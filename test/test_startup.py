@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Test-Umgebung setzen
+os.environ["TESTING"] = "1"
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from app import create_app
+from settings import Settings
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Obergrenze für `import app` (großzügig, damit langsame CI-Runner nicht flattern)
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", 5))
+
+# =========================================================
+# TEST: Import ist schnell und berührt die Datenbank nicht
+# =========================================================
+def test_import_app_within_budget(tmp_path):
+    database = tmp_path / "import.db"
+    env = {
+        **os.environ,
+        "TESTING": "",
+        "DATABASE_URL": f"sqlite:///{database}",
+        "PYTHONPATH": str(ROOT),
+    }
+    script = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True, check=True)
+
+    assert float(result.stdout.strip().splitlines()[-1]) < IMPORT_BUDGET_SECONDS
+    assert not database.exists()
+
+# =========================================================
+# TEST: Lifespan migriert, wärmt auf und misst die Schritte
+# =========================================================
+def test_lifespan_warm_up_timings():
+    app = create_app(Settings(pool_warm_connections=1, ws_drain_seconds=0))
+    with TestClient(app) as client:
+        assert client.get("/").json() == {"success": True}
+        assert list(app.state.startup_timings) == ["migrate", "pool", "caches", "hashing", "jwt"]
+
+def test_lifespan_without_warm_up():
+    app = create_app(Settings(auto_migrate=False, warm_up=False))
+    with TestClient(app):
+        assert app.state.startup_timings == {}
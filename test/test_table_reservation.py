@@ -4,16 +4,18 @@ from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from test.test_tables import create_test_reservation, create_test_table
+from test.test_tables import count_queries, create_test_reservation, create_test_table
 
 # Test-Umgebung setzen
 os.environ["TESTING"] = "1"
 os.environ["DATABASE_URL"] = "sqlite://"
 
 from app import app
-from database import SessionLocal, get_db
+from database import SessionLocal, engine, get_db
 from models import *
 
+Base.metadata.create_all(bind=engine)
+
 client = TestClient(app)
 
 # =========================================================
@@ -31,6 +33,23 @@ def test_get_table_reservations():
     assert len(data) == 1
     assert data[0]["customer_name"] == "John"
 
+def test_get_table_reservations_window():
+    db = SessionLocal()
+    table = create_test_table(db, "Window", 4)
+    create_test_reservation(db, "Inside", 2, datetime(2030, 5, 1, 18, 0), datetime(2030, 5, 1, 20, 0), table.id)
+    create_test_reservation(db, "Outside", 2, datetime(2030, 5, 2, 18, 0), datetime(2030, 5, 2, 20, 0), table.id)
+
+    response, queries = count_queries(lambda: client.get(
+        "/table-reservations",
+        params={"from": "2030-05-01T00:00:00", "to": "2030-05-01T23:59:00"}
+    ))
+    assert response.status_code == 200
+    assert queries == 1
+
+    data = response.json()
+    assert [r["customer_name"] for r in data] == ["Inside"]
+    assert data[0]["table"]["name"] == "Window"
+
 # =========================================================
 # TEST: GET /table-reservations/{id}
 # =========================================================
@@ -72,6 +91,27 @@ def test_create_table_reservation():
     assert data["success"] is True
     assert data["reservation"]["customer_name"] == "Jane"
 
+def test_create_table_reservation_locks_table():
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session as OrmSession
+
+    db = SessionLocal()
+    table = create_test_table(db, "Table 1", 4)
+    locked = []
+
+    def on_execute(state):
+        if state.is_select and state.statement._for_update_arg is not None:
+            locked.append(state.bind_mapper.class_)
+
+    # SQLite kennt kein FOR UPDATE; geprüft wird, dass die Route die Sperre anfordert
+    event.listen(OrmSession, "do_orm_execute", on_execute)
+    try:
+        payload = {"customer_name": "Jane", "seats": 2, "start": "2023-01-02T19:00:00", "end": "2023-01-02T21:00:00", "table_id": table.id}
+        assert client.post("/table-reservations", json=payload).status_code == 200
+    finally:
+        event.remove(OrmSession, "do_orm_execute", on_execute)
+    assert locked == [TableDB]
+
 def test_create_table_reservation_table_not_found():
     payload = {
         "customer_name": "Jane",
@@ -136,4 +176,77 @@ def test_delete_table_reservation():
 
 def test_delete_table_reservation_not_found():
     response = client.delete("/table-reservations/999")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+# =========================================================
+# TEST: POST /table-reservations/optimize
+# =========================================================
+def test_optimize_seating_matches_exhaustive_search():
+    import itertools
+    import random
+    from seating import SeatingReservation, SeatingTable, is_feasible, optimize_seating, wasted_seats
+
+    rng = random.Random(13)
+    for _ in range(30):
+        tables = [SeatingTable(i, rng.choice([2, 4, 6])) for i in range(3)]
+        reservations = []
+        for i in range(5):
+            first = rng.randrange(0, 12)
+            length = rng.randrange(1, 6)
+            reservations.append(SeatingReservation(i, rng.choice([1, 2, 3, 4, 5]), ((1 << length) - 1) << first))
+
+        best = (0, 0)
+        for choice in itertools.product([None] + [t.id for t in tables], repeat=len(reservations)):
+            assignment = dict(zip([r.id for r in reservations], choice))
+            seated = [r for r in reservations if assignment[r.id] is not None]
+            if is_feasible(tables, seated, assignment):
+                best = max(best, (len(seated), -wasted_seats(tables, seated, assignment)))
+
+        result = optimize_seating(tables, reservations)
+        assert (result.placed, -result.wasted_seats) == best
+        assert result.complete
+
+def test_optimize_table_reservations():
+    from test.test_tables import reset_occupancy
+
+    db = SessionLocal()
+    Base.metadata.drop_all(bind=db.bind)
+    Base.metadata.create_all(bind=db.bind)
+    reset_occupancy()
+
+    small = create_test_table(db, "Small", 2)
+    large = create_test_table(db, "Large", 4)
+    couple = create_test_reservation(db, "Couple", 2, datetime(2031, 3, 3, 18, 0), datetime(2031, 3, 3, 20, 0), large.id)
+    create_test_reservation(db, "Late couple", 2, datetime(2031, 3, 3, 20, 0), datetime(2031, 3, 3, 22, 0), small.id)
+
+    response = client.post("/table-reservations/optimize", params={"date": "2031-03-03"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["applied"] is False
+    assert data["wasted_seats"] == {"before": 2, "after": 0}
+    assert [(c["id"], c["from_table_id"], c["to_table_id"]) for c in data["changes"]] == [(couple.id, large.id, small.id)]
+
+    # Dry run ändert nichts
+    db.refresh(couple)
+    assert couple.table_id == large.id
+
+    response = client.post("/table-reservations/optimize", params={"date": "2031-03-03", "apply": True})
+    assert response.status_code == 200
+    assert response.json()["applied"] is True
+    db.refresh(couple)
+    assert couple.table_id == small.id
+
+    response = client.get("/tables/availability", params={"seats": 4, "start": "2031-03-03T18:00:00", "end": "2031-03-03T22:00:00"})
+    assert [t["id"] for t in response.json()] == [large.id]
+
+    # Nichts mehr zu verbessern
+    response = client.post("/table-reservations/optimize", params={"date": "2031-03-03"})
+    assert response.json()["changes"] == []
+
+def test_optimize_table_reservations_unplaceable():
+    db = SessionLocal()
+    table = create_test_table(db, "Tiny", 2)
+    create_test_reservation(db, "Party", 8, datetime(2031, 4, 4, 18, 0), datetime(2031, 4, 4, 20, 0), table.id)
+
+    response = client.post("/table-reservations/optimize", params={"date": "2031-04-04", "apply": True})
+    assert response.status_code == 409
+    assert len(response.json()["detail"]["unplaced"]) == 1
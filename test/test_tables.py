@@ -139,3 +139,170 @@ def test_delete_table():
 def test_delete_table_not_found():
     response = client.delete("/tables/999")
     assert response.status_code == 404
+
+# =========================================================
+# TEST: GET /tables-with-reservations
+# =========================================================
+def count_queries(fn):
+    from sqlalchemy import event
+    from database import engine
+
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return result, len(statements)
+
+def test_get_tables_with_reservations_constant_queries():
+    db = SessionLocal()
+    for i in range(5):
+        table = create_test_table(db, f"Table {i}", 4)
+        create_test_reservation(db, "Late", 2, datetime(2023, 1, 1, 20, 0), datetime(2023, 1, 1, 21, 0), table.id)
+        create_test_reservation(db, "Early", 2, datetime(2023, 1, 1, 18, 0), datetime(2023, 1, 1, 19, 0), table.id)
+
+    response, queries = count_queries(lambda: client.get("/tables-with-reservations"))
+    assert response.status_code == 200
+    assert queries == 2
+
+    data = response.json()
+    assert len(data) == 5
+    assert [r["customer_name"] for r in data[0]["reservations"]] == ["Early", "Late"]
+
+def test_get_tables_with_reservations_window():
+    db = SessionLocal()
+    table = create_test_table(db, "Table 1", 4)
+    create_test_reservation(db, "Early", 2, datetime(2023, 1, 1, 18, 0), datetime(2023, 1, 1, 19, 0), table.id)
+    create_test_reservation(db, "Late", 2, datetime(2023, 1, 1, 20, 0), datetime(2023, 1, 1, 21, 0), table.id)
+    create_test_reservation(db, "Next day", 2, datetime(2023, 1, 2, 18, 0), datetime(2023, 1, 2, 19, 0), table.id)
+
+    response = client.get(
+        "/tables-with-reservations",
+        params={"from": "2023-01-01T19:30:00", "to": "2023-01-01T23:59:00"}
+    )
+    assert response.status_code == 200
+
+    data = response.json()
+    assert len(data) == 1
+    assert [r["customer_name"] for r in data[0]["reservations"]] == ["Late"]
+
+# =========================================================
+# TEST: GET /tables/availability
+# =========================================================
+def reset_occupancy():
+    from occupancy import occupancy
+    occupancy.invalidate()
+    occupancy.invalidate_tables()
+
+def test_day_masks():
+    from occupancy import day_masks
+
+    masks = day_masks(datetime(2023, 1, 1, 18, 0), datetime(2023, 1, 1, 19, 0))
+    assert masks == {datetime(2023, 1, 1).date(): 0b1111 << 72}
+
+    # Angebrochene Viertelstunden zählen, leere Intervalle belegen einen Slot
+    assert day_masks(datetime(2023, 1, 1, 0, 10), datetime(2023, 1, 1, 0, 20)) == {datetime(2023, 1, 1).date(): 0b11}
+    assert day_masks(datetime(2023, 1, 1, 0, 0), datetime(2023, 1, 1, 0, 0)) == {datetime(2023, 1, 1).date(): 0b1}
+
+    # Über Mitternacht
+    masks = day_masks(datetime(2023, 1, 1, 23, 30), datetime(2023, 1, 2, 0, 30))
+    assert masks == {datetime(2023, 1, 1).date(): 0b11 << 94, datetime(2023, 1, 2).date(): 0b11}
+
+def test_get_table_availability():
+    db = SessionLocal()
+    small = create_test_table(db, "Small", 2)
+    large = create_test_table(db, "Large", 6)
+    create_test_table(db, "Medium", 4)
+    create_test_reservation(db, "Busy", 4, datetime(2023, 1, 1, 18, 0), datetime(2023, 1, 1, 20, 0), large.id)
+    reset_occupancy()
+
+    params = {"seats": 2, "start": "2023-01-01T19:00:00", "end": "2023-01-01T21:00:00"}
+    response = client.get("/tables/availability", params=params)
+    assert response.status_code == 200
+    assert [t["name"] for t in response.json()] == ["Small", "Medium"]
+
+    response = client.get("/tables/availability", params={**params, "seats": 5})
+    assert response.json() == []
+
+    # Direkt anschließend ist der große Tisch frei
+    response = client.get("/tables/availability", params={"seats": 5, "start": "2023-01-01T20:00:00", "end": "2023-01-01T22:00:00"})
+    assert [t["name"] for t in response.json()] == ["Large"]
+
+    # Neue Reservierungen werden im Cache nachgezogen
+    payload = {"customer_name": "Walk-in", "seats": 2, "start": "2023-01-01T19:00:00", "end": "2023-01-01T20:00:00", "table_id": small.id}
+    assert client.post("/table-reservations", json=payload).status_code == 200
+    response = client.get("/tables/availability", params=params)
+    assert [t["name"] for t in response.json()] == ["Medium"]
+
+def test_availability_sees_reservations_of_other_workers():
+    from cache_version import bump_version
+    from occupancy import OccupancyIndex
+
+    db = SessionLocal()
+    table = create_test_table(db, "Table 1", 4)
+    index = OccupancyIndex(check_seconds=0)
+    start, end = datetime(2023, 1, 1, 18, 0), datetime(2023, 1, 1, 19, 0)
+    assert [t["id"] for t in index.available_tables(db, 2, start, end)] == [table.id]
+
+    # Ein anderer Worker reserviert; dieser Index erfährt es nur über die Version
+    db.add(TableReservationDB(customer_name="Other", seats=2, start=start, end=end, table_id=table.id))
+    bump_version(db, index.name)
+    db.commit()
+
+    assert index.available_tables(db, 2, start, end) == []
+    db.close()
+
+def test_own_writes_keep_the_occupancy_cache():
+    from cache_version import bump_version
+    from occupancy import OccupancyIndex
+
+    db = SessionLocal()
+    table = create_test_table(db, "Table 1", 4)
+    index = OccupancyIndex(check_seconds=0)
+    day = datetime(2023, 1, 2)
+    start, end = day.replace(hour=18), day.replace(hour=19)
+    index.available_tables(db, 2, start, end)
+
+    # Eigene Reservierung: der Index wird nachgezogen, nicht verworfen
+    db.add(TableReservationDB(customer_name="Own", seats=2, start=start, end=end, table_id=table.id))
+    version = bump_version(db, index.name)
+    db.commit()
+    index.add(table.id, start, end, version=version)
+
+    assert index.available_tables(db, 2, start, end) == []
+    assert day.date() in index._days
+    assert index._tables is not None
+    db.close()
+
+def test_get_table_availability_invalid_interval():
+    response = client.get("/tables/availability", params={"start": "2023-01-01T20:00:00", "end": "2023-01-01T19:00:00"})
+    assert response.status_code == 400
+
+def test_reservation_conflicts_rejected():
+    db = SessionLocal()
+    table = create_test_table(db, "Table 1", 4)
+    reset_occupancy()
+
+    payload = {"customer_name": "First", "seats": 2, "start": "2023-01-01T18:00:00", "end": "2023-01-01T20:00:00", "table_id": table.id}
+    first = client.post("/table-reservations", json=payload)
+    assert first.status_code == 200
+
+    conflict = client.post("/table-reservations", json={**payload, "customer_name": "Second", "start": "2023-01-01T19:45:00", "end": "2023-01-01T21:00:00"})
+    assert conflict.status_code == 409
+
+    # Die eigene Reservierung ist beim Update kein Konflikt
+    reservation_id = first.json()["reservation"]["id"]
+    moved = client.put(f"/table-reservations/{reservation_id}", json={**payload, "end": "2023-01-01T19:00:00"})
+    assert moved.status_code == 200
+
+    second = client.post("/table-reservations", json={**payload, "customer_name": "Second", "start": "2023-01-01T19:00:00", "end": "2023-01-01T21:00:00"})
+    assert second.status_code == 200
+
+    # Nach dem Löschen ist der Tisch wieder frei
+    assert client.delete(f"/table-reservations/{reservation_id}").status_code == 200
+    response = client.get("/tables/availability", params={"start": "2023-01-01T18:00:00", "end": "2023-01-01T19:00:00"})
+    assert [t["id"] for t in response.json()] == [table.id]
@@ -133,8 +133,7 @@ def test_change_password():
 def test_reset_password(monkeypatch):
     db = SessionLocal()
 
-    # get_db aus dem Router importieren
-    from routes.user_route import get_db as router_get_db
+    from database import get_db as router_get_db
 
     def override_get_db():
         try:
@@ -161,3 +160,130 @@ def test_reset_password(monkeypatch):
     assert response.json()["msg"] == "Password reset successfully"
 
     app.dependency_overrides.clear()
+
+# =========================================================
+# TEST: Rehash beim Login bei geänderten Argon2-Parametern
+# =========================================================
+def test_login_rehashes_outdated_hash():
+    from passlib.hash import argon2
+    from auth import ARGON2_TIME_COST, hashing_pool
+
+    db = SessionLocal()
+    user = UserDB(
+        username="oldhash",
+        email="oldhash@mail.com",
+        hashed_password=argon2.using(rounds=ARGON2_TIME_COST + 1).hash("pw"),
+        verifyed=True
+    )
+    db.add(user)
+    db.commit()
+    jobs_before = hashing_pool.stats()["jobs"]
+
+    response = client.post("/user/token", data={"username": "oldhash", "password": "pw"})
+    assert response.status_code == 200
+
+    db.refresh(user)
+    assert f"t={ARGON2_TIME_COST}," in user.hashed_password
+    assert hashing_pool.stats()["jobs"] == jobs_before + 1
+    assert client.get("/health").json()["hashing"] == hashing_pool.stats()
+    db.close()
+
+def test_login_wrong_password():
+    db = SessionLocal()
+    create_test_user(db, username="wrongpw", password="right", verified=True)
+
+    response = client.post("/user/token", data={"username": "wrongpw", "password": "wrong"})
+    assert response.status_code == 401
+
+# =========================================================
+# TEST: Auth-Cache für get_current_user
+# =========================================================
+def test_user_me_served_from_cache():
+    from auth import auth_cache
+    auth_cache.clear()
+
+    db = SessionLocal()
+    user = create_test_user(db, username="cached", password="pw", verified=True)
+    token = create_access_token({"sub": user.username})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/user/me", headers=headers).status_code == 200
+
+    # Zweiter Request kommt ohne DB-Lookup aus dem Cache
+    db.delete(user)
+    db.commit()
+    response = client.get("/user/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == "cached"
+
+    auth_cache.invalidate_user("cached")
+    assert client.get("/user/me", headers=headers).status_code == 404
+    db.close()
+
+def test_change_password_invalidates_cache():
+    from auth import auth_cache, decode_token, token_cache_key
+    auth_cache.clear()
+
+    db = SessionLocal()
+    create_test_user(db, username="cachepw", password="oldpw", verified=True)
+    token = create_access_token({"sub": "cachepw"})
+    assert client.get("/user/me", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    key = token_cache_key(decode_token(token))
+    assert auth_cache.get(key) is not None
+
+    response = client.post(
+        "/user/change-password",
+        params={"username": "cachepw", "old_password": "oldpw", "new_password": "newpw"}
+    )
+    assert response.status_code == 200
+    assert auth_cache.get(key) is None
+    db.close()
+
+def test_auth_cache_evicts_least_recently_used():
+    from auth import AuthCache
+    cache = AuthCache(maxsize=2, ttl=60)
+    cache.put("a", "alice", 1)
+    cache.put("b", "bob", 2)
+    assert cache.get("a") == 1
+    cache.put("c", "carol", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_auth_cache_ttl():
+    from auth import AuthCache
+    cache = AuthCache(maxsize=2, ttl=0)
+    cache.put("a", "alice", 1)
+    assert cache.get("a") is None
+
+def test_user_me_with_embedded_claims(monkeypatch):
+    monkeypatch.setattr("routes.user_route.AUTH_EMBED_CLAIMS", True)
+    # Token mit eingebetteten Claims braucht keinen Benutzer in der DB
+    token = create_access_token({
+        "sub": "embedded",
+        "usr": {"id": 7, "email": "embedded@mail.com", "verifyed": True}
+    })
+
+    response = client.get("/user/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": 7, "username": "embedded", "email": "embedded@mail.com", "verifyed": True
+    }
+
+def test_user_me_ignores_embedded_claims_when_disabled(monkeypatch):
+    monkeypatch.setattr("routes.user_route.AUTH_EMBED_CLAIMS", False)
+    # Ohne AUTH_EMBED_CLAIMS zählt nur der Benutzer in der DB
+    token = create_access_token({
+        "sub": "embedded",
+        "usr": {"id": 7, "email": "embedded@mail.com", "verifyed": True}
+    })
+
+    response = client.get("/user/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 404
+
+def test_user_me_invalid_token():
+    response = client.get("/user/me", headers={"Authorization": "Bearer invalid"})
+    assert response.status_code == 401
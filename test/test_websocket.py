@@ -0,0 +1,332 @@
+import os
+import asyncio
+import json
+import zlib
+from datetime import datetime
+from decimal import Decimal
+import pytest
+from fastapi.testclient import TestClient
+
+# Test-Umgebung setzen
+os.environ["TESTING"] = "1"
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from app import app
+from event_bus import UnixSocketEventBus
+from routes.websocket import Broadcaster, broadcast_order_event, broadcaster, encode_event
+
+client = TestClient(app)
+
+# ---------------------------------------------------------
+# Helper: WebSocket, dessen send_text hängt
+# ---------------------------------------------------------
+class StalledWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+        self.release = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        await self.release.wait()
+        self.sent.append(message)
+
+    async def send_bytes(self, message):
+        await self.release.wait()
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+class BrokenWebSocket(StalledWebSocket):
+    async def send_text(self, message):
+        raise ConnectionResetError()
+
+# =========================================================
+# TEST: Broadcast an alle verbundenen Clients
+# =========================================================
+def test_broadcast_to_all_clients():
+    with client.websocket_connect("/ws/orders") as ws1, client.websocket_connect("/ws/orders") as ws2:
+        asyncio.run(broadcast_order_event("ORDER_CREATED", {"id": 1}))
+
+        message1, message2 = ws1.receive_json(), ws2.receive_json()
+        assert message1 == message2
+        assert message1["event"] == "ORDER_CREATED"
+        assert message1["data"] == {"id": 1}
+        assert message1["seq"] == broadcaster.seq
+        assert message1["stream"] == broadcaster.stream
+
+    assert len(broadcaster.clients) == 0
+
+# =========================================================
+# TEST: Subscription filtert nach Status, Datum und Uhrzeit
+# =========================================================
+def test_subscription_filters_events():
+    def order(id, status, date):
+        return {"id": id, "status": status, "date": date}
+
+    with client.websocket_connect("/ws/orders") as fryer, client.websocket_connect("/ws/orders") as board:
+        fryer.send_json({
+            "action": "subscribe",
+            "statuses": ["PREPARING", "READY_FOR_PICKUP"],
+            "date": "2025-10-11",
+            "from": "17:00",
+            "to": "18:00"
+        })
+        assert fryer.receive_json()["event"] == "SUBSCRIBED"
+
+        asyncio.run(broadcast_order_event("ORDER_CREATED", order(1, "CREATED", "2025-10-11T17:15:00")))
+        asyncio.run(broadcast_order_event("ORDER_PREPARING", order(2, "PREPARING", "2025-10-12T17:15:00")))
+        asyncio.run(broadcast_order_event("ORDER_PREPARING", order(3, "PREPARING", "2025-10-11T19:00:00")))
+        asyncio.run(broadcast_order_event("ORDER_PREPARING", order(4, "PREPARING", "2025-10-11T17:15:00")))
+
+        assert fryer.receive_json()["data"]["id"] == 4
+        assert [board.receive_json()["data"]["id"] for _ in range(4)] == [1, 2, 3, 4]
+
+    assert broadcaster.by_status == {}
+    assert broadcaster.by_date == {}
+
+def test_invalid_subscription():
+    with client.websocket_connect("/ws/orders") as ws:
+        ws.send_json({"action": "subscribe", "statuses": ["UNKNOWN"]})
+        assert ws.receive_json()["event"] == "SUBSCRIPTION_ERROR"
+
+# =========================================================
+# TEST: Reconnect mit last_seq bekommt nur verpasste Events
+# =========================================================
+def test_resume_replays_missed_events():
+    with client.websocket_connect("/ws/orders") as ws:
+        asyncio.run(broadcast_order_event("ORDER_CREATED", {"id": 10}))
+        last = ws.receive_json()
+
+    asyncio.run(broadcast_order_event("ORDER_CREATED", {"id": 11}))
+    asyncio.run(broadcast_order_event("ORDER_CREATED", {"id": 12}))
+
+    with client.websocket_connect("/ws/orders") as ws:
+        ws.send_json({"action": "resume", "last_seq": last["seq"], "stream": last["stream"]})
+        assert ws.receive_json()["data"] == {"id": 11}
+        assert ws.receive_json()["data"] == {"id": 12}
+        assert ws.receive_json()["event"] == "RESUMED"
+
+def test_resume_requires_resync_when_gap_is_evicted():
+    async def scenario():
+        hub = Broadcaster(replay_size=2)
+        ws = StalledWebSocket()
+        ws.release.set()
+        for i in range(5):
+            hub.publish(encode_event("ORDER_CREATED", {"id": i}), i + 1)
+        client = await hub.connect(ws)
+        fits = hub.resume(client, 3, hub.stream)
+        too_old = hub.resume(client, 1, hub.stream)
+        other_stream = hub.resume(client, 4, "other")
+        await asyncio.sleep(0.01)
+        return ws, fits, too_old, other_stream
+
+    ws, fits, too_old, other_stream = asyncio.run(scenario())
+    assert (fits, too_old, other_stream) == (True, False, False)
+    assert [json.loads(m)["seq"] for m in ws.sent] == [4, 5]
+
+# =========================================================
+# TEST: Events zwischen connect und resume kommen genau einmal, in Reihenfolge
+# =========================================================
+def test_resume_skips_events_already_sent_live():
+    async def scenario():
+        hub = Broadcaster()
+        for seq in (1, 2, 3):
+            hub.publish(encode_event("ORDER_CREATED", {"id": seq}), seq)
+        ws = StalledWebSocket()
+        client = await hub.connect(ws)
+        await asyncio.sleep(0)
+        hub.publish(encode_event("ORDER_CREATED", {"id": 4}), 4)
+        await asyncio.sleep(0)
+        hub.publish(encode_event("ORDER_CREATED", {"id": 5}), 5)
+        resumed = hub.resume(client, 1, hub.stream)
+        ws.release.set()
+        await asyncio.sleep(0.01)
+        return ws, resumed
+
+    ws, resumed = asyncio.run(scenario())
+    assert resumed
+    # 4 war beim Resume schon beim Writer, 5 wartete noch in der Queue
+    assert [json.loads(m)["seq"] for m in ws.sent] == [4, 2, 3, 5]
+
+# =========================================================
+# TEST: Resume funktioniert auch auf einem anderen Worker
+# =========================================================
+def test_resume_on_other_worker(tmp_path):
+    async def scenario():
+        worker_a, worker_b = Broadcaster(), Broadcaster()
+        bus_a = UnixSocketEventBus(worker_a.publish, directory=str(tmp_path), on_gap=worker_a.mark_discontinuous)
+        bus_b = UnixSocketEventBus(worker_b.publish, directory=str(tmp_path), on_gap=worker_b.mark_discontinuous)
+        await bus_a.start()
+        await bus_b.start()
+
+        ws_a = StalledWebSocket()
+        ws_a.release.set()
+        await worker_a.connect(ws_a)
+        for i in range(3):
+            await bus_a.publish(encode_event("ORDER_CREATED", {"id": i}))
+        await asyncio.sleep(0.05)
+        last = json.loads(ws_a.sent[1])
+
+        # Worker A wird beendet, der Client verbindet sich mit Worker B
+        ws_b = StalledWebSocket()
+        ws_b.release.set()
+        client_b = await worker_b.connect(ws_b)
+        resumed = worker_b.resume(client_b, last["seq"], last["stream"])
+        await asyncio.sleep(0.01)
+
+        await bus_a.stop()
+        await bus_b.stop()
+        return ws_b, resumed
+
+    ws_b, resumed = asyncio.run(scenario())
+    assert resumed
+    assert [json.loads(m)["data"]["id"] for m in ws_b.sent] == [2]
+
+# =========================================================
+# TEST: Nach einer Lücke im Event-Bus müssen Clients neu laden
+# =========================================================
+def test_discontinuity_requires_resync():
+    async def scenario():
+        hub = Broadcaster()
+        ws = StalledWebSocket()
+        ws.release.set()
+        client = await hub.connect(ws)
+        hub.publish(encode_event("ORDER_CREATED", {"id": 1}), 1)
+        # Während der Unterbrechung haben andere Worker 2-5 veröffentlicht
+        hub.mark_discontinuous(hub.stream, 5)
+        hub.publish(encode_event("ORDER_CREATED", {"id": 6}), 6)
+        before_gap = hub.resume(client, 1, hub.stream)
+        after_gap = hub.resume(client, 6, hub.stream)
+        await asyncio.sleep(0.01)
+        return ws, before_gap, after_gap
+
+    ws, before_gap, after_gap = asyncio.run(scenario())
+    assert (before_gap, after_gap) == (False, True)
+    assert [json.loads(m)["event"] for m in ws.sent] == ["ORDER_CREATED", "RESYNC_REQUIRED", "ORDER_CREATED"]
+
+# =========================================================
+# TEST: Einmal kodiert, geteilter Puffer, binäre/zlib-Frames
+# =========================================================
+def test_event_encoded_once_for_all_encodings():
+    async def scenario():
+        hub = Broadcaster()
+        sockets = {encoding: StalledWebSocket() for encoding in ("json", "binary", "zlib")}
+        for encoding, ws in sockets.items():
+            ws.release.set()
+            await hub.connect(ws, encoding)
+        hub.publish(encode_event("ORDER_CREATED", {"id": 1, "price": Decimal("19.50")}), 1)
+        await asyncio.sleep(0.01)
+        return hub, sockets
+
+    hub, sockets = asyncio.run(scenario())
+    text = sockets["json"].sent[0]
+    binary = sockets["binary"].sent[0]
+    assert json.loads(text) == {"seq": 1, "stream": hub.stream, "event": "ORDER_CREATED", "data": {"id": 1, "price": 19.5}}
+    assert binary is hub.replay_buffer[0].event.payload
+    assert zlib.decompress(sockets["zlib"].sent[0]) == binary
+    assert hub.stats()["events_published"] == 1
+    assert hub.stats()["bytes_sent"] == len(text) + len(binary) + len(sockets["zlib"].sent[0])
+
+# =========================================================
+# TEST: Kennzahlen pro Event über /health
+# =========================================================
+def test_health_reports_broadcast_stats():
+    before = client.get("/health").json()["websocket"]
+    with client.websocket_connect("/ws/orders") as ws:
+        asyncio.run(broadcast_order_event("ORDER_CREATED", {"id": 7, "status": "CREATED"}))
+        message = ws.receive_json()
+
+    response = client.get("/health")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["websocket"]["events_encoded"] == before["events_encoded"] + 1
+    assert stats["websocket"]["recent_events"][-1]["seq"] == message["seq"]
+    assert stats["websocket"]["recent_events"][-1]["bytes"] > 0
+    assert stats["event_bus"]["backend"] == "InProcessEventBus"
+
+def test_binary_encoding_over_websocket():
+    with client.websocket_connect("/ws/orders?encoding=zlib") as ws:
+        asyncio.run(broadcast_order_event("ORDER_CREATED", {"id": 5, "date": datetime(2025, 10, 11, 17, 0)}))
+        message = json.loads(zlib.decompress(ws.receive_bytes()))
+        assert message["data"] == {"id": 5, "date": "2025-10-11T17:00:00"}
+
+# =========================================================
+# TEST: Slow Consumer – drop_oldest
+# =========================================================
+def test_slow_consumer_drop_oldest():
+    async def scenario():
+        hub = Broadcaster(queue_size=2, policy="drop_oldest")
+        ws = StalledWebSocket()
+        slow = await hub.connect(ws)
+        await asyncio.sleep(0)
+        for i in range(5):
+            hub.publish(str(i))
+            await asyncio.sleep(0)
+        ws.release.set()
+        await asyncio.sleep(0.01)
+        return ws, slow
+
+    ws, slow = asyncio.run(scenario())
+    # "0" war bereits beim Writer, "1"-"2" wurden verdrängt
+    assert ws.sent == ["0", "3", "4"]
+    assert slow.dropped == 2
+
+# =========================================================
+# TEST: Slow Consumer – disconnect
+# =========================================================
+def test_slow_consumer_disconnect():
+    async def scenario():
+        hub = Broadcaster(queue_size=1, policy="disconnect")
+        ws = StalledWebSocket()
+        await hub.connect(ws)
+        for i in range(4):
+            hub.publish(str(i))
+        await asyncio.sleep(0.01)
+        return hub, ws
+
+    hub, ws = asyncio.run(scenario())
+    assert ws.closed_with == 1013
+    assert len(hub.clients) == 0
+    assert hub._tasks == set()
+
+# =========================================================
+# TEST: Tote Verbindungen werden entfernt
+# =========================================================
+def test_dead_socket_is_removed():
+    async def scenario():
+        hub = Broadcaster(queue_size=10)
+        broken = BrokenWebSocket()
+        healthy = StalledWebSocket()
+        healthy.release.set()
+        await hub.connect(broken)
+        await hub.connect(healthy)
+        hub.publish("hello")
+        await asyncio.sleep(0.01)
+        return hub, healthy
+
+    hub, healthy = asyncio.run(scenario())
+    assert healthy.sent == ["hello"]
+    assert len(hub.clients) == 1
+
+# =========================================================
+# TEST: drain() stellt ausstehende Events zu und schließt mit 1001
+# =========================================================
+def test_drain_delivers_pending_events_and_closes():
+    async def scenario():
+        local = Broadcaster()
+        websocket = StalledWebSocket()
+        await local.connect(websocket)
+        local.publish(encode_event("ORDER_CREATED", {"id": 1}))
+
+        asyncio.get_running_loop().call_later(0.1, websocket.release.set)
+        await local.drain(timeout=2)
+        return local, websocket
+
+    local, websocket = asyncio.run(scenario())
+    assert len(websocket.sent) == 1
+    assert websocket.closed_with == 1001
+    assert local.clients == set()